@@ -1,11 +1,17 @@
 # app/__init__.py
-import os
-from flask import Flask
-from pymongo import MongoClient
+import os, tempfile, time
+from flask import Flask, session
+from pymongo import MongoClient, ReadPreference
 from bson import ObjectId
 from flask_login import LoginManager
 from .db import ensure_indexes
-from .models import User
+from .cache import RefCache
+from .instrument import DBMonitor, init_instrumentation
+from .jobs import JobRunner
+from .search import ensure_search_keys
+from .stats import ensure_counters
+from .models import User, UserCache, USER_FIELDS
+from .auth import users_version
 
 def create_app():
     app = Flask(__name__)
@@ -14,26 +20,110 @@ def create_app():
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-change-me")
     mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
     mongo_db = os.getenv("MONGO_DB", "studentopvolging")
+    app.config["IMPORT_BATCH_SIZE"] = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    app.config["EXPORT_BATCH_SIZE"] = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+    app.config["STUDENTS_PAGE_SIZE"] = int(os.getenv("STUDENTS_PAGE_SIZE", "50"))
+    app.config["STUDENT_LOGS_PAGE_SIZE"] = int(os.getenv("STUDENT_LOGS_PAGE_SIZE", "25"))
+    # verwijderen archiveert student/OPO/categorie + resultaten en logs in <collectie>_archief
+    app.config["SOFT_DELETE"] = os.getenv("SOFT_DELETE", "0") == "1"
+    app.config["RELEASE"] = os.getenv("RELEASE", "")   # per deploy aanpassen: oude ETags vervallen
+    app.config["API_TOKEN"] = os.getenv("API_TOKEN", "")          # leeg = enkel via login
+    app.config["SLOW_REQUEST_MS"] = float(os.getenv("SLOW_REQUEST_MS", "500"))
+    app.config["DEBUG_STATS"] = os.getenv("DEBUG_STATS", "0") == "1"   # /debug/stats aanzetten
+    app.config["API_PAGE_SIZE"] = int(os.getenv("API_PAGE_SIZE", "100"))
+    app.config["API_PAGE_MAX"] = int(os.getenv("API_PAGE_MAX", "5000"))
+    app.config["API_BULK_MAX"] = int(os.getenv("API_BULK_MAX", "5000"))
+    # 0 = uit; anders: rol/naam uit de (ondertekende) sessie, max. zoveel seconden oud
+    app.config["USER_CLAIM_SECONDS"] = int(os.getenv("USER_CLAIM_SECONDS", "0"))
+    # maxTimeMS per rapport-endpoint (0 = geen limiet); daarboven: "rapport te groot"
+    app.config["MAX_TIME_MS"] = {
+        "rapport": int(os.getenv("RAPPORT_MAX_TIME_MS", "10000")),
+        "statistiek": int(os.getenv("STATISTIEK_MAX_TIME_MS", "10000")),
+        "export": int(os.getenv("EXPORT_MAX_TIME_MS", "60000")),
+        "job": int(os.getenv("JOB_MAX_TIME_MS", "0")),   # achtergrondexport: mag lang duren
+    }
 
     # --- DB ---
-    client = MongoClient(mongo_uri)
+    monitor = DBMonitor()   # telt Mongo-commando's per request (zie instrument.py)
+    client = MongoClient(
+        mongo_uri, event_listeners=[monitor],
+        maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    )
     app.db = client[mongo_db]
+    # rapporten/statistiek/exports: eigen (kleinere) pool, zodat zware queries de
+    # bewerkingen niet uithongeren, en bij een replica set bij voorkeur op een secondary
+    # (die kan iets achterlopen; REPORT_READ_PREFERENCE=primary als dat niet mag)
+    report_client = MongoClient(
+        os.getenv("REPORT_MONGO_URI") or mongo_uri, event_listeners=[monitor],
+        maxPoolSize=int(os.getenv("REPORT_MAX_POOL_SIZE", "10")),
+        readPreference=os.getenv("REPORT_READ_PREFERENCE", "secondaryPreferred"),
+    )
+    app.report_db = report_client[mongo_db]   # achtergrondjobs: geen ETag, mogen achterlopen
+    # de rapportpagina's en exports krijgen een ETag uit de versions-markers (primary):
+    # van een achterlopende secondary zou oude data onder de nieuwe ETag komen, en die
+    # blijft dan als 304 hangen tot de volgende bump(). Dus: zelfde pool, primary reads.
+    app.report_view_db = app.report_db.with_options(read_preference=ReadPreference.PRIMARY)
     ensure_indexes(app.db)
+    ensure_counters(app.db)
+    ensure_search_keys(app.db)
+    app.refcache = RefCache(app.db, check_interval=float(os.getenv("REFCACHE_CHECK_SECONDS", "1")))
+
+    # --- Achtergrondjobs (imports/exports); JOBS_WORKERS=0 = alles synchroon in de request ---
+    workers = int(os.getenv("JOBS_WORKERS", "2"))
+    app.jobs = JobRunner(
+        app, app.db,
+        spool_dir=os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "studentopvolging-jobs")),
+        max_workers=workers,
+        keep_hours=float(os.getenv("JOBS_KEEP_HOURS", "24")),
+    ) if workers > 0 else None
 
     # --- Login ---
     login_manager = LoginManager()
     login_manager.login_view = "auth.login"   # where to redirect if not logged in
     login_manager.init_app(app)
 
+    app.usercache = UserCache(ttl=float(os.getenv("USER_CACHE_SECONDS", "60")))
+
     @login_manager.user_loader
     def load_user(user_id: str):
-        doc = app.db.users.find_one({"_id": ObjectId(user_id)})
-        return User.from_doc(doc)
+        # 1) proces-cache, 2) ondertekende sessieclaim (optioneel), 3) Mongo;
+        # 1) en 2) enkel als sindsdien geen rol/wachtwoord gewijzigd is ('users'-versie)
+        users_v = users_version()
+        app.usercache.sync(users_v)
+        user = app.usercache.get(user_id)
+        if user is not None:
+            return user
+        claim_ttl = app.config["USER_CLAIM_SECONDS"]
+        claim = session.get("_user") if claim_ttl else None
+        if (claim and claim.get("id") == user_id and claim.get("uv") == users_v
+                and time.time() - claim.get("iat", 0) < claim_ttl):
+            user = User.from_claim(claim)
+            if app.usercache.accepts(user):
+                app.usercache.put(user)
+                return user
+        if not ObjectId.is_valid(user_id):
+            return None
+        user = User.from_doc(app.db.users.find_one({"_id": ObjectId(user_id)}, USER_FIELDS))
+        if user is not None:
+            app.usercache.put(user)
+            if claim_ttl:
+                session["_user"] = user.claim(users_v)
+        return user
 
     # --- Blueprints ---
     from .web import web
     from .auth import auth
+    from .routes import bp as api
     app.register_blueprint(web)
     app.register_blueprint(auth)
+    app.register_blueprint(api, url_prefix="/api")
+
+    # --- Instrumentatie: Server-Timing, slow-request log, /debug/stats ---
+    init_instrumentation(app, monitor)
+
+    # --- CLI ---
+    from .cli import register_cli
+    register_cli(app)
 
     return app
@@ -0,0 +1,278 @@
+# app/asgi.py
+"""
+Async variant of the JSON API (routes.py): a small ASGI app on pymongo's
+AsyncMongoClient, so one process serves many concurrent integration clients
+without holding a worker thread per in-flight Mongo call. Run it next to the
+Flask app with any ASGI server, e.g.
+
+    uvicorn --factory app.asgi:create_asgi_app --port 8001
+
+Same URLs (/api/...), query parameters, cursors, schemas and JSON as the Flask
+API; the query parsing and document building are shared with routes.py.
+Reads are open; writes need the API token (there is no login session here).
+Resultaten writes and the bulk endpoints stay on the Flask API: they maintain
+the counters and opo_stats through stats.py, which is synchronous.
+"""
+import asyncio, hmac, inspect, json, logging, os, re
+from datetime import date, datetime
+from urllib.parse import parse_qsl
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import AsyncMongoClient
+from pymongo.errors import DuplicateKeyError
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException, abort
+from werkzeug.http import http_date
+from .routes import (ser, list_query, next_token, students_filter, results_filter, logs_filter,
+                     student_doc, log_doc, STUDENT_API_SORT, RESULT_API_SORT, LOG_API_SORT)
+from .search import SEARCH_FIELD
+from .schemas import StudentIn, OpleidingIn, OPOIn, CategorieIn, AcademiejaarIn, StudentLogIn
+from .stats import COUNTERS_ID
+
+log = logging.getLogger(__name__)
+
+# referentielijsten: collectie -> sorteerveld (zoals in routes.py)
+REF_SORTS = {"opleidingen": "naam", "opos": "afkorting", "categorien": "afkorting", "academiejaren": "academiejaar"}
+# POST /api/<naam>: (collectie, schema, teller in het dashboard-doc of None)
+CREATES = {
+    "opleidingen": ("opleidingen", OpleidingIn, None),
+    "opos": ("opos", OPOIn, "opos"),
+    "categorien": ("categorien", CategorieIn, None),
+    "academiejaren": ("academiejaren", AcademiejaarIn, None),
+}
+STUDENT_RESULT_SORT = [("academiejaar", 1), ("opo_id", 1), ("kans", 1)]
+
+
+def _json_default(o):
+    # zoals Flask's JSON-provider, zodat beide API's dezelfde datums geven
+    if isinstance(o, date):
+        return http_date(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    return json.dumps(obj, default=_json_default, sort_keys=True)
+
+
+class Request:
+    """The parts of an ASGI http scope the handlers use; args is a MultiDict like Flask's."""
+    def __init__(self, scope, receive):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = MultiDict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        self._receive = receive
+
+    async def json(self):
+        body = bytearray()
+        while True:
+            msg = await self._receive()
+            body += msg.get("body", b"")
+            if not msg.get("more_body"):
+                break
+        try:
+            return json.loads(body) if body else None
+        except ValueError:
+            abort(400, description="ongeldige JSON")
+
+
+# ---------- async twins of cache.bump / stats.inc_counters ----------
+async def bump(db, *names):
+    """Like cache.bump: the Flask processes pick the new versions up on their next check."""
+    now = datetime.utcnow()
+    await asyncio.gather(*(db.versions.update_one({"_id": n}, {"$inc": {"v": 1}, "$set": {"ts": now}}, upsert=True)
+                           for n in names))
+
+
+async def inc_counters(db, **deltas):
+    inc = {k: v for k, v in deltas.items() if v}
+    if inc:
+        await db.stats.update_one({"_id": COUNTERS_ID}, {"$inc": inc}, upsert=True)
+
+
+class AsyncAPI:
+    """
+    ASGI callable. Handlers return (status, body) for a JSON answer or an async
+    generator of str chunks for a streamed one.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.client = None
+        self.routes = [
+            ("GET", re.compile(r"/api/ping"), self.ping),
+            ("GET", re.compile(r"/api/students"), self.list_students),
+            ("POST", re.compile(r"/api/students"), self.create_student),
+            ("GET", re.compile(r"/api/students/(?P<id>[0-9a-f]{24})"), self.student_overview),
+            ("GET", re.compile(r"/api/results"), self.list_results),
+            ("GET", re.compile(r"/api/student-logs"), self.list_logs),
+            ("POST", re.compile(r"/api/student-logs"), self.create_log),
+            ("GET", re.compile(r"/api/(?P<name>%s)" % "|".join(REF_SORTS)), self.list_ref),
+            ("POST", re.compile(r"/api/(?P<name>%s)" % "|".join(CREATES)), self.create_ref),
+        ]
+
+    @property
+    def db(self):
+        # lui aangemaakt: de client hoort bij de event loop van de server
+        if self.client is None:
+            self.client = AsyncMongoClient(self.config["MONGO_URI"], maxPoolSize=self.config["MONGO_MAX_POOL_SIZE"])
+        return self.client[self.config["MONGO_DB"]]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        req = Request(scope, receive)
+        try:
+            handler, params = self._match(req)
+            if req.method not in ("GET", "HEAD"):
+                self._require_token(req)
+            out = await handler(req, **params)
+        except HTTPException as e:
+            out = e.code, {"error": e.name, "description": e.description}
+        except ValidationError as e:
+            out = 422, {"error": "validation", "details": e.errors(include_url=False, include_context=False)}
+        except DuplicateKeyError:
+            out = 409, {"error": "bestaat al"}
+        except Exception:
+            log.exception("async API: %s %s", req.method, req.path)
+            out = 500, {"error": "interne fout"}
+
+        if inspect.isasyncgen(out):
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/json")]})
+            async for chunk in out:
+                await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        else:
+            status, body = out
+            data = dumps(body).encode("utf-8")
+            await send({"type": "http.response.start", "status": status,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(data)).encode())]})
+            await send({"type": "http.response.body", "body": data})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                if self.client is not None:
+                    await self.client.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _match(self, req):
+        allowed = False
+        for method, pattern, handler in self.routes:
+            m = pattern.fullmatch(req.path.rstrip("/"))
+            if m:
+                if method == req.method or (method == "GET" and req.method == "HEAD"):
+                    return handler, m.groupdict()
+                allowed = True
+        abort(405 if allowed else 404)
+
+    def _require_token(self, req):
+        token = self.config["API_TOKEN"]
+        auth = req.headers.get("authorization", "")
+        if not (token and auth.startswith("Bearer ") and hmac.compare_digest(auth[7:].strip(), token)):
+            abort(401)
+
+    # ---------- lijsten ----------
+    async def _list(self, req, coll, query, sort):
+        """
+        As routes.list_response, streamed from an async cursor. The first document
+        is fetched before the response starts, so query errors still get a status.
+        """
+        query, projection, limit = list_query(req.args, self.config, query, sort)
+        cursor = coll.find(query, projection).sort(sort).limit(limit + 1)
+        first = await anext(cursor, None)
+
+        async def generate():
+            yield '{"items":['
+            last, n, doc = None, 0, first
+            try:
+                while doc is not None and n < limit:
+                    yield ("," if n else "") + dumps(ser(doc))
+                    last, n = doc, n + 1
+                    doc = await anext(cursor, None)
+            finally:
+                await cursor.close()
+            yield '],"next":' + dumps(next_token(last, sort, doc is not None)) + "}"
+
+        return generate()
+
+    async def ping(self, req):
+        return 200, {"ok": True, "db": self.db.name}
+
+    async def list_students(self, req):
+        return await self._list(req, self.db.students, students_filter(req.args), STUDENT_API_SORT)
+
+    async def list_results(self, req):
+        return await self._list(req, self.db.resultaten, results_filter(req.args), RESULT_API_SORT)
+
+    async def list_logs(self, req):
+        return await self._list(req, self.db.student_logs, logs_filter(req.args), LOG_API_SORT)
+
+    async def list_ref(self, req, name):
+        docs = await self.db[name].find().sort(REF_SORTS[name], 1).to_list(None)
+        return 200, [ser(d) for d in docs]
+
+    async def student_overview(self, req, id):
+        """
+        Student with its resultaten and first page of logs (plus the cursor for
+        /api/student-logs?student_id=...): three lookups, run concurrently.
+        """
+        sid, limit = ObjectId(id), self.config["API_PAGE_SIZE"]
+        db = self.db
+        student, results, logs = await asyncio.gather(
+            db.students.find_one({"_id": sid}, {SEARCH_FIELD: 0}),
+            db.resultaten.find({"student_id": sid}).sort(STUDENT_RESULT_SORT).to_list(None),
+            db.student_logs.find({"student_id": sid}).sort(LOG_API_SORT).limit(limit + 1).to_list(None),
+        )
+        if student is None:
+            abort(404)
+        more = len(logs) > limit
+        logs = logs[:limit]
+        return 200, {
+            "student": ser(student),
+            "results": [ser(r) for r in results],
+            "logs": [ser(d) for d in logs],
+            "logs_next": next_token(logs[-1], LOG_API_SORT, more) if logs else None,
+        }
+
+    # ---------- aanmaken ----------
+    async def create_student(self, req):
+        data = student_doc(StudentIn.model_validate(await req.json() or {}).model_dump())
+        res = await self.db.students.insert_one(data)
+        await asyncio.gather(bump(self.db, "students"), inc_counters(self.db, students=1))
+        data["_id"] = res.inserted_id
+        return 201, ser(data)
+
+    async def create_log(self, req):
+        payload = log_doc(StudentLogIn.model_validate(await req.json() or {}).model_dump())
+        res = await self.db.student_logs.insert_one(payload)
+        await bump(self.db, "student_logs")
+        payload["_id"] = res.inserted_id
+        return 201, ser(payload)
+
+    async def create_ref(self, req, name):
+        coll, model, counter = CREATES[name]
+        data = model.model_validate(await req.json() or {}).model_dump()
+        res = await self.db[coll].insert_one(data)
+        await asyncio.gather(bump(self.db, coll), inc_counters(self.db, **({counter: 1} if counter else {})))
+        data["_id"] = res.inserted_id
+        return 201, ser(data)
+
+
+def create_asgi_app():
+    """Reads the same environment as create_app (see __init__.py)."""
+    return AsyncAPI({
+        "MONGO_URI": os.getenv("MONGO_URI", "mongodb://localhost:27017/"),
+        "MONGO_DB": os.getenv("MONGO_DB", "studentopvolging"),
+        "MONGO_MAX_POOL_SIZE": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "API_TOKEN": os.getenv("API_TOKEN", ""),
+        "API_PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", "100")),
+        "API_PAGE_MAX": int(os.getenv("API_PAGE_MAX", "5000")),
+    })
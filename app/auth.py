@@ -1,12 +1,49 @@
 # app/auth.py
-from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash
+from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, session
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, logout_user, login_required, current_user
 from bson import ObjectId
+from pymongo import ReturnDocument
+from .cache import USERS_VERSION, bump
 from .models import User
 
 auth = Blueprint("auth", __name__)
 
+ROLES = ("viewer", "admin", "logger")
+
+def users_version():
+    """Current 'users' marker (from RefCache's periodic 'versions' check)."""
+    return current_app.refcache.versions((USERS_VERSION,))[0][1]
+
+def _start_session(user):
+    login_user(user, remember=False)
+    current_app.usercache.put(user)
+    if current_app.config.get("USER_CLAIM_SECONDS"):
+        session["_user"] = user.claim(users_version())
+
+def set_user_auth(db, user_id, role=None, password=None):
+    """
+    Change a user's role and/or password. Bumps auth_version and the 'users'
+    version marker, so cached users and session claims from before the change
+    are no longer trusted, in this process and (within the RefCache check
+    interval) in every other one.
+    Returns the new auth_version, or None when the user does not exist.
+    """
+    upd = {}
+    if role is not None:
+        upd["role"] = role
+    if password is not None:
+        upd["password_hash"] = generate_password_hash(password)
+    doc = db.users.find_one_and_update(
+        {"_id": ObjectId(user_id)}, {"$set": upd, "$inc": {"auth_version": 1}},
+        projection={"auth_version": 1}, return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        return None
+    current_app.usercache.invalidate(str(doc["_id"]), doc["auth_version"])
+    bump(db, USERS_VERSION)
+    return doc["auth_version"]
+
 @auth.get("/login")
 def login():
     if current_user.is_authenticated:
@@ -23,7 +60,7 @@ def login_post():
         flash("Ongeldige inloggegevens.", "danger")
         return redirect(url_for("auth.login"))
 
-    login_user(User.from_doc(doc), remember=False)
+    _start_session(User.from_doc(doc))
     flash("Ingelogd.", "success")
     next_url = request.args.get("next")
     return redirect(next_url or url_for("web.home"))
@@ -48,7 +85,7 @@ def register_post():
         flash("Wachtwoorden komen niet overeen.", "danger")
         return redirect(url_for("auth.register"))
 
-    if current_app.db.users.find_one({"email": email}):
+    if current_app.db.users.find_one({"email": email}, {"_id": 1}):
         flash("E-mail bestaat al.", "danger")
         return redirect(url_for("auth.register"))
 
@@ -62,7 +99,7 @@ def register_post():
     res = current_app.db.users.insert_one(doc)
     doc["_id"] = res.inserted_id
 
-    login_user(User.from_doc(doc))
+    _start_session(User.from_doc(doc))
     flash("Account aangemaakt.", "success")
     return redirect(url_for("web.home"))
 
@@ -70,5 +107,6 @@ def register_post():
 @login_required
 def logout():
     logout_user()
+    session.pop("_user", None)
     flash("Uitgelogd.", "info")
     return redirect(url_for("web.home"))
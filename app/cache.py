@@ -0,0 +1,104 @@
+# app/cache.py
+import threading, time
+from datetime import datetime
+from flask import current_app, has_app_context
+
+# collection -> (sort field, fields combined into 'label')
+REF_COLLECTIONS = {
+    "opleidingen": ("naam", ("naam", "dag_avond")),
+    "opos": ("afkorting", ("afkorting", "naam")),
+    "categorien": ("afkorting", ("afkorting", "omschrijving")),
+    "academiejaren": ("academiejaar", ()),
+}
+# data collections with a version too (no cached copy): conditional GET, see conditional.py
+VERSIONED_DATA = ("students", "resultaten", "student_logs")
+# bumped on every role/password change (auth.set_user_auth): cached users and claims expire
+USERS_VERSION = "users"
+
+
+def bump(db, *names):
+    """
+    Mark collections as changed. Every process sees the new version number in the
+    'versions' collection and reloads its cached copy on next use; ETags built
+    from the versions change with it.
+    """
+    now = datetime.utcnow()
+    for name in names:
+        db.versions.update_one({"_id": name}, {"$inc": {"v": 1}, "$set": {"ts": now}}, upsert=True)
+    # this process: drop the cached copy right away (no wait for the next version check)
+    if has_app_context() and hasattr(current_app, "refcache"):
+        current_app.refcache.invalidate(*names)
+
+
+def _label(doc, fields):
+    parts = [doc.get(f) for f in fields if doc.get(f)]
+    return " — ".join(parts) if parts else doc.get("naam") or doc.get("afkorting") or ""
+
+
+class RefCache:
+    """
+    Process-level cache for the small reference collections (opleidingen, OPO's,
+    categorieën, academiejaren).
+
+    get(name) returns (docs, map): docs sorted, '_id' as string and a 'label'
+    field; map is string_id -> doc. Treat both as read-only, they are
+    shared between requests.
+
+    At most every `check_interval` seconds one small query on 'versions' tells us
+    whether another worker changed something; local writes go through bump().
+    """
+    def __init__(self, db, check_interval=1.0):
+        self.db = db
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = {}      # name -> (version, docs, map)
+        self._versions = {}     # name -> (version, ts) seen in 'versions'
+        self._checked_at = 0.0
+
+    def invalidate(self, *names):
+        with self._lock:
+            for name in names or list(self._entries):
+                self._entries.pop(name, None)
+            self._checked_at = 0.0
+
+    def _refresh_versions(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._versions = {
+            d["_id"]: (d.get("v", 0), d.get("ts"))
+            for d in self.db.versions.find({"_id": {"$in": [*REF_COLLECTIONS, *VERSIONED_DATA, USERS_VERSION]}})
+        }
+        self._checked_at = now
+
+    def _load(self, name):
+        sort_field, label_fields = REF_COLLECTIONS[name]
+        docs, mapping = [], {}
+        for raw in self.db[name].find().sort(sort_field, 1):
+            d = dict(raw)
+            d["_id"] = str(d["_id"])
+            if label_fields:
+                d["label"] = _label(d, label_fields)
+            mapping[d["_id"]] = d
+            docs.append(d)
+        return docs, mapping
+
+    def get(self, name):
+        with self._lock:
+            self._refresh_versions()
+            version = self._versions.get(name, (0, None))[0]
+            entry = self._entries.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, *self._load(name))
+                self._entries[name] = entry
+            return entry[1], entry[2]
+
+    def versions(self, names):
+        """[(name, version, last modified or None)] from the same periodic check."""
+        with self._lock:
+            self._refresh_versions()
+            return [(n, *self._versions.get(n, (0, None))) for n in names]
+
+    def academiejaren(self):
+        docs, _ = self.get("academiejaren")
+        return [d.get("academiejaar") for d in docs]
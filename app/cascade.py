@@ -0,0 +1,191 @@
+# app/cascade.py
+from datetime import datetime
+from pymongo import ReplaceOne
+from .cache import bump
+from .stats import RESULT_FIELDS, inc_counters, move_student, result_changes
+
+ARCHIVE_SUFFIX = "_archief"
+
+# (kind-collectie, veld, ouder-collectie, actie) voor de wezen-opruiming:
+# "remove" verwijdert (of archiveert) de rij, "unset" zet enkel de verwijzing op None
+ORPHAN_RELATIONS = (
+    ("resultaten", "student_id", "students", "remove"),
+    ("resultaten", "opo_id", "opos", "remove"),
+    ("student_logs", "student_id", "students", "remove"),
+    ("student_logs", "categorie_id", "categorien", "remove"),
+    ("student_logs", "opo_id", "opos", "unset"),   # OPO is optionele context bij een logregel
+)
+
+
+def archive_name(coll):
+    return f"{coll}{ARCHIVE_SUFFIX}"
+
+
+def _archive(db, coll, docs, reason):
+    """Copy docs to <coll>_archief (idempotent on _id, so a re-run after a crash is harmless)."""
+    if docs:
+        now = datetime.utcnow()
+        db[archive_name(coll)].bulk_write(
+            [ReplaceOne({"_id": d["_id"]}, {**d, "_archived": {"at": now, "reason": reason}}, upsert=True)
+             for d in docs],
+            ordered=False,
+        )
+
+
+def remove_rows(db, coll, query, archive=False, reason="", batch_size=1000):
+    """
+    Delete all rows matching `query` in batches of `batch_size`, copying them to
+    the archive collection first when `archive` is set. Removed resultaten go
+    through result_changes, so the counters and opo_stats stay in sync.
+    Returns the number of removed rows.
+    """
+    projection = None if archive else (RESULT_FIELDS if coll == "resultaten" else {"_id": 1})
+    n = 0
+    while True:
+        docs = list(db[coll].find(query, projection).limit(batch_size))
+        if not docs:
+            return n
+        if archive:
+            _archive(db, coll, docs, reason)
+        n += db[coll].delete_many({"_id": {"$in": [d["_id"] for d in docs]}}).deleted_count
+        if coll == "resultaten":
+            result_changes(db, [(d, None) for d in docs])
+
+
+# ---------- cascades ----------
+def delete_student(db, student_id, archive=False, batch_size=1000):
+    """
+    Delete a student together with its resultaten and logs. Returns the removed
+    counts, or None when the student does not exist.
+    """
+    stu = db.students.find_one_and_delete({"_id": student_id})
+    if stu is None:
+        return None
+    if archive:
+        _archive(db, "students", [stu], "student verwijderd")
+    inc_counters(db, students=-1)
+    # eerst de bijdrage aan opo_stats weghalen; daarna tellen de resultaten nergens meer mee
+    move_student(db, student_id, stu.get("opleiding_id"), None, remove=True)
+    q = {"student_id": student_id}
+    counts = {
+        "resultaten": remove_rows(db, "resultaten", q, archive, "student verwijderd", batch_size),
+        "student_logs": remove_rows(db, "student_logs", q, archive, "student verwijderd", batch_size),
+    }
+    bump(db, "students", "resultaten", "student_logs")
+    return counts
+
+
+def delete_opo(db, opo_id, archive=False, batch_size=1000):
+    """
+    Delete an OPO and its resultaten; logs keep their text but lose the OPO
+    reference. Returns the affected counts, or None when the OPO does not exist.
+    """
+    opo = db.opos.find_one_and_delete({"_id": opo_id})
+    if opo is None:
+        return None
+    if archive:
+        _archive(db, "opos", [opo], "OPO verwijderd")
+    inc_counters(db, opos=-1)
+    n_res = remove_rows(db, "resultaten", {"opo_id": opo_id}, archive, "OPO verwijderd", batch_size)
+    db.opo_stats.delete_many({"opo_id": opo_id})   # staan na het verwijderen allemaal op 0
+    n_logs = db.student_logs.update_many({"opo_id": opo_id}, {"$set": {"opo_id": None}}).modified_count
+    bump(db, "opos", "resultaten", "student_logs")
+    return {"resultaten": n_res, "student_logs": n_logs}
+
+
+def delete_categorie(db, cat_id, archive=False, batch_size=1000):
+    """Delete a categorie and its logs; None when it does not exist."""
+    cat = db.categorien.find_one_and_delete({"_id": cat_id})
+    if cat is None:
+        return None
+    if archive:
+        _archive(db, "categorien", [cat], "categorie verwijderd")
+    n = remove_rows(db, "student_logs", {"categorie_id": cat_id}, archive, "categorie verwijderd", batch_size)
+    bump(db, "categorien", "student_logs")
+    return {"student_logs": n}
+
+
+def restore_student(db, student_id):
+    """
+    Move an archived student back, with its archived resultaten and logs.
+    Raises DuplicateKeyError when the studentnummer is in use again.
+    """
+    stu = db[archive_name("students")].find_one({"_id": student_id})
+    if stu is None:
+        return None
+    stu.pop("_archived", None)
+    db.students.insert_one(stu)
+    inc_counters(db, students=1)
+    counts = {}
+    for coll in ("resultaten", "student_logs"):
+        arch = db[archive_name(coll)]
+        docs = list(arch.find({"student_id": student_id}, {"_archived": 0}))
+        if docs:
+            db[coll].insert_many(docs, ordered=False)
+            arch.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        if coll == "resultaten":
+            result_changes(db, [(None, d) for d in docs])
+        counts[coll] = len(docs)
+    db[archive_name("students")].delete_one({"_id": student_id})
+    bump(db, "students", "resultaten", "student_logs")
+    return counts
+
+
+# ---------- wezen (orphans) ----------
+def distinct_pipeline(field):
+    """
+    Distinct values of `field`, streamed (no 16 MB limit like distinct()). With an
+    index on `field` the $sort + $group runs as a DISTINCT_SCAN: one index key per
+    value, no documents.
+    """
+    return [{"$sort": {field: 1}}, {"$group": {"_id": f"${field}"}}]
+
+
+def _parent_ids(coll, field):
+    for d in coll.aggregate(distinct_pipeline(field)):
+        if d["_id"] is not None:
+            yield d["_id"]
+
+
+def _missing_parents(db, coll, field, parent, batch_size):
+    """Anti-join: per batch of distinct values one $in on the parent's _id index."""
+    batch = []
+
+    def missing():
+        found = {d["_id"] for d in db[parent].find({"_id": {"$in": batch}}, {"_id": 1})}
+        return [v for v in batch if v not in found]
+
+    for value in _parent_ids(db[coll], field):
+        batch.append(value)
+        if len(batch) >= batch_size:
+            yield missing()
+            batch = []
+    if batch:
+        yield missing()
+
+
+def cleanup_orphans(db, dry_run=True, archive=False, batch_size=1000):
+    """
+    Find resultaten and logs whose student, OPO or categorie no longer exists
+    (see ORPHAN_RELATIONS) and remove, archive or unlink them. With dry_run
+    only counts. Returns one report line per relation.
+    """
+    report = []
+    for coll, field, parent, action in ORPHAN_RELATIONS:
+        line = {"collection": coll, "field": field, "parent": parent, "action": action,
+                "missing_parents": 0, "rows": 0}
+        for missing in _missing_parents(db, coll, field, parent, batch_size):
+            if not missing:
+                continue
+            q = {field: {"$in": missing}}
+            line["missing_parents"] += len(missing)
+            if dry_run:
+                line["rows"] += db[coll].count_documents(q)
+            elif action == "unset":
+                line["rows"] += db[coll].update_many(q, {"$set": {field: None}}).modified_count
+            else:
+                line["rows"] += remove_rows(db, coll, q, archive, f"wees: {parent} ontbreekt", batch_size)
+        report.append(line)
+        if line["rows"] and not dry_run:
+            bump(db, coll)
+    return report
@@ -0,0 +1,104 @@
+# app/cli.py
+import click
+from flask import current_app
+from pymongo.errors import DuplicateKeyError
+from .cascade import archive_name, cleanup_orphans, restore_student
+from .search import reindex
+from .seed import seed as seed_data, reset as reset_data
+from .auth import ROLES, set_user_auth
+from .cache import bump
+from .stats import rebuild_counters, rebuild_opo_stats
+
+
+def register_cli(app):
+    """
+    Beheercommando's, bv. `flask --app app reindex-search`.
+    """
+
+    @app.cli.command("reindex-search")
+    @click.option("--batch-size", default=1000, show_default=True)
+    def reindex_search(batch_size):
+        """(Re)compute the normalised search keys on every student."""
+        done = reindex(current_app.db, batch_size=batch_size)
+        click.echo(f"Zoeksleutels bijgewerkt voor {done} studenten.")
+
+    @app.cli.command("stats-rebuild")
+    def stats_rebuild():
+        """Recount the dashboard counters and rebuild opo_stats (backfill)."""
+        doc = rebuild_counters(current_app.db)
+        click.echo(f"Tellers herberekend: {doc['students']} studenten, {doc['opos']} OPO's, "
+                   f"{doc['resultaten']} resultaten ({doc['na']} NA).")
+        n = rebuild_opo_stats(current_app.db)
+        bump(current_app.db, "resultaten")   # dashboard en rapport tonen opo_stats
+        click.echo(f"opo_stats opnieuw opgebouwd: {n} rijen.")
+
+    @app.cli.command("seed")
+    @click.option("--students", default=1000, show_default=True, help="Aantal nieuwe studenten.")
+    @click.option("--years", default=3, show_default=True, help="Aantal academiejaren (t.e.m. het huidige).")
+    @click.option("--opos", default=20, show_default=True, help="Aantal OPO's.")
+    @click.option("--opo-per-year", default=6, show_default=True, help="OPO's per student per jaar.")
+    @click.option("--logs", default=2, show_default=True, help="Gemiddeld aantal logregels per student.")
+    @click.option("--batch-size", default=5000, show_default=True)
+    @click.option("--random-seed", type=int, default=None, help="Vaste seed voor reproduceerbare data.")
+    @click.option("--reset", is_flag=True, help="Eerst studenten, resultaten, logs en tellers wissen.")
+    def seed(students, years, opos, opo_per_year, logs, batch_size, random_seed, reset):
+        """Generate a synthetic dataset (bulk inserts) for development and benchmarks."""
+        db = current_app.db
+        if reset:
+            reset_data(db)
+        out = seed_data(db, students=students, years=years, opos=opos, opo_per_year=opo_per_year,
+                        logs_per_student=logs, batch_size=batch_size, rng_seed=random_seed)
+        click.echo(f"Seed klaar: {out['students']} studenten, {out['resultaten']} resultaten, "
+                   f"{out['student_logs']} logregels, {out['opos']} OPO's, "
+                   f"academiejaren {', '.join(out['academiejaren'])}.")
+
+    @app.cli.command("user-role")
+    @click.argument("email")
+    @click.argument("role", type=click.Choice(ROLES))
+    def user_role(email, role):
+        """Change a user's role (invalidates cached logins of that user)."""
+        doc = current_app.db.users.find_one({"email": email.strip().lower()}, {"_id": 1})
+        if doc is None:
+            raise click.ClickException(f"Gebruiker niet gevonden: {email}")
+        set_user_auth(current_app.db, doc["_id"], role=role)
+        click.echo(f"Rol van {email} is nu '{role}'.")
+
+    @app.cli.command("cleanup-orphans")
+    @click.option("--apply", "apply_", is_flag=True, help="Echt opruimen (standaard enkel rapporteren).")
+    @click.option("--archive", is_flag=True, help="Naar <collectie>_archief verplaatsen i.p.v. verwijderen.")
+    @click.option("--batch-size", default=1000, show_default=True)
+    def cleanup(apply_, archive, batch_size):
+        """Find (and with --apply remove) resultaten/logs whose student, OPO or categorie is gone."""
+        report = cleanup_orphans(current_app.db, dry_run=not apply_, archive=archive, batch_size=batch_size)
+        for line in report:
+            if not line["missing_parents"]:
+                verb = "niets te doen"
+            elif not apply_:
+                verb = "zou " + ("loskoppelen" if line["action"] == "unset" else
+                                 "archiveren" if archive else "verwijderen")
+            else:
+                verb = ("losgekoppeld" if line["action"] == "unset" else
+                        "gearchiveerd" if archive else "verwijderd")
+            click.echo(f"{line['collection']}.{line['field']}: {line['missing_parents']} ontbrekende "
+                       f"{line['parent']}, {line['rows']} rijen — {verb}")
+        if apply_ and any(line["rows"] for line in report if line["parent"] == "students"):
+            # opleiding van verdwenen studenten is onbekend: opo_stats kan dat niet zelf rechtzetten
+            click.echo("Tip: draai `flask stats-rebuild` als er studenten buiten de app om verwijderd werden.")
+        if not apply_:
+            click.echo("Dry-run: er is niets gewijzigd. Gebruik --apply om op te ruimen.")
+
+    @app.cli.command("restore-student")
+    @click.argument("studentnummer")
+    def restore(studentnummer):
+        """Bring back a student (+ resultaten and logs) deleted with SOFT_DELETE on."""
+        db = current_app.db
+        doc = db[archive_name("students")].find_one({"studentnummer": studentnummer}, {"_id": 1},
+                                                     sort=[("_archived.at", -1)])
+        if doc is None:
+            raise click.ClickException(f"Geen gearchiveerde student met nummer {studentnummer}")
+        try:
+            n = restore_student(db, doc["_id"])
+        except DuplicateKeyError:
+            raise click.ClickException(f"Studentnummer {studentnummer} is intussen opnieuw in gebruik.")
+        click.echo(f"Student {studentnummer} teruggezet met {n['resultaten']} resultaten "
+                   f"en {n['student_logs']} logregels.")
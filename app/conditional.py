@@ -0,0 +1,53 @@
+# app/conditional.py
+import hashlib
+from functools import wraps
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+
+
+def _validators(collections):
+    """
+    (etag, last_modified) for the current request: the versions of the
+    collections the view reads, the full URL (filters, paging) and who is
+    looking (the pages differ for anonymous users and per role).
+    """
+    stamps = current_app.refcache.versions(collections)
+    user = f"{current_user.get_id()}:{current_user.role}" if current_user.is_authenticated else "-"
+    key = "|".join([current_app.config["RELEASE"], request.full_path, user,
+                    *(f"{name}={v}" for name, v, _ in stamps)])
+    modified = [ts for _, _, ts in stamps if ts is not None]
+    return hashlib.sha1(key.encode("utf-8")).hexdigest(), max(modified) if modified else None
+
+
+def conditional(*collections):
+    """
+    Conditional GET for a view that only depends on `collections` and the URL:
+    a weak ETag + Last-Modified from the 'versions' markers (see cache.bump),
+    and 304 Not Modified before any query or template runs when the client's
+    If-None-Match still matches (Last-Modified is informative only). Writes
+    done by another process are seen after at most REFCACHE_CHECK_SECONDS,
+    like the RefCache itself.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # een pagina met flash-berichten niet cachen: die moeten getoond én opgebruikt worden
+            if session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            etag, modified = _validators(collections)
+            # enkel de ETag beslist: If-Modified-Since heeft maar seconden-resolutie
+            # en weet niets van gebruiker of rol
+            if request.if_none_match.contains_weak(etag):
+                resp = make_response("", 304)
+            else:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            if modified is not None:
+                resp.last_modified = modified
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+        return wrapper
+    return decorator
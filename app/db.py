@@ -1,5 +1,29 @@
 # app/db.py
-from pymongo import ASCENDING
+from pymongo import ASCENDING, DESCENDING
+
+# indexen uit de eerste versie, vervangen door de compound indexen hieronder
+OBSOLETE_INDEXES = {
+    "student_logs": ("student_id_1", "registratiedatum_1"),
+}
+
+STUDENT_LOG_INDEXES = [
+    # filter op student (+ categorie of OPO), nieuwste eerst; _id voor de keyset-paginatie
+    [("student_id", ASCENDING), ("registratiedatum", DESCENDING), ("_id", DESCENDING)],
+    [("student_id", ASCENDING), ("categorie_id", ASCENDING), ("registratiedatum", DESCENDING), ("_id", DESCENDING)],
+    [("student_id", ASCENDING), ("opo_id", ASCENDING), ("registratiedatum", DESCENDING), ("_id", DESCENDING)],
+    # categorie/OPO verwijderen (cascade) en wezen-opruiming
+    [("categorie_id", ASCENDING)],
+    [("opo_id", ASCENDING)],
+    # API: alle logs, nieuwste eerst (keyset op registratiedatum, _id)
+    [("registratiedatum", DESCENDING), ("_id", DESCENDING)],
+]
+
+def _drop_obsolete(db):
+    for coll, names in OBSOLETE_INDEXES.items():
+        existing = db[coll].index_information()
+        for name in names:
+            if name in existing:
+                db[coll].drop_index(name)
 
 def ensure_indexes(db):
     # users
@@ -7,6 +31,12 @@ def ensure_indexes(db):
 
     # students
     db.students.create_index([("studentnummer", ASCENDING)], unique=True)
+    # lijst: sortering + keyset paginering op (achternaam, voornaam, _id)
+    db.students.create_index([("achternaam", ASCENDING), ("voornaam", ASCENDING), ("_id", ASCENDING)])
+    # zoeken: multikey index op genormaliseerde prefix-sleutels (zie search.py)
+    db.students.create_index([("zoek", ASCENDING)])
+    # rapport: filter op opleiding, gesorteerd op naam
+    db.students.create_index([("opleiding_id", ASCENDING), ("achternaam", ASCENDING), ("voornaam", ASCENDING), ("_id", ASCENDING)])
 
     # opleidingen
     db.opleidingen.create_index([("naam", ASCENDING)], unique=True)
@@ -29,7 +59,33 @@ def ensure_indexes(db):
          ("kans", ASCENDING)],
         unique=True
     )
+    # rapport + statistiek: filter op academiejaar (+ OPO's)
+    db.resultaten.create_index([("academiejaar", ASCENDING), ("opo_id", ASCENDING)])
+    # student detail: resultaten van 1 student, gesorteerd op jaar/OPO/kans
+    db.resultaten.create_index(
+        [("student_id", ASCENDING),
+         ("academiejaar", ASCENDING),
+         ("opo_id", ASCENDING),
+         ("kans", ASCENDING)]
+    )
+
+    # API /results (keyset op _id) gefilterd op student, OPO of jaar: zonder SORT-stage.
+    # (opo_id, _id) dient ook OPO verwijderen (cascade) en de wezen-opruiming, zie cascade.py
+    for field in ("student_id", "opo_id", "academiejaar"):
+        db.resultaten.create_index([(field, ASCENDING), ("_id", ASCENDING)])
+
+    # opo_stats: gematerialiseerde tellingen per (academiejaar, opo, opleiding); zie stats.py
+    db.opo_stats.create_index(
+        [("academiejaar", ASCENDING),
+         ("opo_id", ASCENDING),
+         ("opleiding_id", ASCENDING)],
+        unique=True
+    )
+
+    # student_logs: zie STUDENT_LOG_INDEXES
+    for keys in STUDENT_LOG_INDEXES:
+        db.student_logs.create_index(keys)
+    _drop_obsolete(db)
 
-    # student_logs: handige query-indexen
-    db.student_logs.create_index([("student_id", ASCENDING)])
-    db.student_logs.create_index([("registratiedatum", ASCENDING)])
+    # jobs: opruimen op leeftijd
+    db.jobs.create_index([("created", ASCENDING)])
@@ -0,0 +1,332 @@
+# app/imports.py
+import csv, io, json, re
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from .cache import bump
+from .search import with_search_keys
+from .stats import inc_counters, move_student, result_changes, snapshot, triple
+
+DEFAULT_BATCH_SIZE = 1000
+PROGRESS_EVERY = 500   # rijen tussen twee progress()-callbacks
+AJ_RE = re.compile(r"^\d{4}-\d{4}$")
+
+
+class ImportReport:
+    """
+    Counters + per-row error messages for one import run. With track_items=True
+    it also keeps a per-item outcome list (used by the JSON bulk API).
+    """
+    def __init__(self, track_items=False):
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors = []
+        self.items = [] if track_items else None
+
+    def error(self, line, msg, skip=True):
+        if skip:
+            self.skipped += 1
+            if self.items is not None:
+                self.items.append({"index": line, "status": "error", "error": str(msg)})
+        self.errors.append(f"Rij {line}: {msg}")
+
+    def ok(self, line, status, _id=None):
+        if self.items is not None:
+            item = {"index": line, "status": status}
+            if _id is not None:
+                item["_id"] = str(_id)
+            self.items.append(item)
+
+    def summary(self) -> str:
+        return f"Import klaar. Nieuw: {self.created}, Bijgewerkt: {self.updated}, Overgeslagen: {self.skipped}."
+
+    def to_dict(self):
+        out = {
+            "created": self.created,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
+        if self.items is not None:
+            out["items"] = sorted(self.items, key=lambda d: d["index"])
+        return out
+
+
+def open_text(file_storage):
+    """
+    Wrap an uploaded file (werkzeug FileStorage) as a text stream without reading
+    it into memory first. UTF-8 with or without BOM.
+    """
+    return io.TextIOWrapper(file_storage.stream, encoding="utf-8-sig", newline="")
+
+
+def iter_rows(text_stream, fmt="csv"):
+    """
+    Yields (line_no, row_dict) from a CSV (header on line 1) or NDJSON stream.
+    Blank NDJSON lines are ignored; a line that is not a JSON object yields (line_no, None).
+    """
+    if fmt == "ndjson":
+        for i, line in enumerate(text_stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield i, row if isinstance(row, dict) else None
+    else:
+        yield from enumerate(csv.DictReader(text_stream), start=2)
+
+
+def detect_format(filename, mimetype=""):
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (mimetype or ""):
+        return "ndjson"
+    return "csv"
+
+
+def flush_upserts(coll, ops, lines, report):
+    """
+    Send the pending UpdateOne ops as one unordered bulk_write and fold the outcome
+    into the report. lines[i] is the source line number of ops[i].
+    Returns the indexes of the ops that failed.
+    """
+    if not ops:
+        return set()
+    failed = set()
+    try:
+        details = coll.bulk_write(ops, ordered=False).bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for err in details.get("writeErrors", []):
+            failed.add(err["index"])
+            report.error(lines[err["index"]], err.get("errmsg", "schrijffout"))
+
+    report.created += details.get("nUpserted", 0)
+    report.updated += details.get("nModified", 0)
+    # matched but nothing changed -> bestond al, geen wijzigingen
+    report.skipped += details.get("nMatched", 0) - details.get("nModified", 0)
+    if report.items is not None:
+        upserted = {u["index"]: u["_id"] for u in details.get("upserted", [])}
+        for idx, line in enumerate(lines):
+            if idx not in failed:
+                report.ok(line, "created" if idx in upserted else "ok", upserted.get(idx))
+    return failed
+
+
+class UpsertBatch:
+    """
+    Collects keyed upserts and writes them per `batch_size`. A key that repeats
+    within a batch flushes first, so the last row wins like row-by-row processing.
+    Every flush bumps the version of `collection` (see cache.bump). Call close()
+    at the end.
+    """
+    collection = None
+
+    def __init__(self, db, report, batch_size=DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.report = report
+        self.batch_size = batch_size
+        self.pending = {}   # key -> (line, payload), in op order
+
+    def add(self, line, key, payload):
+        if key in self.pending:
+            self.flush()
+        self.pending[key] = (line, payload)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            items, self.pending = list(self.pending.items()), {}
+            self._write(items)
+            bump(self.db, self.collection)
+
+    close = flush
+
+
+# ---------- Students ----------
+class StudentBatch(UpsertBatch):
+    """
+    Upserts on studentnummer; payload is the $set doc. Existing students whose
+    opleiding changes take their opo_stats contribution along.
+    """
+    collection = "students"
+
+    def _write(self, items):
+        db = self.db
+        new_opl = {snr: doc["opleiding_id"] for snr, (_, doc) in items if "opleiding_id" in doc}
+        old = {}
+        if new_opl:
+            old = {
+                s["studentnummer"]: s
+                for s in db.students.find({"studentnummer": {"$in": list(new_opl)}}, {"studentnummer": 1, "opleiding_id": 1})
+            }
+        ops = [UpdateOne({"studentnummer": snr}, {"$set": with_search_keys(doc)}, upsert=True) for snr, (_, doc) in items]
+        created = self.report.created
+        failed = flush_upserts(db.students, ops, [line for _, (line, _) in items], self.report)
+        inc_counters(db, students=self.report.created - created)
+
+        for idx in failed:
+            old.pop(items[idx][0], None)
+        for snr, s in old.items():
+            if s.get("opleiding_id") != new_opl[snr]:
+                move_student(db, s["_id"], s.get("opleiding_id"), new_opl[snr])
+
+def import_students(db, text_stream, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Upsert students (keyed on studentnummer) from a CSV text stream in batches.
+    Columns: studentnummer, voornaam, achternaam, inschrijfdatum, opleiding_label.
+    progress(line) is called every PROGRESS_EVERY rows (background jobs).
+    """
+    report = ImportReport()
+
+    # Build label -> opleiding_id map: "Naam — dag_avond"
+    opl_map = {}
+    for o in db.opleidingen.find({}, {"naam": 1, "dag_avond": 1}):
+        label = f"{o.get('naam','').strip()} — {o.get('dag_avond','').strip()}".strip()
+        opl_map[label] = o["_id"]
+
+    batch = StudentBatch(db, report, batch_size)
+    try:
+        for i, row in iter_rows(text_stream):  # header is regel 1
+            if progress and i % PROGRESS_EVERY == 0:
+                progress(i)
+            try:
+                snr = (row.get("studentnummer") or "").strip()
+                vn  = (row.get("voornaam") or "").strip()
+                an  = (row.get("achternaam") or "").strip()
+                ins = (row.get("inschrijfdatum") or "").strip()
+                opl_label = (row.get("opleiding_label") or "").strip()
+
+                if not snr or not vn or not an:
+                    report.error(i, "ontbrekende verplichte velden (studentnummer/voornaam/achternaam).")
+                    continue
+
+                doc = {
+                    "studentnummer": snr,
+                    "voornaam": vn,
+                    "achternaam": an,
+                    "inschrijfdatum": ins,
+                }
+
+                if opl_label:
+                    opl_id = opl_map.get(opl_label)
+                    if opl_id:
+                        doc["opleiding_id"] = opl_id
+                    else:
+                        # onbekende opleiding is oké; laten we gewoon melden
+                        report.error(i, f"opleiding niet gevonden: '{opl_label}'. Student aangemaakt zonder opleiding.", skip=False)
+
+                batch.add(i, snr, doc)
+
+            except Exception as e:
+                report.error(i, e)
+    except (UnicodeDecodeError, csv.Error) as e:
+        report.errors.append(f"Kon CSV niet verder lezen: {e}")
+
+    batch.close()
+    return report
+
+
+# ---------- Resultaten (cijfers) ----------
+def _cell(row, *keys):
+    for k in keys:
+        val = row.get(k)
+        if val is not None and str(val).strip() != "":
+            return str(val).strip()
+    return ""
+
+def parse_cijfer(raw):
+    """
+    "" / "NA" / None -> None (NA); otherwise a float 0–20 (decimal comma allowed).
+    """
+    if raw is None:
+        return None
+    txt = str(raw).strip()
+    if txt == "" or txt.upper() == "NA":
+        return None
+    val = float(txt.replace(",", "."))
+    if not 0 <= val <= 20:
+        raise ValueError(f"cijfer buiten bereik 0–20: {txt}")
+    return val
+
+class ResultBatch(UpsertBatch):
+    """
+    Upserts on (student_id, opo_id, academiejaar, kans); payload is the cijfer.
+    One snapshot query of the touched (student, opo, aj) per batch keeps
+    counters and opo_stats exact.
+    """
+    collection = "resultaten"
+
+    def _write(self, items):
+        db = self.db
+        writes = [({"student_id": s, "opo_id": o, "academiejaar": aj, "kans": k}, cijfer)
+                  for (s, o, aj, k), (_, cijfer) in items]
+        before = snapshot(db, {triple(f) for f, _ in writes})
+        ops = [UpdateOne(f, {"$set": {"cijfer": c}}, upsert=True) for f, c in writes]
+        failed = flush_upserts(db.resultaten, ops, [line for _, (line, _) in items], self.report)
+        result_changes(db, [
+            (before[triple(f)].get(f["kans"]), {**f, "cijfer": c})
+            for idx, (f, c) in enumerate(writes) if idx not in failed
+        ], before=before)
+
+def import_results(db, text_stream, fmt="csv", batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Upsert resultaten from CSV/NDJSON in batches on the unique
+    (student_id, opo_id, academiejaar, kans) key.
+    Fields: studentnummer, opo (afkorting of code; ook 'afkorting'/'code'), academiejaar, kans, cijfer.
+    progress(line) is called every PROGRESS_EVERY rows (background jobs).
+    """
+    report = ImportReport()
+
+    # one prefetch per reference collection
+    stu_ids = {s["studentnummer"]: s["_id"] for s in db.students.find({}, {"studentnummer": 1})}
+    opo_ids = {}
+    for o in db.opos.find({}, {"afkorting": 1, "code": 1}):
+        for k in ("code", "afkorting"):
+            if o.get(k):
+                opo_ids[str(o[k]).upper()] = o["_id"]
+
+    batch = ResultBatch(db, report, batch_size)
+    try:
+        for i, row in iter_rows(text_stream, fmt):
+            if progress and i % PROGRESS_EVERY == 0:
+                progress(i)
+            if row is None:
+                report.error(i, "ongeldige JSON-regel.")
+                continue
+            try:
+                snr = _cell(row, "studentnummer")
+                opo = _cell(row, "opo", "afkorting", "code").upper()
+                aj = _cell(row, "academiejaar")
+                kans = int(_cell(row, "kans") or "1")
+
+                if not snr or not opo or not aj:
+                    report.error(i, "ontbrekende verplichte velden (studentnummer/opo/academiejaar).")
+                    continue
+                if not AJ_RE.match(aj):
+                    report.error(i, f"ongeldig academiejaar '{aj}' (verwacht jjjj-jjjj).")
+                    continue
+                if kans not in (1, 2):
+                    report.error(i, f"ongeldige kans '{kans}' (1 of 2).")
+                    continue
+                sid = stu_ids.get(snr)
+                if not sid:
+                    report.error(i, f"student niet gevonden: '{snr}'.")
+                    continue
+                opo_id = opo_ids.get(opo)
+                if not opo_id:
+                    report.error(i, f"OPO niet gevonden: '{opo}'.")
+                    continue
+
+                batch.add(i, (sid, opo_id, aj, kans), parse_cijfer(row.get("cijfer")))
+
+            except Exception as e:
+                report.error(i, e)
+    except (UnicodeDecodeError, csv.Error) as e:
+        report.errors.append(f"Kon bestand niet verder lezen: {e}")
+
+    batch.close()
+    return report
@@ -0,0 +1,166 @@
+# app/instrument.py
+import heapq, json, logging, threading, time
+from bisect import bisect_left
+from flask import g, request, jsonify, Blueprint
+from flask_login import login_required
+from pymongo import monitoring
+
+log = logging.getLogger("app.slow")
+
+SLOWEST_KEPT = 5
+HIST_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)  # + overflow bucket
+
+
+class RequestStats:
+    """Mongo commands issued while handling one request."""
+    __slots__ = ("count", "db_ms", "slowest")
+
+    def __init__(self):
+        self.count = 0
+        self.db_ms = 0.0
+        self.slowest = []   # min-heap of (ms, command, collection)
+
+    def add(self, ms, command, collection):
+        self.count += 1
+        self.db_ms += ms
+        item = (ms, command, collection)
+        if len(self.slowest) < SLOWEST_KEPT:
+            heapq.heappush(self.slowest, item)
+        elif ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def top(self):
+        return [{"ms": round(ms, 2), "cmd": cmd, "coll": coll} for ms, cmd, coll in sorted(self.slowest, reverse=True)]
+
+
+class DBMonitor(monitoring.CommandListener):
+    """
+    pymongo command listener. pymongo calls it on the thread that runs the
+    command, so a thread-local RequestStats (set up per request) collects
+    the commands of that request only.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def begin(self):
+        self._local.stats = RequestStats()
+        self._local.pending = {}
+        return self._local.stats
+
+    def end(self):
+        stats = getattr(self._local, "stats", None)
+        self._local.stats = None
+        self._local.pending = {}
+        return stats
+
+    def started(self, event):
+        if getattr(self._local, "stats", None) is not None:
+            coll = event.command.get(event.command_name)
+            self._local.pending[event.request_id] = coll if isinstance(coll, str) else ""
+
+    def _finish(self, event):
+        stats = getattr(self._local, "stats", None)
+        if stats is not None:
+            coll = self._local.pending.pop(event.request_id, "")
+            stats.add(event.duration_micros / 1000.0, event.command_name, coll)
+
+    succeeded = _finish
+    failed = _finish
+
+
+class EndpointHistograms:
+    """Per-endpoint latency histogram + totals, for /debug/stats."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def add(self, endpoint, ms, stats):
+        with self._lock:
+            d = self._data.setdefault(endpoint, {
+                "requests": 0, "total_ms": 0.0, "max_ms": 0.0, "db_commands": 0, "db_ms": 0.0,
+                "hist": [0] * (len(HIST_BOUNDS_MS) + 1),
+            })
+            d["requests"] += 1
+            d["total_ms"] += ms
+            d["max_ms"] = max(d["max_ms"], ms)
+            d["hist"][bisect_left(HIST_BOUNDS_MS, ms)] += 1
+            if stats is not None:
+                d["db_commands"] += stats.count
+                d["db_ms"] += stats.db_ms
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for endpoint, d in sorted(self._data.items()):
+                n = d["requests"]
+                out[endpoint] = {
+                    "requests": n,
+                    "avg_ms": round(d["total_ms"] / n, 2),
+                    "max_ms": round(d["max_ms"], 2),
+                    "avg_db_commands": round(d["db_commands"] / n, 2),
+                    "avg_db_ms": round(d["db_ms"] / n, 2),
+                    "hist_bounds_ms": list(HIST_BOUNDS_MS) + ["+inf"],
+                    "hist": list(d["hist"]),
+                }
+            return out
+
+
+def init_instrumentation(app, monitor):
+    """
+    Per request: Mongo command count + DB time as a Server-Timing header, and a
+    JSON line on the 'app.slow' logger above SLOW_REQUEST_MS. With DEBUG_STATS on,
+    /debug/stats serves per-endpoint histograms.
+    Streamed bodies (CSV exports, API lists) run after the headers are sent; their
+    commands count towards the slow-log entry but not the header.
+    """
+    slow_ms = app.config["SLOW_REQUEST_MS"]
+    histograms = EndpointHistograms() if app.config["DEBUG_STATS"] else None
+
+    @app.before_request
+    def _instrument_begin():
+        g._t0 = time.perf_counter()
+        g._db_stats = monitor.begin()
+
+    @app.after_request
+    def _instrument_header(response):
+        stats = g.get("_db_stats")
+        if stats is not None:
+            app_ms = (time.perf_counter() - g._t0) * 1000
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={stats.db_ms:.1f};desc="{stats.count} queries", app;dur={app_ms:.1f}',
+            )
+        g._status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _instrument_end(exc=None):
+        if "_t0" not in g:
+            return
+        ms = (time.perf_counter() - g._t0) * 1000
+        stats = monitor.end()
+        endpoint = request.endpoint or "<geen endpoint>"
+        if histograms is not None:
+            histograms.add(endpoint, ms, stats)
+        if ms >= slow_ms:
+            log.warning(json.dumps({
+                "event": "slow_request",
+                "method": request.method,
+                "path": request.full_path.rstrip("?"),
+                "endpoint": endpoint,
+                "status": g.get("_status", 500),
+                "ms": round(ms, 1),
+                "db_commands": stats.count if stats else None,
+                "db_ms": round(stats.db_ms, 1) if stats else None,
+                "slowest": stats.top() if stats else [],
+            }))
+
+    if histograms is not None:
+        debug = Blueprint("debug", __name__)
+
+        @debug.get("/debug/stats")
+        @login_required
+        def debug_stats():
+            return jsonify(histograms.snapshot())
+
+        app.register_blueprint(debug)
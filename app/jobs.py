@@ -0,0 +1,215 @@
+# app/jobs.py
+import csv, io, logging, os, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from flask import current_app
+from .imports import import_students, import_results
+from .reports import (rapport_rows, rapport_table, rapport_multi, rapport_multi_table, grade_text, grade_value,
+                      student_match)
+from .xlsx import MIMETYPE as XLSX_MIMETYPE, xlsx_stream
+
+log = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+PROGRESS_INTERVAL = 1.0     # seconden tussen twee progress-updates in Mongo
+MAX_STORED_ERRORS = 100     # in het job-document; het volledige rapport staat in het bestand
+
+
+class Job:
+    """
+    Handle passed to a job function: its parameters, the spooled input file,
+    throttled progress updates and output files.
+    """
+    def __init__(self, runner, doc):
+        self.runner = runner
+        self.id = doc["_id"]
+        self.params = doc.get("params") or {}
+        self.input_path = doc.get("input")
+        self.output = None
+        self._last = 0.0
+
+    def progress(self, done, total=None, force=False, **extra):
+        now = time.monotonic()
+        if not force and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        self.runner.db.jobs.update_one(
+            {"_id": self.id},
+            {"$set": {"progress": {"done": done, "total": total, **extra}, "updated": datetime.utcnow()}},
+        )
+
+    def output_file(self, name, mimetype="text/csv"):
+        """Path to write the downloadable result to; registered on the job."""
+        path = self.runner.path(self.id, os.path.splitext(name)[1] or ".out")
+        self.output = {"path": path, "name": name, "mimetype": mimetype}
+        return path
+
+
+class JobRunner:
+    """
+    Runs long imports/exports on a thread pool (the work is Mongo I/O, so threads
+    are enough). Jobs are persisted in the 'jobs' collection; uploads and
+    results live in `spool_dir`, which must be shared when several processes
+    serve the same users. Finished jobs and their files are purged after
+    `keep_hours`.
+    """
+    def __init__(self, app, db, spool_dir, max_workers=2, keep_hours=24, stale_seconds=600):
+        self.app = app
+        self.db = db
+        self.spool_dir = spool_dir
+        self.keep = timedelta(hours=keep_hours)
+        self.stale = timedelta(seconds=stale_seconds)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def path(self, job_id, suffix):
+        return os.path.join(self.spool_dir, f"{job_id}{suffix}")
+
+    def spool(self, file_storage):
+        """Save an upload to disk; returns (job_id, path) for submit()."""
+        job_id = ObjectId()
+        path = self.path(job_id, ".upload")
+        file_storage.save(path)
+        return job_id, path
+
+    def submit(self, kind, fn, params=None, job_id=None, input_path=None, user_id=None):
+        now = datetime.utcnow()
+        doc = {
+            "_id": job_id or ObjectId(),
+            "kind": kind,
+            "status": QUEUED,
+            "params": params or {},
+            "input": input_path,
+            "user_id": user_id,
+            "progress": {"done": 0, "total": None},
+            "created": now,
+            "updated": now,
+        }
+        self.db.jobs.insert_one(doc)
+        self.pool.submit(self._run, doc, fn)
+        self.purge()
+        return doc["_id"]
+
+    def _run(self, doc, fn):
+        job = Job(self, doc)
+        with self.app.app_context():
+            self.db.jobs.update_one({"_id": job.id}, {"$set": {"status": RUNNING, "started": datetime.utcnow(),
+                                                               "updated": datetime.utcnow()}})
+            try:
+                result = fn(job) or {}
+                upd = {"status": DONE, "result": result}
+                if job.output:
+                    upd["file"] = job.output
+            except Exception as e:  # job failures end up in the job doc, not in a request
+                log.exception("job %s (%s) failed", job.id, doc["kind"])
+                upd = {"status": FAILED, "error": str(e)}
+            finally:
+                if job.input_path and os.path.exists(job.input_path):
+                    os.remove(job.input_path)
+            now = datetime.utcnow()
+            self.db.jobs.update_one({"_id": job.id}, {"$set": {**upd, "finished": now, "updated": now}})
+
+    def get(self, job_id):
+        """Job doc, with running/queued jobs that stopped reporting marked as failed."""
+        doc = self.db.jobs.find_one({"_id": job_id})
+        if doc and doc["status"] in (QUEUED, RUNNING) and datetime.utcnow() - doc["updated"] > self.stale:
+            doc["status"] = FAILED
+            doc["error"] = "Job reageert niet meer (herstart van de server?)."
+        return doc
+
+    def purge(self):
+        cutoff = datetime.utcnow() - self.keep
+        old = list(self.db.jobs.find({"created": {"$lt": cutoff}}, {"input": 1, "file": 1}))
+        for d in old:
+            for p in (d.get("input"), (d.get("file") or {}).get("path")):
+                if p and os.path.exists(p):
+                    os.remove(p)
+        if old:
+            self.db.jobs.delete_many({"_id": {"$in": [d["_id"] for d in old]}})
+
+
+def public(doc):
+    """Job doc as JSON for the polling endpoint (no server paths)."""
+    prog = doc.get("progress") or {}
+    total = prog.get("total")
+    return {
+        "id": str(doc["_id"]),
+        "kind": doc["kind"],
+        "status": doc["status"],
+        "progress": prog,
+        "percent": round(prog.get("done", 0) * 100.0 / total, 1) if total else None,
+        "result": doc.get("result"),
+        "error": doc.get("error"),
+        "download": bool(doc.get("file")),
+    }
+
+
+# ---------- taken ----------
+def _import_job(job, import_fn, **kw):
+    size = os.path.getsize(job.input_path)
+    with open(job.input_path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        report = import_fn(
+            current_app.db, text, batch_size=current_app.config["IMPORT_BATCH_SIZE"],
+            progress=lambda rows: job.progress(raw.tell(), size, rows=rows), **kw,
+        )
+    job.progress(size, size, force=True)
+
+    result = report.to_dict()
+    result["summary"] = report.summary()
+    if report.errors:
+        with open(job.output_file("importfouten.csv"), "w", newline="", encoding="utf-8") as fh:
+            w = csv.writer(fh)
+            w.writerow(["fout"])
+            w.writerows([e] for e in report.errors)
+        result["errors"] = report.errors[:MAX_STORED_ERRORS]
+    return result
+
+
+def students_import_job(job):
+    return _import_job(job, import_students)
+
+
+def results_import_job(job):
+    return _import_job(job, import_results, fmt=job.params.get("fmt", "csv"))
+
+
+def rapport_export_job(job):
+    p = job.params
+    _, opos_map = current_app.refcache.get("opos")
+    shown_opos = [opos_map[i] for i in p["sel_opo_ids"] if i in opos_map]
+    xlsx = p.get("fmt") == "xlsx"
+    grade = grade_value if xlsx else grade_text
+    db, budget = current_app.report_db, current_app.config["MAX_TIME_MS"].get("job") or None
+    if sel_ajs := p.get("sel_ajs"):
+        rows, _ = rapport_multi(db, sel_ajs, p["sel_opl"], p["sel_opo_ids"], max_time_ms=budget)
+        total = len(rows)
+        header, lines = rapport_multi_table(rows, shown_opos, sel_ajs, grade)
+        name = f"rapport_{sel_ajs[0]}_{sel_ajs[-1]}"
+    else:
+        rows = rapport_rows(db, p["sel_aj"], p["sel_opl"], p["sel_opo_ids"],
+                            batch_size=current_app.config["EXPORT_BATCH_SIZE"], max_time_ms=budget)
+        total = db.students.count_documents(student_match(p["sel_opl"]))
+        header, lines = rapport_table(rows, shown_opos, grade)
+        name = f"rapport_{p['sel_aj'] or 'onbekend'}"
+
+    n = 0
+
+    def counted():
+        nonlocal n
+        for n, line in enumerate(lines, 1):
+            yield line
+            job.progress(n, total)
+
+    if xlsx:
+        with open(job.output_file(name + ".xlsx", XLSX_MIMETYPE), "wb") as fh:
+            for chunk in xlsx_stream(header, counted(), "Rapport"):
+                fh.write(chunk)
+    else:
+        with open(job.output_file(name + ".csv"), "w", newline="", encoding="utf-8") as fh:
+            w = csv.writer(fh)
+            w.writerow(header)
+            w.writerows(counted())
+    job.progress(n, n, force=True)
+    return {"rows": n}
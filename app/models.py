@@ -1,29 +1,108 @@
 # app/models.py
+import threading, time
+from collections import OrderedDict
 from typing import Optional, Dict, Any
-from flask_login import UserMixin
 
-class User(UserMixin):
+# velden die een ingelogde gebruiker nodig heeft (geen password_hash in de cache)
+USER_FIELDS = {"email": 1, "name": 1, "role": 1, "auth_version": 1}
+
+
+class User:
     """
-    Tiny wrapper around a Mongo 'users' document so Flask-Login works.
+    Compact, read-only view of a Mongo 'users' document for Flask-Login.
+    Implements the Flask-Login user interface itself (no UserMixin) so the
+    instances stay __slots__-only: they are cached and shared between requests.
     """
-    def __init__(self, doc: Optional[Dict[str, Any]] = None):
-        self.doc = doc or {}
-        # Flask-Login expects an 'id' attribute that is a string
-        self.id = str(self.doc.get("_id")) if self.doc.get("_id") else None
+    __slots__ = ("id", "email", "name", "role", "auth_version")
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id: str, email: str = "", name: str = "", role: str = "viewer", auth_version: int = 0):
+        self.id = id                      # Flask-Login expects a string id
+        self.email = email
+        self.name = name
+        self.role = role                  # viewer | admin | logger (future use)
+        self.auth_version = auth_version  # +1 bij elke rol- of wachtwoordwijziging
 
-    @property
-    def email(self) -> str:
-        return self.doc.get("email", "")
+    def get_id(self) -> str:
+        return self.id
 
-    @property
-    def name(self) -> str:
-        return self.doc.get("name", "")
+    def __eq__(self, other):
+        return isinstance(other, User) and self.id == other.id
 
-    @property
-    def role(self) -> str:
-        # viewer | admin | logger (future use)
-        return self.doc.get("role", "viewer")
+    def __hash__(self):
+        return hash(self.id)
+
+    def claim(self, users_version: int = 0) -> Dict[str, Any]:
+        """
+        Session claim (the cookie is signed with SECRET_KEY); `users_version` is
+        the 'users' marker in 'versions' it was issued under.
+        """
+        return {"id": self.id, "email": self.email, "name": self.name, "role": self.role,
+                "v": self.auth_version, "uv": users_version, "iat": int(time.time())}
+
+    @staticmethod
+    def from_claim(claim: Dict[str, Any]) -> "User":
+        return User(claim["id"], claim.get("email", ""), claim.get("name", ""),
+                    claim.get("role", "viewer"), claim.get("v", 0))
 
     @staticmethod
     def from_doc(doc: Optional[Dict[str, Any]]):
-        return User(doc) if doc else None
+        if not doc:
+            return None
+        return User(str(doc["_id"]), doc.get("email", ""), doc.get("name", ""),
+                    doc.get("role", "viewer"), doc.get("auth_version", 0))
+
+
+class UserCache:
+    """
+    Small TTL + LRU cache of User objects keyed by id, so load_user does not hit
+    Mongo on every request. invalidate(id, version) drops an entry and remembers
+    the new auth_version: session claims carrying an older version are refused
+    in this process. Other processes see the change through the 'users' version
+    marker (see sync) within the RefCache check interval.
+    """
+    def __init__(self, ttl=60.0, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # id -> (expires_at, User)
+        self._min_version = {}          # id -> lowest auth_version still valid
+        self._users_version = None      # 'users' marker the entries were loaded under
+
+    def sync(self, users_version):
+        """Drops every entry when the 'users' version marker moved since the last call."""
+        with self._lock:
+            if users_version != self._users_version:
+                self._entries.clear()
+                self._users_version = users_version
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user):
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def accepts(self, user):
+        """False when `user` (e.g. from a session claim) predates an invalidation."""
+        return user.auth_version >= self._min_version.get(user.id, 0)
+
+    def invalidate(self, user_id, version=None):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            if version is not None:
+                self._min_version[user_id] = max(version, self._min_version.get(user_id, 0))
@@ -0,0 +1,107 @@
+# app/paging.py
+import base64, json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def _tag(v):
+    if isinstance(v, ObjectId):
+        return {"$oid": str(v)}
+    if isinstance(v, datetime):
+        return {"$date": v.isoformat()}
+    return v
+
+
+def _untag(v):
+    if isinstance(v, dict):
+        if "$oid" in v:
+            return ObjectId(v["$oid"])
+        if "$date" in v:
+            return datetime.fromisoformat(v["$date"])
+    return v
+
+
+def encode_cursor(values):
+    """
+    Opaque, URL-safe token for the sort-key values of the last/first row on a page.
+    ObjectIds and datetimes are tagged so they round-trip.
+    """
+    out = [_tag(v) for v in values]
+    raw = json.dumps(out, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Inverse of encode_cursor; returns None for a missing or malformed token.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw.decode("utf-8"))
+        if not isinstance(values, list):
+            return None
+        return [_untag(v) for v in values]
+    except (ValueError, TypeError, InvalidId):
+        return None
+
+
+def keyset_filter(sort, values, backwards=False):
+    """
+    Mongo filter for "rows after `values`" in the given sort, e.g.
+    sort=[("achternaam", 1), ("voornaam", 1), ("_id", 1)].
+    With backwards=True it selects the rows before `values` instead.
+    """
+    ors = []
+    for i, (field, direction) in enumerate(sort):
+        forward = (direction == 1) != backwards
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if forward else "$lt": values[i]}
+        ors.append(clause)
+    return {"$or": ors}
+
+
+def and_filters(query, extra):
+    """Both filters; `extra` alone when `query` is empty."""
+    return {"$and": [query, extra]} if query else extra
+
+
+def reverse_sort(sort):
+    return [(f, -d) for f, d in sort]
+
+
+def keyset_page(coll, query, sort, limit, after=None, before=None, projection=None):
+    """
+    One page of `coll.find(query)` in `sort` order, starting after (or ending
+    before) a cursor token. The last sort field must be unique (normally _id).
+
+    Returns (docs, next_token, prev_token); a token is None when there is no
+    such page.
+    """
+    fields = [f for f, _ in sort]
+    after_vals = decode_cursor(after)
+    before_vals = decode_cursor(before) if after_vals is None else None
+    if after_vals is not None and len(after_vals) != len(sort):
+        after_vals = None
+    if before_vals is not None and len(before_vals) != len(sort):
+        before_vals = None
+
+    if before_vals is not None:
+        q = and_filters(query, keyset_filter(sort, before_vals, backwards=True))
+        docs = list(coll.find(q, projection).sort(reverse_sort(sort)).limit(limit + 1))
+        has_prev, has_next = len(docs) > limit, True
+        docs = docs[:limit][::-1]
+    else:
+        q = and_filters(query, keyset_filter(sort, after_vals)) if after_vals is not None else query
+        docs = list(coll.find(q, projection).sort(sort).limit(limit + 1))
+        has_prev, has_next = after_vals is not None, len(docs) > limit
+        docs = docs[:limit]
+
+    def token(doc):
+        return encode_cursor([doc.get(f) for f in fields])
+
+    next_token = token(docs[-1]) if docs and has_next else None
+    prev_token = token(docs[0]) if docs and has_prev else None
+    return docs, next_token, prev_token
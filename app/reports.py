@@ -0,0 +1,395 @@
+# app/reports.py
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from statistics import fmean, median, pstdev
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from .stats import read_opo_stats
+
+TOO_LARGE = "Rapport te groot: verfijn de filters (minder OPO’s of academiejaren, één opleiding)."
+# MaxTimeMSExpired, BSONObjectTooLarge (resultaat > 16 MB), $facet boven zijn geheugenlimiet
+TOO_LARGE_CODES = (50, 10334, 4031700)
+
+
+class ReportTooLarge(Exception):
+    """A report query ran out of its maxTimeMS budget or over MongoDB's size limits."""
+    def __init__(self, message=TOO_LARGE):
+        super().__init__(message)
+
+
+@contextmanager
+def budgeted():
+    """Turns a server-side time-out or size error into ReportTooLarge."""
+    try:
+        yield
+    except OperationFailure as e:
+        if e.code in TOO_LARGE_CODES:
+            raise ReportTooLarge() from e
+        raise
+
+
+def _agg_opts(max_time_ms=None, **kw):
+    """aggregate() options without the unset ones; maxTimeMS is the cursor's server-side budget."""
+    kw["maxTimeMS"] = max_time_ms
+    return {k: v for k, v in kw.items() if v}
+
+
+def _oids(ids):
+    return [ObjectId(x) for x in ids if ObjectId.is_valid(x)]
+
+
+def student_match(sel_opl):
+    """The students filter for the chosen opleiding (empty: all students)."""
+    stu_q = {}
+    if sel_opl and ObjectId.is_valid(sel_opl):
+        stu_q["opleiding_id"] = ObjectId(sel_opl)
+    return stu_q
+
+
+def _result_match(sel_aj, sel_opo_ids):
+    res_q = {"academiejaar": sel_aj}
+    if sel_opo_ids:
+        res_q["opo_id"] = {"$in": _oids(sel_opo_ids)}
+    return res_q
+
+
+def rapport_rows(db, sel_aj, sel_opl="", sel_opo_ids=(), batch_size=None, max_time_ms=None):
+    """
+    Best (max) cijfer per (student, OPO) for one academiejaar, computed server-side.
+    NA (cijfer None) only counts as best when the student has no numeric grade;
+    'kans' is the kans of the best grade. Raises ReportTooLarge when the cursor
+    runs over `max_time_ms`.
+
+    Yields {"student": {...}, "cells": {opo_id_str: {"best": float|None, "kans": int}}}
+    for every student in the (optional) opleiding, sorted by naam.
+    """
+    pipeline = [
+        {"$match": student_match(sel_opl)},
+        {"$sort": {"achternaam": 1, "voornaam": 1}},
+        {"$project": {"studentnummer": 1, "achternaam": 1, "voornaam": 1}},
+        {"$lookup": {
+            "from": "resultaten",
+            "let": {"sid": "$_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$student_id", "$$sid"]}, **_result_match(sel_aj, sel_opo_ids)}},
+                # descending sort puts null (NA) after every numeric grade
+                {"$sort": {"cijfer": -1, "kans": 1}},
+                {"$group": {"_id": "$opo_id", "best": {"$first": "$cijfer"}, "kans": {"$first": "$kans"}}},
+            ],
+            "as": "cells",
+        }},
+    ]
+    with budgeted():
+        for doc in db.students.aggregate(pipeline, **_agg_opts(max_time_ms, batchSize=batch_size)):
+            cells = {}
+            for c in doc.pop("cells", []):
+                best = c.get("best")
+                cells[str(c["_id"])] = {"best": None if best is None else float(best), "kans": c.get("kans")}
+            doc["_id"] = str(doc["_id"])
+            yield {"student": doc, "cells": cells}
+
+
+def grade_text(best):
+    """Cijfer cell for CSV: 'NA' or one decimal."""
+    return "NA" if best is None else f"{best:.1f}"
+
+
+def grade_value(best):
+    """Cijfer cell for XLSX: 'NA' or the number itself."""
+    return "NA" if best is None else best
+
+
+def rapport_table(rows, shown_opos, grade=grade_text):
+    """
+    CSV/XLSX layout of the rapport: (header, iterator of lines) for the rows of
+    rapport_rows() and the chosen OPO's (cache docs with string _id); `grade`
+    formats a best cijfer.
+    """
+    header = ["studentnummer", "achternaam", "voornaam"]
+    header += [f"{o['afkorting']} — {o['naam']}" for o in shown_opos] or ["— geen OPO’s gekozen —"]
+
+    def lines():
+        for r in rows:
+            stu = r["student"]
+            line = [stu.get("studentnummer", ""), stu.get("achternaam", ""), stu.get("voornaam", "")]
+            if shown_opos:
+                for o in shown_opos:
+                    cell = r["cells"].get(o["_id"])
+                    if not cell:
+                        line.append("")
+                    else:
+                        line.append(grade(cell["best"]))
+            else:
+                line.append("")
+            yield line
+
+    return header, lines()
+
+
+def rapport_opo_stats(db, sel_aj, sel_opl, sel_opo_ids, opos_map):
+    """
+    Per-OPO totals (passed / failed / NA + percentages) over the best cijfer per
+    student, in the order of sel_opo_ids. Read from the materialised opo_stats
+    (see stats.py), so this costs O(#OPOs) documents instead of a results scan.
+    """
+    if not sel_opo_ids:
+        return []
+
+    opl_id = student_match(sel_opl).get("opleiding_id")
+    counts = {str(k): v for k, v in read_opo_stats(db, sel_aj, _oids(sel_opo_ids), opl_id).items()}
+
+    opo_stats = []
+    for oid_str in sel_opo_ids:
+        d = counts.get(oid_str, {})
+        tot = d.get("total", 0)
+
+        def pct(n):  # None if no denominator
+            return round((n * 100.0) / tot, 1) if tot else None
+
+        opo_stats.append({
+            "id": oid_str,
+            "opo": opos_map.get(oid_str),   # {afkorting, naam, ...}
+            "total": tot,
+            "passed": d.get("passed", 0), "pct_passed": pct(d.get("passed", 0)),
+            "failed": d.get("failed", 0), "pct_failed": pct(d.get("failed", 0)),
+            "na": d.get("na", 0),         "pct_na":     pct(d.get("na", 0)),
+        })
+    return opo_stats
+
+
+# ---------- Rapport over meerdere academiejaren ----------
+def _pct(n, tot):
+    return round((n * 100.0) / tot, 1) if tot else None
+
+
+def rapport_multi(db, sel_ajs, sel_opl="", sel_opo_ids=(), max_time_ms=None):
+    """
+    Best cijfer per (student, OPO, academiejaar) plus per-(OPO, jaar) totals for
+    several academiejaren, in one aggregate: resultaten are reduced per student
+    once, then a $facet builds the pivot rows and the summary from the same input.
+
+    Only students with results in the selection are listed. The $facet output is
+    a single document (16 MB), which is plenty for a cohort; the one-year rapport
+    (rapport_rows) streams and has no such bound. Going over that limit or over
+    `max_time_ms` raises ReportTooLarge.
+
+    Returns (rows, stats): rows as rapport_rows() but with
+    cells = {opo_id_str: {aj: {"best", "kans"}}}, stats = {opo_id_str: {aj: {...}}}.
+    """
+    if not sel_ajs or not sel_opo_ids:
+        return [], {}
+
+    stu_match = {"stu": {"$ne": []}}
+    if opl := student_match(sel_opl):
+        stu_match = {"stu.opleiding_id": opl["opleiding_id"]}
+
+    pipeline = [
+        {"$match": {"academiejaar": {"$in": list(sel_ajs)}, "opo_id": {"$in": _oids(sel_opo_ids)}}},
+        # descending sort puts null (NA) after every numeric grade
+        {"$sort": {"cijfer": -1, "kans": 1}},
+        {"$group": {"_id": {"s": "$student_id", "o": "$opo_id", "aj": "$academiejaar"},
+                    "best": {"$first": "$cijfer"}, "kans": {"$first": "$kans"}}},
+        {"$group": {"_id": "$_id.s",
+                    "cells": {"$push": {"o": "$_id.o", "aj": "$_id.aj", "best": "$best", "kans": "$kans"}}}},
+        {"$lookup": {
+            "from": "students",
+            "let": {"sid": "$_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$sid"]}}},
+                {"$project": {"studentnummer": 1, "achternaam": 1, "voornaam": 1, "opleiding_id": 1}},
+            ],
+            "as": "stu",
+        }},
+        {"$match": stu_match},
+        {"$facet": {
+            "rows": [
+                {"$project": {"cells": 1, "student": {"$arrayElemAt": ["$stu", 0]}}},
+                {"$sort": {"student.achternaam": 1, "student.voornaam": 1, "_id": 1}},
+            ],
+            "stats": [
+                {"$unwind": "$cells"},
+                {"$group": {
+                    "_id": {"o": "$cells.o", "aj": "$cells.aj"},
+                    "total": {"$sum": 1},
+                    "passed": {"$sum": {"$cond": [{"$gte": ["$cells.best", 10]}, 1, 0]}},
+                    "na": {"$sum": {"$cond": [{"$eq": ["$cells.best", None]}, 1, 0]}},
+                }},
+            ],
+        }},
+    ]
+    with budgeted():
+        out = next(db.resultaten.aggregate(pipeline, **_agg_opts(max_time_ms, allowDiskUse=True)),
+                   {"rows": [], "stats": []})
+
+    rows = []
+    for doc in out["rows"]:
+        cells = {}
+        for c in doc["cells"]:
+            best = c.get("best")
+            cells.setdefault(str(c["o"]), {})[c["aj"]] = {"best": None if best is None else float(best),
+                                                          "kans": c.get("kans")}
+        stu = doc["student"]
+        stu.pop("opleiding_id", None)
+        stu["_id"] = str(stu["_id"])
+        rows.append({"student": stu, "cells": cells})
+
+    stats = {}
+    for g in out["stats"]:
+        tot, passed, na = g["total"], g["passed"], g["na"]
+        failed = tot - passed - na
+        stats.setdefault(str(g["_id"]["o"]), {})[g["_id"]["aj"]] = {
+            "total": tot,
+            "passed": passed, "pct_passed": _pct(passed, tot),
+            "failed": failed, "pct_failed": _pct(failed, tot),
+            "na": na, "pct_na": _pct(na, tot),
+        }
+    return rows, stats
+
+
+def rapport_multi_table(rows, shown_opos, sel_ajs, grade=grade_text):
+    """CSV/XLSX layout of rapport_multi(): one column per (OPO, academiejaar)."""
+    header = ["studentnummer", "achternaam", "voornaam"]
+    header += [f"{o['afkorting']} — {o['naam']} ({aj})" for o in shown_opos for aj in sel_ajs]
+
+    def lines():
+        for r in rows:
+            stu = r["student"]
+            line = [stu.get("studentnummer", ""), stu.get("achternaam", ""), stu.get("voornaam", "")]
+            for o in shown_opos:
+                per_aj = r["cells"].get(o["_id"], {})
+                for aj in sel_ajs:
+                    cell = per_aj.get(aj)
+                    line.append(grade(cell["best"]) if cell else "")
+            yield line
+
+    return header, lines()
+
+
+# ---------- Statistiek: verdeling + trends ----------
+HIST_BUCKETS = 21  # 0, 1, ..., 20 (cijfer afgerond naar beneden)
+
+
+def _rate(n, passed):
+    return round(passed * 100.0 / n, 1) if n else None
+
+
+def _describe(acc):
+    """Summary figures for one group: acc = {"vals": array('d'), "na", "k1_n", ...}."""
+    vals = sorted(acc["vals"])
+    n = len(vals)
+    hist = [0] * HIST_BUCKETS
+    for v in vals:
+        hist[min(max(int(v), 0), HIST_BUCKETS - 1)] += 1
+    passed = n - bisect_left(vals, 10.0)
+    return {
+        "n": n + acc["na"],
+        "na": acc["na"],
+        "graded": n,
+        "mean": round(fmean(vals), 2) if n else None,
+        "median": round(median(vals), 2) if n else None,
+        "std": round(pstdev(vals), 2) if n > 1 else (0.0 if n else None),
+        "hist": hist,
+        "passed": passed,
+        "pass_rate": _rate(n + acc["na"], passed),
+        "k1": {"n": acc["k1_n"], "passed": acc["k1_pass"], "rate": _rate(acc["k1_n"], acc["k1_pass"])},
+        "k2": {"n": acc["k2_n"], "passed": acc["k2_pass"], "rate": _rate(acc["k2_n"], acc["k2_pass"])},
+    }
+
+
+def _new_acc():
+    return {"vals": array("d"), "na": 0, "k1_n": 0, "k1_pass": 0, "k2_n": 0, "k2_pass": 0}
+
+
+def _merge(acc, g):
+    acc["vals"].extend(v for v in g["vals"] if v is not None)
+    for k in ("na", "k1_n", "k1_pass", "k2_n", "k2_pass"):
+        acc[k] += g[k]
+
+
+def _trend(per_year):
+    """Year-over-year deltas on mean and pass rate, years sorted ascending."""
+    out, prev = [], None
+    for aj in sorted(per_year):
+        d = {"academiejaar": aj, **_describe(per_year[aj])}
+        if prev is not None:
+            d["delta_mean"] = None if d["mean"] is None or prev["mean"] is None else round(d["mean"] - prev["mean"], 2)
+            d["delta_pass_rate"] = (None if d["pass_rate"] is None or prev["pass_rate"] is None
+                                    else round(d["pass_rate"] - prev["pass_rate"], 1))
+        else:
+            d["delta_mean"] = d["delta_pass_rate"] = None
+        out.append(d)
+        prev = d
+    return out
+
+
+def grade_statistics(db, sel_opl="", sel_opo_ids=(), sel_ajs=(), max_time_ms=None):
+    """
+    Cijferverdeling en trends in één batch over resultaten.
+
+    The server reduces resultaten to one best cijfer per (student, OPO, jaar) and
+    groups those per (OPO, jaar, opleiding) into compact arrays of grades plus
+    kans-1/kans-2 tallies. Python then only merges the arrays and computes mean,
+    median, standard deviation and a 0–20 histogram.
+
+    Returns {"per_opo": {opo_id: [year...]}, "per_opleiding": {opleiding_id: [year...]}}
+    with the years sorted and year-over-year deltas filled in. Raises
+    ReportTooLarge when the aggregate runs over `max_time_ms`.
+    """
+    match = {}
+    if sel_opo_ids:
+        match["opo_id"] = {"$in": _oids(sel_opo_ids)}
+    if sel_ajs:
+        match["academiejaar"] = {"$in": list(sel_ajs)}
+
+    stu_match = {"stu": {"$ne": []}}
+    if opl := student_match(sel_opl):
+        stu_match = {"stu.opleiding_id": opl["opleiding_id"]}
+
+    def kans_best(k):
+        return {"$max": {"$cond": [{"$eq": ["$kans", k]}, "$cijfer", None]}}
+
+    def kans_taken(k):
+        return {"$max": {"$cond": [{"$eq": ["$kans", k]}, 1, 0]}}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"s": "$student_id", "o": "$opo_id", "aj": "$academiejaar"},
+            "best": {"$max": "$cijfer"},
+            "k1": kans_best(1), "k1_taken": kans_taken(1),
+            "k2": kans_best(2), "k2_taken": kans_taken(2),
+        }},
+        {"$lookup": {
+            "from": "students",
+            "let": {"sid": "$_id.s"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$sid"]}}},
+                {"$project": {"opleiding_id": 1}},
+            ],
+            "as": "stu",
+        }},
+        {"$match": stu_match},
+        {"$group": {
+            "_id": {"o": "$_id.o", "aj": "$_id.aj", "opl": {"$arrayElemAt": ["$stu.opleiding_id", 0]}},
+            "vals": {"$push": "$best"},
+            "na": {"$sum": {"$cond": [{"$eq": ["$best", None]}, 1, 0]}},
+            "k1_n": {"$sum": "$k1_taken"},
+            "k1_pass": {"$sum": {"$cond": [{"$gte": ["$k1", 10]}, 1, 0]}},
+            "k2_n": {"$sum": "$k2_taken"},
+            "k2_pass": {"$sum": {"$cond": [{"$gte": ["$k2", 10]}, 1, 0]}},
+        }},
+    ]
+
+    per_opo, per_opl = {}, {}
+    with budgeted():
+        for g in db.resultaten.aggregate(pipeline, **_agg_opts(max_time_ms)):
+            key = g["_id"]
+            for bucket, ident in ((per_opo, key["o"]), (per_opl, key.get("opl"))):
+                acc = bucket.setdefault(ident, {}).setdefault(key["aj"], _new_acc())
+                _merge(acc, g)
+
+    return {
+        "per_opo": {k: _trend(v) for k, v in per_opo.items()},
+        "per_opleiding": {k: _trend(v) for k, v in per_opl.items()},
+    }
@@ -1,6 +1,15 @@
-from flask import Blueprint, request, jsonify, current_app
+import hmac, json, re
+from flask import Blueprint, request, jsonify, current_app, abort, Response, stream_with_context
+from flask_login import current_user
 from datetime import datetime
 from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from .cache import bump
+from .paging import encode_cursor, decode_cursor, keyset_filter, and_filters
+from .imports import ImportReport, StudentBatch, ResultBatch
+from .search import SEARCH_FIELD, with_search_keys
+from .stats import inc_counters, result_changes
 from .schemas import (
     StudentIn, OpleidingIn, OPOIn, CategorieIn, AcademiejaarIn, ResultaatIn, StudentLogIn
 )
@@ -14,11 +23,155 @@ def ser(doc):
     if not doc:
         return doc
     out = dict(doc)
+    out.pop(SEARCH_FIELD, None)   # afgeleide zoeksleutels (search.py) horen niet bij de API
     for k in ("_id", "student_id", "opo_id", "opleiding_id", "categorie_id"):
         if k in out and isinstance(out[k], ObjectId):
             out[k] = str(out[k])
     return out
 
+# ---- Lists: keyset cursor, projection, streamed JSON ----
+# The parsing helpers take the query args explicitly: asgi.py (the async API)
+# shares them. They raise werkzeug HTTPExceptions (abort) on bad input.
+FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+STUDENT_API_SORT = [("studentnummer", 1)]
+RESULT_API_SORT = [("_id", 1)]
+LOG_API_SORT = [("registratiedatum", -1), ("_id", -1)]
+
+def oid_arg(args, name):
+    val = args.get(name)
+    if val is None:
+        return None
+    if not ObjectId.is_valid(val):
+        abort(400, description=f"ongeldige {name}")
+    return ObjectId(val)
+
+def _projection(args, sort):
+    """
+    ?fields=a,b -> projection; the sort fields are always included (cursor).
+    Without ?fields everything except the internal search keys.
+    """
+    raw = args.get("fields", "")
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    if not fields:
+        return {SEARCH_FIELD: 0}
+    bad = [f for f in fields if not FIELD_RE.match(f)]
+    if bad:
+        abort(400, description=f"ongeldige velden: {', '.join(bad)}")
+    proj = dict.fromkeys((f for f in fields if f != SEARCH_FIELD), 1)
+    proj.update((f, 1) for f, _ in sort)
+    return proj
+
+def _limit(args, cfg):
+    try:
+        n = int(args.get("limit", cfg["API_PAGE_SIZE"]))
+    except ValueError:
+        abort(400, description="ongeldige limit")
+    return max(1, min(n, cfg["API_PAGE_MAX"]))
+
+def list_query(args, cfg, query, sort):
+    """
+    (query, projection, limit) for one page of a list endpoint: ?limit, ?fields
+    and the ?after cursor (a keyset condition added to `query`).
+    """
+    after = decode_cursor(args.get("after"))
+    if args.get("after") and (after is None or len(after) != len(sort)):
+        abort(400, description="ongeldige cursor")
+    if after is not None:
+        query = and_filters(query, keyset_filter(sort, after))
+    return query, _projection(args, sort), _limit(args, cfg)
+
+def next_token(last, sort, more):
+    return encode_cursor([last.get(f) for f, _ in sort]) if more else None
+
+def students_filter(args):
+    q = {}
+    if opl := oid_arg(args, "opleiding_id"): q["opleiding_id"] = opl
+    return q
+
+def results_filter(args):
+    q = {}
+    if sid := oid_arg(args, "student_id"):  q["student_id"] = sid
+    if oid := oid_arg(args, "opo_id"):      q["opo_id"] = oid
+    if aj := args.get("academiejaar"):      q["academiejaar"] = aj
+    if kans := args.get("kans", type=int):  q["kans"] = kans
+    if status := args.get("status"):        # "na" | "geslaagd" | "niet"
+        if status == "na": q["cijfer"] = None
+        elif status == "geslaagd": q["cijfer"] = {"$gte": 10}
+        elif status == "niet": q["cijfer"] = {"$lt": 10}
+    return q
+
+def logs_filter(args):
+    q = {}
+    if sid := oid_arg(args, "student_id"): q["student_id"] = sid
+    return q
+
+def list_response(coll, query, sort):
+    """
+    One page of coll.find(query) in `sort` order (last sort field unique), as
+    {"items": [...], "next": token|null}. ?after=<next> continues where the
+    previous page stopped. Items are written while the cursor is iterated, so
+    memory stays bounded for large pages.
+    """
+    query, projection, limit = list_query(request.args, current_app.config, query, sort)
+    cursor = coll.find(query, projection).sort(sort).limit(limit + 1)
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '{"items":['
+        last = None
+        for n, doc in enumerate(cursor):
+            if n == limit:
+                break
+            yield ("," if n else "") + dumps(ser(doc))
+            last = doc
+        more = last is not None and n == limit
+        yield '],"next":' + dumps(next_token(last, sort, more)) + "}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+# ---- Documents to write (shared with asgi.py) ----
+def student_doc(data):
+    """Validated StudentIn dump -> students doc: trimmed, ISO date, ObjectId refs, search keys."""
+    data["studentnummer"] = str(data["studentnummer"]).strip()
+    data["voornaam"] = data["voornaam"].strip()
+    data["achternaam"] = data["achternaam"].strip()
+    # als ISO-string, zoals de imports (BSON kent geen date zonder tijd)
+    data["inschrijfdatum"] = data["inschrijfdatum"].isoformat() if data.get("inschrijfdatum") else ""
+    if data.get("opleiding_id"):
+        data["opleiding_id"] = OID(data["opleiding_id"])
+    return with_search_keys(data)
+
+def log_doc(payload):
+    payload["student_id"] = OID(payload["student_id"])
+    for k in ("categorie_id", "opo_id"):
+        if payload.get(k):
+            payload[k] = OID(payload[k])
+    if not payload.get("registratiedatum"):
+        payload["registratiedatum"] = datetime.utcnow()
+    return payload
+
+# ---- Auth + errors ----
+@bp.before_request
+def require_auth_for_writes():
+    # lezen blijft open; schrijven vraagt het API-token of een login-sessie
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        return None
+    token = current_app.config.get("API_TOKEN")
+    auth = request.headers.get("Authorization", "")
+    if token and auth.startswith("Bearer ") and hmac.compare_digest(auth[7:].strip(), token):
+        return None
+    if current_user.is_authenticated:
+        # met de sessie-cookie enkel JSON/NDJSON: een cross-site <form> of no-cors fetch
+        # kan die content types niet sturen zonder CORS-preflight (CSRF)
+        if request.mimetype not in ("application/json", *NDJSON_TYPES):
+            abort(415, description="verwacht Content-Type application/json of application/x-ndjson")
+        return None
+    abort(401)
+
+@bp.errorhandler(ValidationError)
+def validation_error(e):
+    return jsonify({"error": "validation", "details": e.errors(include_url=False, include_context=False)}), 422
+
 # ---- Ping ----
 @bp.get("/ping")
 def ping():
@@ -27,19 +180,14 @@ def ping():
 # ---- Students ----
 @bp.get("/students")
 def list_students():
-    docs = current_app.db.students.find().sort("studentnummer", 1).limit(200)
-    return jsonify([ser(d) for d in docs])
+    return list_response(current_app.db.students, students_filter(request.args), STUDENT_API_SORT)
 
 @bp.post("/students")
 def create_student():
-    data = StudentIn(**(request.get_json(force=True) or {})).model_dump()
-    # trim & normalize
-    data["studentnummer"] = str(data["studentnummer"]).strip()
-    data["voornaam"] = data["voornaam"].strip()
-    data["achternaam"] = data["achternaam"].strip()
-    if data.get("opleiding_id"):
-        data["opleiding_id"] = OID(data["opleiding_id"])
+    data = student_doc(StudentIn(**(request.get_json(force=True) or {})).model_dump())
     res = current_app.db.students.insert_one(data)
+    bump(current_app.db, "students")
+    inc_counters(current_app.db, students=1)
     data["_id"] = res.inserted_id
     return ser(data), 201
 
@@ -53,6 +201,7 @@ def list_opleidingen():
 def create_opleiding():
     data = OpleidingIn(**(request.get_json(force=True) or {})).model_dump()
     res = current_app.db.opleidingen.insert_one(data)
+    bump(current_app.db, "opleidingen")
     data["_id"] = res.inserted_id
     return ser(data), 201
 
@@ -66,6 +215,8 @@ def list_opos():
 def create_opo():
     data = OPOIn(**(request.get_json(force=True) or {})).model_dump()
     res = current_app.db.opos.insert_one(data)
+    bump(current_app.db, "opos")
+    inc_counters(current_app.db, opos=1)
     data["_id"] = res.inserted_id
     return ser(data), 201
 
@@ -79,6 +230,7 @@ def list_categorien():
 def create_categorie():
     data = CategorieIn(**(request.get_json(force=True) or {})).model_dump()
     res = current_app.db.categorien.insert_one(data)
+    bump(current_app.db, "categorien")
     data["_id"] = res.inserted_id
     return ser(data), 201
 
@@ -92,23 +244,14 @@ def list_academiejaren():
 def create_academiejaar():
     data = AcademiejaarIn(**(request.get_json(force=True) or {})).model_dump()
     res = current_app.db.academiejaren.insert_one(data)
+    bump(current_app.db, "academiejaren")
     data["_id"] = res.inserted_id
     return ser(data), 201
 
 # ----- Resultaten -----
 @bp.get("/results")
 def list_results():
-    q = {}
-    if sid := request.args.get("student_id"): q["student_id"] = OID(sid)
-    if oid := request.args.get("opo_id"):     q["opo_id"] = OID(oid)
-    if aj := request.args.get("academiejaar"): q["academiejaar"] = aj
-    if kans := request.args.get("kans"):       q["kans"] = int(kans)
-    if status := request.args.get("status"):   # "na" | "geslaagd" | "niet"
-        if status == "na": q["cijfer"] = None
-        elif status == "geslaagd": q["cijfer"] = {"$gte": 10}
-        elif status == "niet": q["cijfer"] = {"$lt": 10}
-    docs = current_app.db.resultaten.find(q).limit(500)
-    return jsonify([ser(d) for d in docs])
+    return list_response(current_app.db.resultaten, results_filter(request.args), RESULT_API_SORT)
 
 @bp.post("/results")
 def create_result():
@@ -116,25 +259,152 @@ def create_result():
     data["student_id"] = OID(data["student_id"])
     data["opo_id"] = OID(data["opo_id"])
     res = current_app.db.resultaten.insert_one(data)  # unique index voorkomt dubbels
+    bump(current_app.db, "resultaten")
+    result_changes(current_app.db, [(None, data)])
     data["_id"] = res.inserted_id
     return ser(data), 201
 
 # ----- Student logs -----
 @bp.get("/student-logs")
 def list_logs():
-    q = {}
-    if sid := request.args.get("student_id"): q["student_id"] = OID(sid)
-    docs = current_app.db.student_logs.find(q).sort("registratiedatum", -1).limit(500)
-    return jsonify([ser(d) for d in docs])
+    return list_response(current_app.db.student_logs, logs_filter(request.args), LOG_API_SORT)
 
 @bp.post("/student-logs")
 def create_log():
-    payload = StudentLogIn(**(request.get_json(force=True) or {})).model_dump()
-    payload["student_id"] = OID(payload["student_id"])
-    if payload.get("categorie_id"):
-        payload["categorie_id"] = OID(payload["categorie_id"])
-    if not payload.get("registratiedatum"):
-        payload["registratiedatum"] = datetime.utcnow()
+    payload = log_doc(StudentLogIn(**(request.get_json(force=True) or {})).model_dump())
     res = current_app.db.student_logs.insert_one(payload)
+    bump(current_app.db, "student_logs")
     payload["_id"] = res.inserted_id
     return ser(payload), 201
+
+# ----- Bulk (JSON-array of NDJSON) -----
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+def _bulk_items():
+    """
+    Items of a bulk request: a JSON array, or one JSON object per line when the
+    content type is NDJSON. Returns [(index, dict | None)], index counts from 0;
+    None marks a line that is not valid JSON.
+    """
+    limit = current_app.config["API_BULK_MAX"]
+    if request.mimetype in NDJSON_TYPES:
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                obj = None
+            items.append(obj if isinstance(obj, dict) else None)
+    else:
+        items = request.get_json(force=True, silent=True)
+        if not isinstance(items, list):
+            abort(400, description="verwacht een JSON-array of NDJSON")
+        items = [x if isinstance(x, dict) else None for x in items]
+    if len(items) > limit:
+        abort(413, description=f"maximaal {limit} items per request")
+    return list(enumerate(items))
+
+def _validate(model, index, obj, report):
+    if obj is None:
+        report.error(index, "ongeldig JSON-object.")
+        return None
+    try:
+        return model(**obj).model_dump()
+    except ValidationError as e:
+        report.error(index, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+        return None
+
+def _bulk_response(report):
+    status = 200 if not report.skipped or report.created or report.updated else 422
+    return jsonify(report.to_dict()), status
+
+@bp.post("/students/bulk")
+def bulk_students():
+    """Upsert students on studentnummer; one unordered bulk_write per batch."""
+    db = current_app.db
+    report = ImportReport(track_items=True)
+    batch = StudentBatch(db, report, current_app.config["IMPORT_BATCH_SIZE"])
+    for i, obj in _bulk_items():
+        data = _validate(StudentIn, i, obj, report)
+        if data is None:
+            continue
+        if not data.get("opleiding_id"):
+            data.pop("opleiding_id", None)   # niet meegegeven: bestaande opleiding blijft staan
+        elif not ObjectId.is_valid(data["opleiding_id"]):
+            report.error(i, "ongeldige opleiding_id.")
+            continue
+        doc = student_doc(data)
+        batch.add(i, doc["studentnummer"], doc)
+    batch.close()
+    return _bulk_response(report)
+
+@bp.post("/results/bulk")
+def bulk_results():
+    """
+    Upsert resultaten on (student_id, opo_id, academiejaar, kans). Students and
+    OPO's are checked with one $in query each.
+    """
+    db = current_app.db
+    report = ImportReport(track_items=True)
+    rows = []
+    for i, obj in _bulk_items():
+        data = _validate(ResultaatIn, i, obj, report)
+        if data is None:
+            continue
+        if not (ObjectId.is_valid(data["student_id"]) and ObjectId.is_valid(data["opo_id"])):
+            report.error(i, "ongeldige student_id of opo_id.")
+            continue
+        rows.append((i, ObjectId(data["student_id"]), ObjectId(data["opo_id"]), data))
+
+    known_students = {d["_id"] for d in db.students.find({"_id": {"$in": list({r[1] for r in rows})}}, {"_id": 1})}
+    known_opos = {d["_id"] for d in db.opos.find({"_id": {"$in": list({r[2] for r in rows})}}, {"_id": 1})}
+
+    batch = ResultBatch(db, report, current_app.config["IMPORT_BATCH_SIZE"])
+    for i, sid, opo_id, data in rows:
+        if sid not in known_students:
+            report.error(i, f"student niet gevonden: '{sid}'.")
+        elif opo_id not in known_opos:
+            report.error(i, f"OPO niet gevonden: '{opo_id}'.")
+        else:
+            batch.add(i, (sid, opo_id, data["academiejaar"], data["kans"]), data["cijfer"])
+    batch.close()
+    return _bulk_response(report)
+
+@bp.post("/student-logs/bulk")
+def bulk_logs():
+    """Insert student logs with one unordered insert_many."""
+    db = current_app.db
+    report = ImportReport(track_items=True)
+    docs, lines = [], []
+    now = datetime.utcnow()
+    for i, obj in _bulk_items():
+        data = _validate(StudentLogIn, i, obj, report)
+        if data is None:
+            continue
+        ids = [k for k in ("student_id", "categorie_id", "opo_id") if data.get(k)]
+        if not all(ObjectId.is_valid(data[k]) for k in ids):
+            report.error(i, "ongeldige student_id, categorie_id of opo_id.")
+            continue
+        for k in ids:
+            data[k] = ObjectId(data[k])
+        data["registratiedatum"] = data.get("registratiedatum") or now
+        docs.append(data)
+        lines.append(i)
+
+    if docs:
+        failed = set()
+        try:
+            db.student_logs.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                failed.add(err["index"])
+                report.error(lines[err["index"]], err.get("errmsg", "schrijffout"))
+        if len(failed) < len(docs):
+            bump(db, "student_logs")
+        for idx, (line, doc) in enumerate(zip(lines, docs)):
+            if idx not in failed:
+                report.created += 1
+                report.ok(line, "created", doc["_id"])
+    return _bulk_response(report)
@@ -0,0 +1,68 @@
+# app/search.py
+import re, unicodedata
+from pymongo import UpdateOne
+from .cache import bump
+
+SEARCH_FIELD = "zoek"
+SEARCH_SOURCE_FIELDS = {"studentnummer": 1, "voornaam": 1, "achternaam": 1}
+
+
+def fold(text) -> str:
+    """
+    Lowercase + strip accents: "Émile Van Óbbergen" -> "emile van obbergen".
+    """
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def search_keys(doc):
+    """
+    Normalised prefix keys for a student document: studentnummer, voornaam,
+    achternaam, every single word of the names and both name orders, so
+    "obb", "van obb", "felix van" and "r088" all hit as a prefix.
+    """
+    snr, vn, an = (fold(doc.get(k)) for k in ("studentnummer", "voornaam", "achternaam"))
+    keys = {snr, vn, an, f"{vn} {an}".strip(), f"{an} {vn}".strip()}
+    keys.update(vn.split())
+    keys.update(an.split())
+    keys.discard("")
+    return sorted(keys)
+
+
+def with_search_keys(doc):
+    """Adds the search field to a student doc that is about to be written."""
+    doc[SEARCH_FIELD] = search_keys(doc)
+    return doc
+
+
+def reindex(db, query=None, batch_size=1000):
+    """(Re)compute the search keys of the students matching `query` (all by default); returns the count."""
+    ops, done = [], 0
+    for s in db.students.find(query or {}, SEARCH_SOURCE_FIELDS):
+        ops.append(UpdateOne({"_id": s["_id"]}, {"$set": {SEARCH_FIELD: search_keys(s)}}))
+        if len(ops) >= batch_size:
+            db.students.bulk_write(ops, ordered=False)
+            done += len(ops)
+            ops = []
+    if ops:
+        db.students.bulk_write(ops, ordered=False)
+        done += len(ops)
+    if done:
+        bump(db, "students")   # zoekresultaten kunnen veranderd zijn
+    return done
+
+
+def ensure_search_keys(db):
+    """Startup backfill: students written before the search keys existed get them now."""
+    missing = {SEARCH_FIELD: {"$exists": False}}
+    if db.students.find_one(missing, {"_id": 1}) is not None:
+        reindex(db, missing)
+
+
+def search_query(qtext):
+    """
+    Anchored, case-sensitive regex on the folded keys: MongoDB turns this into
+    an index range scan on the multikey 'zoek' index.
+    """
+    return {SEARCH_FIELD: {"$regex": "^" + re.escape(fold(qtext))}}
@@ -0,0 +1,166 @@
+# app/seed.py
+import random
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from .cache import REF_COLLECTIONS, VERSIONED_DATA, bump
+from .search import with_search_keys
+from .stats import rebuild_counters, rebuild_opo_stats
+
+OPLEIDINGEN = [
+    ("Graduaat Programmeren", "dag"), ("Graduaat Programmeren", "avond"),
+    ("Graduaat Systeem- en Netwerkbeheer", "dag"), ("Graduaat Internet of Things", "avond"),
+]
+OPO_NAMEN = [
+    "Webontwikkeling", "Databanken", "Programmeren", "Netwerken", "Besturingssystemen",
+    "Cloud", "Security", "Mobile", "Data Science", "IT Project", "Werkplekleren",
+    "Communicatie", "Testing", "DevOps", "Frontend", "Backend", "Scripting", "Linux",
+    "Embedded", "UX Design",
+]
+CATEGORIEN = [
+    ("GESPREK", "Studiebegeleidingsgesprek"), ("AFWEZIG", "Afwezigheid"),
+    ("ATTEST", "Attest ingediend"), ("TRAJECT", "Aanpassing studietraject"),
+]
+VOORNAMEN = [
+    "Lucas", "Noah", "Arthur", "Louis", "Liam", "Emma", "Olivia", "Louise", "Mila", "Elena",
+    "Jules", "Victor", "Finn", "Nora", "Lina", "Ella", "Wout", "Senne", "Émile", "Zoë",
+]
+ACHTERNAMEN = [
+    "Peeters", "Janssens", "Maes", "Jacobs", "Mertens", "Willems", "Claes", "Goossens",
+    "Wouters", "De Smet", "Van den Broeck", "Dubois", "Lambert", "Vermeulen", "Van Obbergen",
+    "Hermans", "De Clercq", "Aerts", "Desmet", "Verstraete",
+]
+DATA_COLLECTIONS = ("students", "resultaten", "student_logs", "opo_stats", "stats")
+
+
+def academiejaren(years, last=None):
+    """The `years` academiejaren up to and including `last` (default: the current one)."""
+    if last is None:
+        now = datetime.utcnow()
+        last = now.year if now.month >= 9 else now.year - 1
+    return [f"{y}-{y + 1}" for y in range(last - years + 1, last + 1)]
+
+
+def _upsert_refs(db, name, key, docs):
+    """Upsert reference docs on their unique key; returns the _ids in input order."""
+    db[name].bulk_write([UpdateOne({key: d[key]}, {"$setOnInsert": d}, upsert=True) for d in docs], ordered=False)
+    ids = {d[key]: d["_id"] for d in db[name].find({key: {"$in": [d[key] for d in docs]}}, {key: 1})}
+    return [ids[d[key]] for d in docs]
+
+
+def _insert_batches(coll, docs, batch_size):
+    """
+    insert_many per batch_size (unordered); duplicates are skipped.
+    Returns (inserted count, _ids of the docs that were not inserted).
+    """
+    n, batch, failed = 0, [], set()
+
+    def flush():
+        nonlocal n
+        if not batch:
+            return
+        try:
+            n += len(coll.insert_many(batch, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            n += e.details.get("nInserted", 0)
+            failed.update(batch[err["index"]]["_id"] for err in e.details.get("writeErrors", []))
+        batch.clear()
+
+    for d in docs:
+        batch.append(d)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return n, failed
+
+
+def _next_studentnummer(db):
+    """Number after the highest generated rNNNNNNN (a count would reuse numbers after deletes)."""
+    last = db.students.find_one({"studentnummer": {"$regex": r"^r\d{7}$"}}, {"studentnummer": 1},
+                                sort=[("studentnummer", -1)])
+    return int(last["studentnummer"][1:]) + 1 if last else 0
+
+
+def _cijfer(rng):
+    if rng.random() < 0.05:
+        return None  # NA
+    return min(20.0, max(0.0, round(rng.gauss(11.5, 3.5) * 2) / 2))
+
+
+def seed(db, students=1000, years=3, opos=20, opo_per_year=6, logs_per_student=2,
+         batch_size=5000, rng_seed=None):
+    """
+    Generate a realistic dataset with bulk inserts: reference data (upserted),
+    `students` new students spread over the academiejaren, results for ~opo_per_year
+    OPO's per year (kans 2 for part of the fails) and logs. Counters and opo_stats
+    are rebuilt at the end. Returns the inserted counts.
+    """
+    rng = random.Random(rng_seed)
+    ajs = academiejaren(years)
+
+    opl_ids = _upsert_refs(db, "opleidingen", "naam",
+                           [{"naam": f"{n} ({da})", "dag_avond": da} for n, da in OPLEIDINGEN])
+    opo_docs = []
+    for i in range(opos):
+        naam = OPO_NAMEN[i % len(OPO_NAMEN)] + (f" {i // len(OPO_NAMEN) + 1}" if i >= len(OPO_NAMEN) else "")
+        opo_docs.append({"afkorting": f"OPO{i + 1:03d}", "naam": naam, "code": f"GP{i + 1:04d}"})
+    opo_ids = _upsert_refs(db, "opos", "afkorting", opo_docs)
+    cat_ids = _upsert_refs(db, "categorien", "afkorting",
+                           [{"afkorting": a, "omschrijving": o} for a, o in CATEGORIEN])
+    _upsert_refs(db, "academiejaren", "academiejaar", [{"academiejaar": aj} for aj in ajs])
+    bump(db, *REF_COLLECTIONS)
+
+    offset = _next_studentnummer(db)
+    stu_docs = []
+    for i in range(students):
+        start = rng.randrange(len(ajs))
+        stu_docs.append(with_search_keys({
+            "studentnummer": f"r{offset + i:07d}",
+            "voornaam": rng.choice(VOORNAMEN),
+            "achternaam": rng.choice(ACHTERNAMEN),
+            "inschrijfdatum": f"{ajs[start][:4]}-09-{rng.randint(1, 30):02d}",
+            "opleiding_id": rng.choice(opl_ids),
+            "_start": start,
+        }))
+    starts = [d.pop("_start") for d in stu_docs]
+    n_students, failed = _insert_batches(db.students, stu_docs, batch_size)
+    pairs = [(d["_id"], start) for d, start in zip(stu_docs, starts) if d["_id"] not in failed]
+
+    def results():
+        for sid, start in pairs:
+            for aj in ajs[start:]:
+                for opo_id in rng.sample(opo_ids, min(opo_per_year, len(opo_ids))):
+                    c1 = _cijfer(rng)
+                    yield {"student_id": sid, "opo_id": opo_id, "academiejaar": aj, "kans": 1, "cijfer": c1}
+                    if (c1 is None or c1 < 10) and rng.random() < 0.6:
+                        yield {"student_id": sid, "opo_id": opo_id, "academiejaar": aj, "kans": 2,
+                               "cijfer": _cijfer(rng)}
+
+    def logs():
+        first = datetime(int(ajs[0][:4]), 9, 15)
+        span = (datetime(int(ajs[-1][5:]), 7, 1) - first).total_seconds()
+        for sid, _ in pairs:
+            for _ in range(rng.randint(0, 2 * logs_per_student)):
+                yield {
+                    "student_id": sid,
+                    "categorie_id": rng.choice(cat_ids),
+                    "opo_id": rng.choice(opo_ids) if rng.random() < 0.5 else None,
+                    "beschrijving": "Automatisch gegenereerde logregel.",
+                    "registratiedatum": first + timedelta(seconds=rng.uniform(0, span)),
+                }
+
+    n_results, _ = _insert_batches(db.resultaten, results(), batch_size)
+    n_logs, _ = _insert_batches(db.student_logs, logs(), batch_size)
+
+    rebuild_counters(db)
+    rebuild_opo_stats(db)
+    bump(db, *VERSIONED_DATA)
+    return {"students": n_students, "resultaten": n_results, "student_logs": n_logs,
+            "opos": len(opo_ids), "academiejaren": ajs}
+
+
+def reset(db):
+    """Drop the student data (students, resultaten, logs, stats); reference data stays."""
+    for name in DATA_COLLECTIONS:
+        db[name].delete_many({})
+    bump(db, *VERSIONED_DATA)
@@ -0,0 +1,266 @@
+# app/stats.py
+from pymongo import UpdateOne
+
+COUNTERS_ID = "counters"
+RESULT_FIELDS = {"student_id": 1, "opo_id": 1, "academiejaar": 1, "kans": 1, "cijfer": 1}
+STAT_CLASSES = ("passed", "failed", "na")
+
+
+def _safe_key(val) -> bool:
+    # academiejaar wordt een veldnaam in per_aj.<aj>
+    return isinstance(val, str) and val != "" and "." not in val and not val.startswith("$")
+
+
+# ---------- dashboard counters ----------
+def inc_counters(db, **deltas):
+    """
+    $inc on the dashboard counters doc, e.g. inc_counters(db, students=1).
+    """
+    inc = {k: v for k, v in deltas.items() if v}
+    if inc:
+        db.stats.update_one({"_id": COUNTERS_ID}, {"$inc": inc}, upsert=True)
+
+
+def _counter_changes(db, changes):
+    delta = {}
+    for before, after in changes:
+        for doc, sign in ((before, -1), (after, 1)):
+            if doc is None:
+                continue
+            keys = ["resultaten"]
+            if doc.get("cijfer") is None:
+                keys.append("na")
+            if _safe_key(doc.get("academiejaar")):
+                keys.append(f"per_aj.{doc['academiejaar']}")
+            for k in keys:
+                delta[k] = delta.get(k, 0) + sign
+    inc_counters(db, **delta)
+
+
+# ---------- opo_stats: per (opo_id, academiejaar, opleiding_id) ----------
+# total/passed/failed/na tellen studenten op hun beste cijfer over de kansen heen,
+# net zoals het rapport dat doet.
+
+def triple(doc):
+    return (doc["student_id"], doc["opo_id"], doc["academiejaar"])
+
+
+def snapshot(db, triples):
+    """
+    Current resultaten for a set of (student, opo, aj): {triple: {kans: doc}}.
+    One query, served by the unique (student_id, opo_id, academiejaar, kans) index.
+    """
+    out = {t: {} for t in triples}
+    if not out:
+        return out
+    q = {"$or": [{"student_id": s, "opo_id": o, "academiejaar": aj} for s, o, aj in out]}
+    for d in db.resultaten.find(q, RESULT_FIELDS):
+        out.setdefault(triple(d), {})[d.get("kans")] = d
+    return out
+
+
+def _replay(state, changes, undo=False):
+    """Apply (or undo) (before, after) changes on a snapshot copy."""
+    out = {t: dict(docs) for t, docs in state.items()}
+    for before, after in changes:
+        old, new = (after, before) if undo else (before, after)
+        ref = new or old
+        docs = out.setdefault(triple(ref), {})
+        if new is None:
+            docs.pop(ref.get("kans"), None)
+        else:
+            docs[new.get("kans")] = new
+    return out
+
+
+def classify(docs):
+    """
+    Class of a student's best cijfer over the given kansen: None when there are
+    no results, else "passed" / "failed" / "na" (only NA's).
+    """
+    vals = [d.get("cijfer") for d in docs]
+    if not vals:
+        return None
+    nums = [v for v in vals if v is not None]
+    if not nums:
+        return "na"
+    return "passed" if max(nums) >= 10 else "failed"
+
+
+def _opleidingen_of(db, student_ids):
+    """student_id -> opleiding_id (None when unset); deleted students are absent."""
+    return {
+        s["_id"]: s.get("opleiding_id")
+        for s in db.students.find({"_id": {"$in": list(set(student_ids))}}, {"opleiding_id": 1})
+    }
+
+
+def _inc_opo_stats(db, delta):
+    """delta: {(opo_id, aj, opleiding_id): {"total": n, "passed": n, ...}}"""
+    ops = []
+    for (opo_id, aj, opl_id), inc in delta.items():
+        inc = {k: v for k, v in inc.items() if v}
+        if inc:
+            ops.append(UpdateOne(
+                {"opo_id": opo_id, "academiejaar": aj, "opleiding_id": opl_id},
+                {"$inc": inc}, upsert=True,
+            ))
+    if ops:
+        db.opo_stats.bulk_write(ops, ordered=False)
+
+
+def _add(delta, key, klass, sign):
+    if klass is None:
+        return
+    d = delta.setdefault(key, {})
+    d["total"] = d.get("total", 0) + sign
+    d[klass] = d.get(klass, 0) + sign
+
+
+def _opo_stats_changes(db, before, after):
+    delta = {}
+    changed = [t for t in after if classify(before.get(t, {}).values()) != classify(after[t].values())]
+    if not changed:
+        return
+    opl_of = _opleidingen_of(db, [t[0] for t in changed])
+    for t in changed:
+        sid, opo_id, aj = t
+        if sid not in opl_of:
+            continue  # student bestaat niet (meer): telt nergens mee
+        key = (opo_id, aj, opl_of[sid])
+        _add(delta, key, classify(before.get(t, {}).values()), -1)
+        _add(delta, key, classify(after[t].values()), +1)
+    _inc_opo_stats(db, delta)
+
+
+def result_changes(db, changes, before=None):
+    """
+    Keep counters and opo_stats in sync after resultaten writes.
+
+    changes: list of (before, after) documents that were written; before is None
+    for an insert, after is None for a delete.
+    before: optional snapshot() taken before the write (bulk path). Without it the
+    current state is read back and the changes are undone in memory.
+    """
+    if not changes:
+        return
+    _counter_changes(db, changes)
+    if before is None:
+        after = snapshot(db, {triple(a or b) for b, a in changes})
+        before = _replay(after, changes, undo=True)
+    else:
+        after = _replay(before, changes)
+    _opo_stats_changes(db, before, after)
+
+
+def student_contribution(db, student_id):
+    """(opo_id, aj) -> class for one student, from its resultaten."""
+    per = {}
+    for d in db.resultaten.find({"student_id": student_id}, RESULT_FIELDS):
+        per.setdefault((d["opo_id"], d["academiejaar"]), []).append(d)
+    return {k: classify(docs) for k, docs in per.items()}
+
+
+def move_student(db, student_id, from_opl, to_opl, remove=False):
+    """
+    Shift a student's contribution between opleidingen (opleiding changed), or
+    drop it entirely (remove=True, student deleted).
+    """
+    delta = {}
+    for (opo_id, aj), klass in student_contribution(db, student_id).items():
+        _add(delta, (opo_id, aj, from_opl), klass, -1)
+        if not remove:
+            _add(delta, (opo_id, aj, to_opl), klass, +1)
+    _inc_opo_stats(db, delta)
+
+
+def read_opo_stats(db, aj, opo_ids=None, opleiding_id=None):
+    """
+    Summed opo_stats for one academiejaar: {opo_id: {"total", "passed", "failed", "na"}}.
+    O(#OPOs x #opleidingen) documents.
+    """
+    q = {"academiejaar": aj}
+    if opo_ids is not None:
+        q["opo_id"] = {"$in": list(opo_ids)}
+    if opleiding_id is not None:
+        q["opleiding_id"] = opleiding_id
+    out = {}
+    for d in db.opo_stats.find(q, {"_id": 0}):
+        tot = out.setdefault(d["opo_id"], {"total": 0, "passed": 0, "failed": 0, "na": 0})
+        for k in tot:
+            tot[k] += d.get(k, 0)
+    return out
+
+
+def rebuild_opo_stats(db):
+    """
+    Recompute opo_stats from resultaten in one server-side pass ($out replaces
+    the collection; its indexes are kept).
+    """
+    db.resultaten.aggregate([
+        {"$group": {"_id": {"s": "$student_id", "o": "$opo_id", "aj": "$academiejaar"},
+                    "best": {"$max": "$cijfer"}}},
+        {"$lookup": {"from": "students", "localField": "_id.s", "foreignField": "_id", "as": "stu"}},
+        {"$match": {"stu": {"$ne": []}}},
+        {"$group": {
+            "_id": {"o": "$_id.o", "aj": "$_id.aj", "opl": {"$arrayElemAt": ["$stu.opleiding_id", 0]}},
+            "total": {"$sum": 1},
+            "passed": {"$sum": {"$cond": [{"$gte": ["$best", 10]}, 1, 0]}},
+            "na": {"$sum": {"$cond": [{"$eq": ["$best", None]}, 1, 0]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "opo_id": "$_id.o", "academiejaar": "$_id.aj", "opleiding_id": {"$ifNull": ["$_id.opl", None]},
+            "total": 1, "passed": 1, "na": 1,
+            "failed": {"$subtract": ["$total", {"$add": ["$passed", "$na"]}]},
+        }},
+        {"$out": "opo_stats"},
+    ])
+    return db.opo_stats.count_documents({})
+
+
+# ---------- (re)build ----------
+def rebuild_counters(db):
+    """
+    Recount everything from scratch (startup when missing, or `flask stats-rebuild`).
+    """
+    per_aj = {
+        d["_id"]: d["n"]
+        for d in db.resultaten.aggregate([{"$group": {"_id": "$academiejaar", "n": {"$sum": 1}}}])
+        if _safe_key(d["_id"])
+    }
+    doc = {
+        "students": db.students.count_documents({}),
+        "opos": db.opos.count_documents({}),
+        "resultaten": db.resultaten.count_documents({}),
+        "na": db.resultaten.count_documents({"cijfer": None}),
+        "per_aj": per_aj,
+    }
+    db.stats.replace_one({"_id": COUNTERS_ID}, doc, upsert=True)
+    return doc
+
+
+def ensure_counters(db):
+    if db.stats.find_one({"_id": COUNTERS_ID}, {"_id": 1}) is None:
+        rebuild_counters(db)
+    if db.opo_stats.find_one({}, {"_id": 1}) is None and db.resultaten.find_one({}, {"_id": 1}):
+        rebuild_opo_stats(db)
+
+
+def read_counters(db):
+    """
+    Dashboard figures from the counters doc; falls back to the (metadata based)
+    estimated_document_count when the doc is missing.
+    """
+    doc = db.stats.find_one({"_id": COUNTERS_ID})
+    if doc is None:
+        return {
+            "students": db.students.estimated_document_count(),
+            "opos": db.opos.estimated_document_count(),
+            "resultaten": db.resultaten.estimated_document_count(),
+            "na": None,
+            "per_aj": {},
+        }
+    doc.pop("_id", None)
+    doc["per_aj"] = {aj: n for aj, n in sorted((doc.get("per_aj") or {}).items()) if n}
+    return doc
@@ -1,85 +1,152 @@
 # app/web.py
-from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, abort, Response
-import csv, io
-from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, abort, Response, jsonify, stream_with_context, send_file
+import csv, io, itertools
+from datetime import date, datetime
 from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, abort
 from bson import ObjectId
+from pymongo import ReturnDocument
 from pymongo.errors import DuplicateKeyError
 from flask_login import login_required, current_user  # <-- NEW
+from .cache import bump
+from .cascade import delete_student, delete_opo, delete_categorie
+from .conditional import conditional
+from .paging import keyset_page
+from .search import search_query, with_search_keys
+from .stats import RESULT_FIELDS, inc_counters, move_student, read_counters, read_opo_stats, result_changes
+from .reports import (rapport_rows, rapport_opo_stats, rapport_table, rapport_multi, rapport_multi_table,
+                      grade_statistics, grade_text, grade_value, budgeted, ReportTooLarge)
+from .xlsx import MIMETYPE as XLSX_MIMETYPE, xlsx_stream
+from .imports import import_students, import_results, open_text, detect_format
+from .jobs import public as job_public, students_import_job, results_import_job, rapport_export_job
 
 web = Blueprint("web", __name__)
 
+STUDENT_SORT = [("achternaam", 1), ("voornaam", 1), ("_id", 1)]
+STUDENTS_PAGE_SIZE_MAX = 500
+
+# ---------- projections: per view enkel de velden die de template gebruikt ----------
+STUDENT_LIST_FIELDS = {"studentnummer": 1, "voornaam": 1, "achternaam": 1, "opleiding_id": 1}
+STUDENT_DETAIL_FIELDS = {**STUDENT_LIST_FIELDS, "inschrijfdatum": 1}
+STUDENT_SUGGEST_FIELDS = {"studentnummer": 1, "voornaam": 1, "achternaam": 1}
+STUDENT_EXPORT_FIELDS = {"studentnummer": 1, "voornaam": 1, "achternaam": 1, "inschrijfdatum": 1, "opleiding_id": 1, "_id": 0}
+RESULT_VIEW_FIELDS = {"opo_id": 1, "academiejaar": 1, "kans": 1, "cijfer": 1}
+LOG_VIEW_FIELDS = {"categorie_id": 1, "opo_id": 1, "registratiedatum": 1, "beschrijving": 1}
+LOG_SORT = [("registratiedatum", -1), ("_id", -1)]
+ID_ONLY = {"_id": 1}
+# collecties waar rapport, statistiek en hun exports van afhangen (ETag, zie conditional.py)
+RAPPORT_DEPS = ("students", "resultaten", "opleidingen", "opos", "academiejaren")
+
 # ---------- helpers ----------
 def oid(x):
     return ObjectId(x) if isinstance(x, str) else x
 
-def _str_id(doc):
-    if not doc:
-        return doc
-    d = dict(doc)
-    if isinstance(d.get("_id"), ObjectId):
-        d["_id"] = str(d["_id"])
-    return d
+def _view(doc):
+    """
+    Template-ready doc in one pass: every top-level ObjectId becomes a string.
+    Converts in place; pymongo hands out a fresh dict per document anyway.
+    """
+    if doc:
+        for k, v in doc.items():
+            if isinstance(v, ObjectId):
+                doc[k] = str(v)
+    return doc
+
+def _csv_line(row):
+    sio = io.StringIO()
+    csv.writer(sio).writerow(row)
+    return sio.getvalue()
+
+def _csv_response(header, rows, fname):
+    """
+    Streams a CSV download: header first, then one line per row as the
+    (cursor-backed) iterator yields them.
+    """
+    def generate():
+        yield _csv_line(header)
+        for row in rows:
+            yield _csv_line(row)
+    return Response(stream_with_context(generate()), mimetype="text/csv",
+                    headers={"Content-Disposition": f"attachment; filename={fname}"})
+
+def _xlsx_response(header, rows, fname, sheet):
+    """Streams an .xlsx download row by row (see xlsx.py), like _csv_response."""
+    return Response(stream_with_context(xlsx_stream(header, rows, sheet)), mimetype=XLSX_MIMETYPE,
+                    headers={"Content-Disposition": f"attachment; filename={fname}"})
+
+def _ref(name):
+    """Cached (docs, map) for a reference collection; see cache.RefCache."""
+    return current_app.refcache.get(name)
 
-def _map_by_id(cursor, *fields):
+def _budget(name):
+    """maxTimeMS for a rapport-endpoint (config MAX_TIME_MS), None = no limit."""
+    return current_app.config["MAX_TIME_MS"].get(name) or None
+
+def _primed(rows):
     """
-    Returns (list, map) where list has stringified _id docs and map maps string_id -> doc/label.
-    If fields given (e.g. ("naam", "afkorting")), builds a 'label' field combining them.
+    Runs the first batch of a lazy cursor now, inside the view: a time-out on the
+    initial aggregate then still becomes a clean error page instead of a
+    download that breaks off after the headers.
     """
-    docs = []
-    mapping = {}
-    for raw in cursor:
-        d = _str_id(raw)
-        if fields:
-            parts = []
-            for f in fields:
-                val = d.get(f)
-                if val:
-                    parts.append(val)
-            d["label"] = " — ".join(parts) if parts else d.get("naam") or d.get("afkorting") or ""
-        mapping[d["_id"]] = d
-        docs.append(d)
-    return docs, mapping
+    first = next(rows, None)
+    return rows if first is None else itertools.chain([first], rows)
+
+@web.errorhandler(ReportTooLarge)
+def report_too_large(e):
+    if request.path.endswith(".json") or request.accept_mimetypes.best == "application/json":
+        return jsonify({"error": "too_large", "message": str(e)}), 503
+    return render_template("te_groot.html", message=str(e), back=request.referrer), 503
+
+def _flash_import_report(report):
+    msg = report.summary()
+    if report.errors:
+        # laat max ~5 fouten zien om flash kort te houden
+        sample = " | ".join(report.errors[:5])
+        extra = f" (+{len(report.errors)-5} meer)" if len(report.errors) > 5 else ""
+        flash(msg + " Fouten: " + sample + extra, "warning")
+    else:
+        flash(msg, "success")
 
 # ---------- Home (Dashboard) ----------
 @web.get("/")
+@conditional("students", "opos", "resultaten", "academiejaren")
 def home():
     db = current_app.db
-    counts = {
-        "students": db.students.count_documents({}),
-        "opos": db.opos.count_documents({}),
-        "resultaten": db.resultaten.count_documents({}),
-    }
+    # materialised counters + opo_stats (stats.py) i.p.v. count_documents per bezoek
+    counts = read_counters(db)
+    ajs = current_app.refcache.academiejaren()
+    if ajs:
+        per_opo = read_opo_stats(db, ajs[-1]).values()
+        counts["laatste_aj"] = {
+            "academiejaar": ajs[-1],
+            **{k: sum(d[k] for d in per_opo) for k in ("total", "passed", "failed", "na")},
+        }
     return render_template("home.html", counts=counts, can_edit=current_user.is_authenticated)
 
 # ---------- Students list + create ----------
 @web.get("/students")
+@conditional("students", "opleidingen")
 def students_page():
     db = current_app.db
 
-    # simple search on naam/studentnummer
+    # prefix search on naam/studentnummer (index op genormaliseerde sleutels)
     qtext = (request.args.get("q") or "").strip()
-    q = {}
-    if qtext:
-        q = {
-            "$or": [
-                {"studentnummer": {"$regex": qtext, "$options": "i"}},
-                {"voornaam": {"$regex": qtext, "$options": "i"}},
-                {"achternaam": {"$regex": qtext, "$options": "i"}},
-            ]
-        }
+    q = search_query(qtext) if qtext else {}
 
-    students = []
-    for s in db.students.find(q).sort([("achternaam", 1), ("voornaam", 1)]):
-        s = _str_id(s)
-        if isinstance(s.get("opleiding_id"), ObjectId):
-            s["opleiding_id"] = str(s["opleiding_id"])
-        students.append(s)
+    # keyset paginering op (achternaam, voornaam, _id); zie db.ensure_indexes
+    default_size = current_app.config["STUDENTS_PAGE_SIZE"]
+    try:
+        page_size = max(1, min(int(request.args.get("n") or default_size), STUDENTS_PAGE_SIZE_MAX))
+    except ValueError:
+        page_size = default_size
+    docs, next_token, prev_token = keyset_page(
+        db.students, q, STUDENT_SORT, page_size,
+        after=request.args.get("after"), before=request.args.get("before"),
+        projection=STUDENT_LIST_FIELDS,
+    )
+    students = [_view(s) for s in docs]
 
     # opleidingen -> lijst + id->label map for table
-    opleidingen_list, opleidingen_map_full = _map_by_id(
-        db.opleidingen.find().sort("naam", 1), "naam", "dag_avond"
-    )
+    opleidingen_list, opleidingen_map_full = _ref("opleidingen")
     opleidings_map = {k: v.get("label", "") for k, v in opleidingen_map_full.items()}
 
     return render_template(
@@ -88,9 +155,38 @@ def students_page():
         opleidingen=opleidingen_list,
         opleidings_map=opleidings_map,
         q=qtext,
+        n=page_size if page_size != default_size else None,
+        next_token=next_token,
+        prev_token=prev_token,
+        job_id=request.args.get("job"),
         can_edit=current_user.is_authenticated,  # <-- use in template to hide create/delete if anon
     )
 
+@web.get("/students/autocomplete")
+def students_autocomplete():
+    """
+    Top-N prefix matches as JSON for a search-as-you-type box, in naam order
+    (sorted by the server before the limit, like the students page).
+    """
+    qtext = (request.args.get("q") or "").strip()
+    try:
+        n = max(1, min(int(request.args.get("n") or 10), 50))
+    except ValueError:
+        n = 10
+    if not qtext:
+        return jsonify([])
+
+    docs = current_app.db.students.find(search_query(qtext), STUDENT_SUGGEST_FIELDS).sort(STUDENT_SORT).limit(n)
+    return jsonify([
+        {
+            "_id": str(d["_id"]),
+            "studentnummer": d.get("studentnummer", ""),
+            "naam": f"{d.get('achternaam', '')}, {d.get('voornaam', '')}",
+            "url": url_for("web.student_detail", id=str(d["_id"])),
+        }
+        for d in docs
+    ])
+
 @web.post("/students")
 @login_required
 def students_create():
@@ -112,7 +208,9 @@ def students_create():
         return redirect(url_for("web.students_page"))
 
     try:
-        db.students.insert_one(payload)
+        db.students.insert_one(with_search_keys(payload))
+        bump(db, "students")
+        inc_counters(db, students=1)
         flash("Student toegevoegd.", "success")
     except DuplicateKeyError:
         flash("Studentnummer bestaat al.", "danger")
@@ -122,67 +220,34 @@ def students_create():
 @web.post("/students/<id>/delete")
 @login_required
 def students_delete(id):
-    current_app.db.students.delete_one({"_id": oid(id)})
-    flash("Student verwijderd.", "info")
+    n = delete_student(current_app.db, oid(id), archive=current_app.config["SOFT_DELETE"])
+    if n is not None:
+        flash(f"Student verwijderd ({_cascade_msg(n)}).", "info")
     return redirect(url_for("web.students_page"))
 
+def _cascade_msg(counts):
+    parts = [f"{counts['resultaten']} resultaten"] if "resultaten" in counts else []
+    parts.append(f"{counts['student_logs']} logregels")
+    verb = "gearchiveerd" if current_app.config["SOFT_DELETE"] else "mee verwijderd"
+    return f"{' en '.join(parts)} {verb}"
+
 # ---------- Student detail (edit + results + logs) ----------
 @web.get("/students/<id>")
 def student_detail(id):
     db = current_app.db
-    stu = db.students.find_one({"_id": oid(id)})
+    stu = _view(db.students.find_one({"_id": oid(id)}, STUDENT_DETAIL_FIELDS))
     if not stu:
         abort(404)
 
-    stu = _str_id(stu)
-    if isinstance(stu.get("opleiding_id"), ObjectId):
-        stu["opleiding_id"] = str(stu["opleiding_id"])
-
-    # dropdown data
-    opleidingen_list, opleidingen_map = _map_by_id(db.opleidingen.find().sort("naam", 1), "naam", "dag_avond")
-    opos_list, opos_map = _map_by_id(db.opos.find().sort("afkorting", 1), "afkorting", "naam")
-    cats_list, cats_map = _map_by_id(db.categorien.find().sort("afkorting", 1), "afkorting", "omschrijving")
-    ajs = [d.get("academiejaar") for d in db.academiejaren.find().sort("academiejaar", 1)]
-
-    # results for student
-    results = []
-    for r in db.resultaten.find({"student_id": oid(id)}).sort([("academiejaar", 1), ("opo_id", 1), ("kans", 1)]):
-        r = _str_id(r)
-        if isinstance(r.get("opo_id"), ObjectId):
-            r["opo_id"] = str(r["opo_id"])
-        r["opo_label"] = opos_map.get(r.get("opo_id"), {}).get("label", "—")
-        r["cijfer_display"] = "NA" if r.get("cijfer") is None else r.get("cijfer")
-        results.append(r)
+    # dropdown data (uit de RefCache, geen extra queries)
+    opleidingen_list, _ = _ref("opleidingen")
+    opos_list, _ = _ref("opos")
+    cats_list, _ = _ref("categorien")
+    ajs = current_app.refcache.academiejaren()
 
-    # log filters
+    # resultaten en logboek laden pas wanneer hun tab opengaat: student_results / student_logs
     f_cat = (request.args.get("cat") or "").strip()
     f_opo = (request.args.get("opo") or "").strip()
-    log_q = {"student_id": oid(id)}
-    if f_cat:
-        try:
-            log_q["categorie_id"] = oid(f_cat)
-        except Exception:
-            pass
-    if f_opo:
-        try:
-            log_q["opo_id"] = oid(f_opo)
-        except Exception:
-            pass
-
-    logs = []
-    for lg in db.student_logs.find(log_q).sort("registratiedatum", -1):
-        lg = _str_id(lg)
-        for k in ("categorie_id", "opo_id"):
-            if isinstance(lg.get(k), ObjectId):
-                lg[k] = str(lg[k])
-        lg["cat_label"] = cats_map.get(lg.get("categorie_id"), {}).get("label", "")
-        lg["opo_label"] = opos_map.get(lg.get("opo_id"), {}).get("label", "")
-        dt = lg.get("registratiedatum")
-        if isinstance(dt, datetime):
-            lg["registratiedatum_str"] = dt.strftime("%Y-%m-%d %H:%M")
-        else:
-            lg["registratiedatum_str"] = str(dt or "")
-        logs.append(lg)
 
     return render_template(
         "student_detail.html",
@@ -191,13 +256,73 @@ def student_detail(id):
         opos=opos_list,
         categories=cats_list,
         academiejaren=ajs,
-        results=results,
-        logs=logs,
         f_cat=f_cat,
         f_opo=f_opo,
         can_edit=current_user.is_authenticated,
     )
 
+def _labels(name, ids):
+    """Labels from the RefCache for just the referenced ids."""
+    _, mapping = _ref(name)
+    return {i: mapping[i].get("label", "") for i in ids if i in mapping}
+
+def _wants_json():
+    return request.accept_mimetypes.best == "application/json"
+
+@web.get("/students/<id>/results")
+def student_results(id):
+    """Resultaten-tab: HTML fragment, or JSON with Accept: application/json."""
+    if not ObjectId.is_valid(id):
+        abort(404)
+    cursor = current_app.db.resultaten.find({"student_id": ObjectId(id)}, RESULT_VIEW_FIELDS)
+    results = [_view(r) for r in cursor.sort([("academiejaar", 1), ("opo_id", 1), ("kans", 1)])]
+    labels = _labels("opos", {r.get("opo_id") for r in results})
+    for r in results:
+        r["opo_label"] = labels.get(r.get("opo_id"), "—")
+        r["cijfer_display"] = "NA" if r.get("cijfer") is None else r.get("cijfer")
+    if _wants_json():
+        return jsonify(results)
+    return render_template("_student_results.html", results=results)
+
+def _log_query(id):
+    q = {"student_id": ObjectId(id)}
+    for arg, field in (("cat", "categorie_id"), ("opo", "opo_id")):
+        val = (request.args.get(arg) or "").strip()
+        if ObjectId.is_valid(val):
+            q[field] = ObjectId(val)
+    return q
+
+@web.get("/students/<id>/logs")
+def student_logs(id):
+    """
+    Logboek-tab, nieuwste eerst, per pagina met een keyset cursor op
+    (registratiedatum, _id): ?after=<next>. HTML fragment or JSON.
+    """
+    if not ObjectId.is_valid(id):
+        abort(404)
+    size = current_app.config["STUDENT_LOGS_PAGE_SIZE"]
+    logs, next_token, _ = keyset_page(
+        current_app.db.student_logs, _log_query(id), LOG_SORT, size,
+        after=request.args.get("after"), projection=LOG_VIEW_FIELDS,
+    )
+    logs = [_view(lg) for lg in logs]
+    cat_labels = _labels("categorien", {lg.get("categorie_id") for lg in logs})
+    opo_labels = _labels("opos", {lg.get("opo_id") for lg in logs})
+    for lg in logs:
+        lg["cat_label"] = cat_labels.get(lg.get("categorie_id"), "")
+        lg["opo_label"] = opo_labels.get(lg.get("opo_id"), "")
+        dt = lg.get("registratiedatum")
+        lg["registratiedatum_str"] = dt.strftime("%Y-%m-%d %H:%M") if isinstance(dt, datetime) else str(dt or "")
+
+    if _wants_json():
+        return jsonify({"items": logs, "next": next_token})
+    more_url = None
+    if next_token:
+        more_url = url_for("web.student_logs", id=id, cat=request.args.get("cat") or None,
+                           opo=request.args.get("opo") or None, after=next_token)
+    return render_template("_student_logs.html", logs=logs, more_url=more_url,
+                           first_page=not request.args.get("after"))
+
 @web.post("/students/<id>/edit")
 @login_required
 def student_update(id):
@@ -219,13 +344,18 @@ def student_update(id):
         return redirect(url_for("web.student_detail", id=id, tab="gegevens"))
 
     clash = current_app.db.students.find_one(
-        {"studentnummer": doc["studentnummer"], "_id": {"$ne": oid(id)}}
+        {"studentnummer": doc["studentnummer"], "_id": {"$ne": oid(id)}}, ID_ONLY
     )
     if clash:
         flash("Studentnummer is al in gebruik.", "danger")
         return redirect(url_for("web.student_detail", id=id, tab="gegevens"))
 
-    current_app.db.students.update_one({"_id": oid(id)}, {"$set": doc})
+    before = current_app.db.students.find_one_and_update(
+        {"_id": oid(id)}, {"$set": with_search_keys(doc)}, projection={"opleiding_id": 1}
+    )
+    bump(db, "students")
+    if before and "opleiding_id" in doc and before.get("opleiding_id") != doc["opleiding_id"]:
+        move_student(db, before["_id"], before.get("opleiding_id"), doc["opleiding_id"])
     flash("Student bijgewerkt.", "success")
     return redirect(url_for("web.student_detail", id=id, tab="gegevens"))
 
@@ -247,7 +377,12 @@ def student_add_result(id):
     cijfer = None if is_na or cijfer_raw == "" else float(cijfer_raw)
 
     filt = {"student_id": oid(id), "opo_id": opo_id, "academiejaar": aj, "kans": kans}
-    db.resultaten.update_one(filt, {"$set": {"cijfer": cijfer}}, upsert=True)
+    before = db.resultaten.find_one_and_update(
+        filt, {"$set": {"cijfer": cijfer}}, projection=RESULT_FIELDS, upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    bump(db, "resultaten")
+    result_changes(db, [(before, {**filt, "cijfer": cijfer})])
 
     flash("Resultaat opgeslagen.", "success")
     return redirect(url_for("web.student_detail", id=id, tab="resultaten"))
@@ -256,10 +391,11 @@ def student_add_result(id):
 @login_required
 def result_delete(res_id):
     db = current_app.db
-    res = db.resultaten.find_one({"_id": oid(res_id)})
+    res = db.resultaten.find_one_and_delete({"_id": oid(res_id)}, projection=RESULT_FIELDS)
     sid = str(res["student_id"]) if res else None
-
-    db.resultaten.delete_one({"_id": oid(res_id)})
+    if res:
+        bump(db, "resultaten")
+        result_changes(db, [(res, None)])
     flash("Resultaat verwijderd.", "info")
 
     if sid:
@@ -293,6 +429,7 @@ def student_add_log(id):
         return redirect(url_for("web.student_detail", id=id, tab="logboek"))
 
     db.student_logs.insert_one(payload)
+    bump(db, "student_logs")
     flash("Logregel toegevoegd.", "success")
     return redirect(url_for("web.student_detail", id=id, tab="logboek"))
 
@@ -300,10 +437,11 @@ def student_add_log(id):
 @login_required
 def log_delete(log_id):
     db = current_app.db
-    lg = db.student_logs.find_one({"_id": oid(log_id)})
+    lg = db.student_logs.find_one({"_id": oid(log_id)}, {"student_id": 1})
     sid = str(lg["student_id"]) if lg else None
 
-    db.student_logs.delete_one({"_id": oid(log_id)})
+    if db.student_logs.delete_one({"_id": oid(log_id)}).deleted_count:
+        bump(db, "student_logs")
     flash("Logregel verwijderd.", "info")
 
     if sid:
@@ -313,9 +451,9 @@ def log_delete(log_id):
 
 # ---------- OPO's (vakken) ----------
 @web.get("/opos")
+@conditional("opos")
 def opos_page():
-    db = current_app.db
-    opos = [_str_id(o) for o in db.opos.find().sort("afkorting", 1)]
+    opos, _ = _ref("opos")
     return render_template("opos.html", opos=opos, can_edit=current_user.is_authenticated)
 
 @web.post("/opos")
@@ -332,6 +470,8 @@ def opos_create():
         return redirect(url_for("web.opos_page"))
     try:
         db.opos.insert_one(doc)
+        bump(db, "opos")
+        inc_counters(db, opos=1)
         flash("OPO toegevoegd.", "success")
     except DuplicateKeyError:
         flash("Afkorting of code bestaat al.", "danger")
@@ -340,15 +480,17 @@ def opos_create():
 @web.post("/opos/<id>/delete")
 @login_required
 def opos_delete(id):
-    current_app.db.opos.delete_one({"_id": oid(id)})
-    flash("OPO verwijderd.", "info")
+    n = delete_opo(current_app.db, oid(id), archive=current_app.config["SOFT_DELETE"])
+    if n is not None:
+        flash(f"OPO verwijderd ({n['resultaten']} resultaten; "
+              f"{n['student_logs']} logregels niet meer aan een OPO gekoppeld).", "info")
     return redirect(url_for("web.opos_page"))
 
 # ---------- Opleidingen ----------
 @web.get("/opleidingen")
+@conditional("opleidingen")
 def opleidingen_page():
-    db = current_app.db
-    opleidingen = [_str_id(o) for o in db.opleidingen.find().sort("naam", 1)]
+    opleidingen, _ = _ref("opleidingen")
     return render_template("opleidingen.html", opleidingen=opleidingen, can_edit=current_user.is_authenticated)
 
 @web.post("/opleidingen")
@@ -364,6 +506,7 @@ def opleidingen_create():
         return redirect(url_for("web.opleidingen_page"))
     try:
         db.opleidingen.insert_one(doc)
+        bump(db, "opleidingen")
         flash("Opleiding toegevoegd.", "success")
     except DuplicateKeyError:
         flash("Opleiding bestaat al.", "danger")
@@ -373,14 +516,15 @@ def opleidingen_create():
 @login_required
 def opleidingen_delete(id):
     current_app.db.opleidingen.delete_one({"_id": oid(id)})
+    bump(current_app.db, "opleidingen")
     flash("Opleiding verwijderd.", "info")
     return redirect(url_for("web.opleidingen_page"))
 
 # ---------- Academiejaren ----------
 @web.get("/academiejaren")
+@conditional("academiejaren")
 def ajs_page():
-    db = current_app.db
-    ajs = [_str_id(d) for d in db.academiejaren.find().sort("academiejaar", 1)]
+    ajs, _ = _ref("academiejaren")
     return render_template("academiejaren.html", academiejaren=ajs, can_edit=current_user.is_authenticated)
 
 @web.post("/academiejaren")
@@ -392,6 +536,7 @@ def ajs_create():
         return redirect(url_for("web.ajs_page"))
     try:
         current_app.db.academiejaren.insert_one({"academiejaar": aj})
+        bump(current_app.db, "academiejaren")
         flash("Academiejaar toegevoegd.", "success")
     except DuplicateKeyError:
         flash("Academiejaar bestaat al.", "danger")
@@ -401,14 +546,15 @@ def ajs_create():
 @login_required
 def ajs_delete(id):
     current_app.db.academiejaren.delete_one({"_id": oid(id)})
+    bump(current_app.db, "academiejaren")
     flash("Academiejaar verwijderd.", "info")
     return redirect(url_for("web.ajs_page"))
 
 # ---------- Categorieën ----------
 @web.get("/categorien")
+@conditional("categorien")
 def cats_page():
-    db = current_app.db
-    cats = [_str_id(c) for c in db.categorien.find().sort("afkorting", 1)]
+    cats, _ = _ref("categorien")
     return render_template("categorien.html", categorien=cats, can_edit=current_user.is_authenticated)
 
 @web.post("/categorien")
@@ -424,6 +570,7 @@ def cats_create():
         return redirect(url_for("web.cats_page"))
     try:
         db.categorien.insert_one(doc)
+        bump(db, "categorien")
         flash("Categorie toegevoegd.", "success")
     except DuplicateKeyError:
         flash("Categorie bestaat al.", "danger")
@@ -432,180 +579,158 @@ def cats_create():
 @web.post("/categorien/<id>/delete")
 @login_required
 def cats_delete(id):
-    current_app.db.categorien.delete_one({"_id": oid(id)})
-    flash("Categorie verwijderd.", "info")
+    n = delete_categorie(current_app.db, oid(id), archive=current_app.config["SOFT_DELETE"])
+    if n is not None:
+        flash(f"Categorie verwijderd ({_cascade_msg(n)}).", "info")
     return redirect(url_for("web.cats_page"))
 
 # ---------- Collectief rapport ----------
-@web.get("/rapport")
-def rapport_page():
-    db = current_app.db
-
-    # filters
-    academiejaren = [d.get("academiejaar") for d in db.academiejaren.find().sort("academiejaar", 1)]
+def _rapport_filters():
+    """
+    Parses the rapport query string (aj, opl, opos; ajs for the multi-year mode)
+    and loads the dropdown data. Shared by the HTML page and the CSV export.
+    """
+    academiejaren = current_app.refcache.academiejaren()
     sel_aj = request.args.get("aj") or (academiejaren[-1] if academiejaren else "")
+    picked = set(request.args.getlist("ajs"))
+    sel_ajs = [aj for aj in academiejaren if aj in picked]   # chronologisch
 
-    opleidingen, _ = _map_by_id(db.opleidingen.find().sort("naam", 1), "naam", "dag_avond")
+    opleidingen, _ = _ref("opleidingen")
     sel_opl = request.args.get("opl") or ""
 
-    all_opos, opos_map = _map_by_id(db.opos.find().sort("afkorting", 1), "afkorting", "naam")
+    all_opos, opos_map = _ref("opos")
     sel_opo_ids = request.args.getlist("opos")
     shown_opos = [opos_map[i] for i in sel_opo_ids if i in opos_map]
 
-    # fetch students in opleiding (optional)
-    stu_q = {}
-    if sel_opl:
-        try:
-            stu_q["opleiding_id"] = oid(sel_opl)
-        except Exception:
-            pass
-    students = list(db.students.find(stu_q))
-    stu_map = {str(s["_id"]): _str_id(s) for s in students}
-
-    # for each student, gather best (max) cijfer per selected OPO in selected AJ
-    rows = []
-    if students:
-        res_q = {"academiejaar": sel_aj}
-        if sel_opo_ids:
-            res_q["opo_id"] = {"$in": [oid(x) for x in sel_opo_ids]}
-        if sel_opl:
-            res_q["student_id"] = {"$in": [s["_id"] for s in students]}
-        else:
-            res_q["student_id"] = {"$in": [s["_id"] for s in students]}
-
-        cursor = db.resultaten.find(res_q)
-        # build best per (student, opo)
-        by_stu = {sid: {"student": _str_id(s), "cells": {}} for sid, s in stu_map.items()}
-        for r in cursor:
-            sid = str(r["student_id"])
-            oid_str = str(r["opo_id"])
-            best = by_stu.setdefault(sid, {"student": stu_map.get(sid, {}), "cells": {}})["cells"].get(oid_str)
-            val = None if r.get("cijfer") is None else float(r["cijfer"])
-            if best is None or (val is not None and (best["best"] is None or val > best["best"])):
-                by_stu[sid]["cells"][oid_str] = {"best": val, "kans": r.get("kans")}
-        rows = list(by_stu.values())
-    
-        # ---- Per-OPO samenvatting (tellen + %) ----
-    opo_stats = []
-    if sel_opo_ids and rows:
-        # init counters in selection order
-        stats = {oid: {"total": 0, "passed": 0, "failed": 0, "na": 0} for oid in sel_opo_ids}
-
-        for r in rows:
-            cells = r.get("cells", {})
-            for oid_str in sel_opo_ids:
-                c = cells.get(oid_str)
-                if not c:
-                    continue  # student deed dit OPO niet in dit AJ
-                stats[oid_str]["total"] += 1
-                val = c.get("best")
-                if val is None:
-                    stats[oid_str]["na"] += 1
-                elif val >= 10:
-                    stats[oid_str]["passed"] += 1
-                else:
-                    stats[oid_str]["failed"] += 1
-
-        # build list (keep same order as selectie)
-        for oid_str in sel_opo_ids:
-            d = stats[oid_str]
-            tot = d["total"] or 0
-
-            def pct(n):  # None if no denominator
-                return round((n * 100.0) / tot, 1) if tot else None
-
-            opo_stats.append({
-                "id": oid_str,
-                "opo": opos_map.get(oid_str),   # {afkorting, naam, ...}
-                "total": tot,
-                "passed": d["passed"], "pct_passed": pct(d["passed"]),
-                "failed": d["failed"], "pct_failed": pct(d["failed"]),
-                "na": d["na"],         "pct_na":     pct(d["na"]),
-            })
+    return {
+        "academiejaren": academiejaren,
+        "sel_aj": sel_aj,
+        "sel_ajs": sel_ajs,
+        "opleidingen": opleidingen,
+        "sel_opl": sel_opl,
+        "all_opos": all_opos,
+        "opos_map": opos_map,
+        "sel_opo_ids": sel_opo_ids,
+        "shown_opos": shown_opos,
+    }
+
+@web.get("/rapport")
+@conditional(*RAPPORT_DEPS)
+def rapport_page():
+    db = current_app.report_view_db
+    f = _rapport_filters()
+    budget = _budget("rapport")
+
+    multi_stats = None
+    if f["sel_ajs"]:
+        # meerdere jaren: draaitabel + samenvatting per (OPO, jaar) in één aggregate
+        rows, multi_stats = rapport_multi(db, f["sel_ajs"], f["sel_opl"], f["sel_opo_ids"], max_time_ms=budget)
+        opo_stats = []
+    else:
+        # best cijfer per (student, OPO) + per-OPO samenvatting: beide server-side
+        rows = list(rapport_rows(db, f["sel_aj"], f["sel_opl"], f["sel_opo_ids"], max_time_ms=budget))
+        opo_stats = rapport_opo_stats(db, f["sel_aj"], f["sel_opl"], f["sel_opo_ids"], f["opos_map"])
 
     return render_template(
         "rapport.html",
-        academiejaren=academiejaren,
-        sel_aj=sel_aj,
-        opleidingen=opleidingen,
-        sel_opl=sel_opl,
-        all_opos=all_opos,
-        sel_opo_ids=sel_opo_ids,
-        shown_opos=shown_opos,
+        academiejaren=f["academiejaren"],
+        sel_aj=f["sel_aj"],
+        sel_ajs=f["sel_ajs"],
+        opleidingen=f["opleidingen"],
+        sel_opl=f["sel_opl"],
+        all_opos=f["all_opos"],
+        sel_opo_ids=f["sel_opo_ids"],
+        shown_opos=f["shown_opos"],
         rows=rows,
         opo_stats=opo_stats,
+        multi_stats=multi_stats,
+        job_id=request.args.get("job"),
         can_edit=current_user.is_authenticated,
     )
+
+def _statistiek_data():
+    db = current_app.report_view_db
+    f = _rapport_filters()
+    sel_ajs = [aj for aj in request.args.getlist("ajs") if aj]
+    stats = grade_statistics(db, f["sel_opl"], f["sel_opo_ids"], sel_ajs, max_time_ms=_budget("statistiek"))
+    _, opl_map = _ref("opleidingen")
+
+    per_opo = [
+        {"id": o["_id"], "opo": o, "jaren": stats["per_opo"][ObjectId(o["_id"])]}
+        for o in f["all_opos"] if ObjectId(o["_id"]) in stats["per_opo"]
+    ]
+    per_opleiding = [
+        {"id": str(k) if k else "", "label": opl_map.get(str(k), {}).get("label", "— geen opleiding —"), "jaren": v}
+        for k, v in stats["per_opleiding"].items()
+    ]
+    per_opleiding.sort(key=lambda d: d["label"])
+    return f, sel_ajs, per_opo, per_opleiding
+
+@web.get("/rapport/statistiek")
+@conditional(*RAPPORT_DEPS)
+def statistiek_page():
+    f, sel_ajs, per_opo, per_opleiding = _statistiek_data()
+    return render_template(
+        "statistiek.html",
+        academiejaren=f["academiejaren"],
+        sel_ajs=sel_ajs,
+        opleidingen=f["opleidingen"],
+        sel_opl=f["sel_opl"],
+        all_opos=f["all_opos"],
+        sel_opo_ids=f["sel_opo_ids"],
+        per_opo=per_opo,
+        per_opleiding=per_opleiding,
+        can_edit=current_user.is_authenticated,
+    )
+
+@web.get("/rapport/statistiek.json")
+@conditional(*RAPPORT_DEPS)
+def statistiek_json():
+    _, _, per_opo, per_opleiding = _statistiek_data()
+    return jsonify({
+        "per_opo": [
+            {"opo_id": d["id"], "afkorting": d["opo"].get("afkorting"), "naam": d["opo"].get("naam"), "jaren": d["jaren"]}
+            for d in per_opo
+        ],
+        "per_opleiding": [
+            {"opleiding_id": d["id"] or None, "label": d["label"], "jaren": d["jaren"]}
+            for d in per_opleiding
+        ],
+    })
+
 @web.get("/rapport.csv")
 @login_required
+@conditional(*RAPPORT_DEPS)
 def rapport_csv():
-    db = current_app.db
+    header, lines, name = _rapport_export(grade_text)
+    return _csv_response(header, lines, f"{name}.csv")
 
-    # same filters as HTML view
-    academiejaren = [d.get("academiejaar") for d in db.academiejaren.find().sort("academiejaar", 1)]
-    sel_aj = request.args.get("aj") or (academiejaren[-1] if academiejaren else "")
+@web.get("/rapport.xlsx")
+@login_required
+@conditional(*RAPPORT_DEPS)
+def rapport_xlsx():
+    header, lines, name = _rapport_export(grade_value)
+    return _xlsx_response(header, lines, f"{name}.xlsx", sheet="Rapport")
 
-    opleidingen, _ = _map_by_id(db.opleidingen.find().sort("naam", 1), "naam", "dag_avond")
-    sel_opl = request.args.get("opl") or ""
+def _rapport_export(grade):
+    """(header, lines, file name without extension) for the rapport in the current filters."""
+    db = current_app.report_view_db
+    budget = _budget("export")
 
-    all_opos, opos_map = _map_by_id(db.opos.find().sort("afkorting", 1), "afkorting", "naam")
-    sel_opo_ids = request.args.getlist("opos")
-    shown_opos = [opos_map[i] for i in sel_opo_ids if i in opos_map]
+    # same filters as HTML view
+    f = _rapport_filters()
+    sel_aj, sel_ajs, shown_opos = f["sel_aj"], f["sel_ajs"], f["shown_opos"]
 
-    # students in (optional) opleiding
-    stu_q = {}
-    if sel_opl:
-        try:
-            stu_q["opleiding_id"] = oid(sel_opl)
-        except Exception:
-            pass
-    students = list(db.students.find(stu_q))
-    stu_map = {str(s["_id"]): _str_id(s) for s in students}
-
-    # best grade per (student, opo) for selected AJ
-    rows = []
-    if students:
-        res_q = {"academiejaar": sel_aj, "student_id": {"$in": [s["_id"] for s in students]}}
-        if sel_opo_ids:
-            res_q["opo_id"] = {"$in": [oid(x) for x in sel_opo_ids]}
-        by_stu = {sid: {"student": _str_id(s), "cells": {}} for sid, s in stu_map.items()}
-        for r in db.resultaten.find(res_q):
-            sid = str(r["student_id"])
-            oid_str = str(r["opo_id"])
-            best = by_stu[sid]["cells"].get(oid_str)
-            val = None if r.get("cijfer") is None else float(r["cijfer"])
-            if best is None or (val is not None and (best["best"] is None or val > best["best"])):
-                by_stu[sid]["cells"][oid_str] = {"best": val, "kans": r.get("kans")}
-        rows = list(by_stu.values())
-
-    # Build CSV
-    sio = io.StringIO()
-    w = csv.writer(sio)
+    if sel_ajs:
+        rows, _ = rapport_multi(db, sel_ajs, f["sel_opl"], f["sel_opo_ids"], max_time_ms=budget)
+        header, lines = rapport_multi_table(rows, shown_opos, sel_ajs, grade)
+        return header, lines, f"rapport_{sel_ajs[0]}_{sel_ajs[-1]}"
 
-    # Header
-    header = ["studentnummer", "achternaam", "voornaam"]
-    header += [f"{o['afkorting']} — {o['naam']}" for o in shown_opos] or ["— geen OPO’s gekozen —"]
-    w.writerow(header)
-
-    # Rows
-    for r in rows:
-        stu = r.get("student", {})
-        line = [stu.get("studentnummer", ""), stu.get("achternaam", ""), stu.get("voornaam", "")]
-        if shown_opos:
-            for o in shown_opos:
-                cell = r.get("cells", {}).get(o["_id"])
-                if not cell:
-                    line.append("")
-                else:
-                    line.append("NA" if cell["best"] is None else f"{cell['best']:.1f}")
-        else:
-            line.append("")
-        w.writerow(line)
-
-    out = sio.getvalue()
-    fname = f"rapport_{sel_aj or 'onbekend'}.csv"
-    return Response(out, mimetype="text/csv",
-                    headers={"Content-Disposition": f"attachment; filename={fname}"})
+    batch = current_app.config["EXPORT_BATCH_SIZE"]
+    rows = _primed(rapport_rows(db, sel_aj, f["sel_opl"], f["sel_opo_ids"], batch_size=batch, max_time_ms=budget))
+
+    header, lines = rapport_table(rows, shown_opos, grade)
+    return header, lines, f"rapport_{sel_aj or 'onbekend'}"
 
 @web.post("/students/import")
 @login_required
@@ -616,82 +741,12 @@ def students_import():
         flash("Kies een CSV-bestand.", "danger")
         return redirect(url_for("web.students_page"))
 
-    # Lees het hele bestand als bytes en decodeer naar tekst (UTF-8 met BOM tolerant)
-    try:
-        raw = f.read()
-        text = raw.decode("utf-8-sig") if isinstance(raw, (bytes, bytearray)) else str(raw)
-    except Exception as e:
-        flash(f"Kon CSV niet lezen: {e}", "danger")
-        return redirect(url_for("web.students_page"))
-
-    reader = csv.DictReader(io.StringIO(text))
-
-    # Build label -> opleiding_id map: "Naam — dag_avond"
-    opl_map = {}
-    for o in db.opleidingen.find():
-        label = f"{o.get('naam','').strip()} — {o.get('dag_avond','').strip()}".strip()
-        opl_map[label] = o["_id"]
-
-    created = 0
-    updated = 0
-    skipped = 0
-    errors = []
-
-    for i, row in enumerate(reader, start=2):  # header is regel 1
-        try:
-            snr = (row.get("studentnummer") or "").strip()
-            vn  = (row.get("voornaam") or "").strip()
-            an  = (row.get("achternaam") or "").strip()
-            ins = (row.get("inschrijfdatum") or "").strip()
-            opl_label = (row.get("opleiding_label") or "").strip()
-
-            if not snr or not vn or not an:
-                skipped += 1
-                errors.append(f"Rij {i}: ontbrekende verplichte velden (studentnummer/voornaam/achternaam).")
-                continue
-
-            doc = {
-                "studentnummer": snr,
-                "voornaam": vn,
-                "achternaam": an,
-                "inschrijfdatum": ins,
-            }
-
-            if opl_label:
-                opl_id = opl_map.get(opl_label)
-                if opl_id:
-                    doc["opleiding_id"] = opl_id
-                else:
-                    # onbekende opleiding is oké; laten we gewoon melden
-                    errors.append(f"Rij {i}: opleiding niet gevonden: '{opl_label}'. Student aangemaakt zonder opleiding.")
-
-            # upsert op studentnummer
-            res = db.students.update_one(
-                {"studentnummer": snr},
-                {"$set": doc},
-                upsert=True,
-            )
-            if res.upserted_id:
-                created += 1
-            elif res.modified_count:
-                updated += 1
-            else:
-                # bestond al en geen wijzigingen
-                skipped += 1
-
-        except Exception as e:
-            skipped += 1
-            errors.append(f"Rij {i}: {e}")
-
-    msg = f"Import klaar. Nieuw: {created}, Bijgewerkt: {updated}, Overgeslagen: {skipped}."
-    if errors:
-        # laat max ~5 fouten zien om flash kort te houden
-        sample = " | ".join(errors[:5])
-        extra = f" (+{len(errors)-5} meer)" if len(errors) > 5 else ""
-        flash(msg + " Fouten: " + sample + extra, "warning")
-    else:
-        flash(msg, "success")
+    if current_app.jobs is not None:
+        return _start_job("students_import", students_import_job, upload=f)
 
+    # Stream-parse de upload (UTF-8 met BOM tolerant) en upsert in batches
+    report = import_students(db, open_text(f), batch_size=current_app.config["IMPORT_BATCH_SIZE"])
+    _flash_import_report(report)
     return redirect(url_for("web.students_page"))
 
 @web.get("/students/import/sample.csv")
@@ -705,28 +760,141 @@ def students_import_sample():
     return Response(sio.getvalue(), mimetype="text/csv",
                     headers={"Content-Disposition": "attachment; filename=students_sample.csv"})
 
-@web.get("/students.csv")
+@web.post("/results/import")
 @login_required
-def students_csv():
+def results_import():
     db = current_app.db
-    _, opl_map = _map_by_id(db.opleidingen.find().sort("naam", 1), "naam", "dag_avond")
+    f = request.files.get("file")
+    if not f or f.filename == "":
+        flash("Kies een CSV- of NDJSON-bestand.", "danger")
+        return redirect(url_for("web.students_page"))
+
+    fmt = detect_format(f.filename, f.mimetype)
+    if current_app.jobs is not None:
+        return _start_job("results_import", results_import_job, upload=f, params={"fmt": fmt})
 
+    report = import_results(db, open_text(f), fmt=fmt, batch_size=current_app.config["IMPORT_BATCH_SIZE"])
+
+    # scripts krijgen het volledige foutrapport als JSON
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(report.to_dict())
+    _flash_import_report(report)
+    return redirect(url_for("web.students_page"))
+
+@web.get("/results/import/sample.csv")
+@login_required
+def results_import_sample():
     sio = io.StringIO()
     w = csv.writer(sio)
-    w.writerow(["studentnummer", "voornaam", "achternaam", "inschrijfdatum", "opleiding_label", "opleiding_id"])
-
-    for s in db.students.find().sort([("achternaam", 1), ("voornaam", 1)]):
-        s = _str_id(s)
-        opl_id = s.get("opleiding_id")
-        label = opl_map.get(opl_id, {}).get("label", "") if opl_id else ""
-        w.writerow([
-            s.get("studentnummer",""),
-            s.get("voornaam",""),
-            s.get("achternaam",""),
-            s.get("inschrijfdatum",""),
-            label,
-            opl_id or "",
-        ])
-
+    w.writerow(["studentnummer", "opo", "academiejaar", "kans", "cijfer"])
+    w.writerow(["2025-0001", "WEB1", "2024-2025", "1", "14.5"])
+    w.writerow(["2025-0001", "DB", "2024-2025", "1", "8"])
+    w.writerow(["2025-0001", "DB", "2024-2025", "2", "NA"])
     return Response(sio.getvalue(), mimetype="text/csv",
-                    headers={"Content-Disposition": "attachment; filename=students.csv"})
+                    headers={"Content-Disposition": "attachment; filename=results_sample.csv"})
+
+@web.get("/students.csv")
+@login_required
+@conditional("students", "opleidingen")
+def students_csv():
+    header, lines = _students_export()
+    return _csv_response(header, lines, "students.csv")
+
+@web.get("/students.xlsx")
+@login_required
+@conditional("students", "opleidingen")
+def students_xlsx():
+    header, lines = _students_export(typed=True)
+    return _xlsx_response(header, lines, "students.xlsx", sheet="Studenten")
+
+def _inschrijfdatum(val):
+    try:
+        return date.fromisoformat(val)
+    except (TypeError, ValueError):
+        return val
+
+def _students_export(typed=False):
+    """
+    (header, lines) of all students, sorted by naam. typed: inschrijfdatum as a
+    date (XLSX) instead of the stored ISO string. Read like the rapport exports:
+    report_view_db, `export` budget, first batch fetched in the view.
+    """
+    db = current_app.report_view_db
+    # opleiding_id op studenten is een ObjectId -> map ook op ObjectId sleutelen
+    _, opl_map = _ref("opleidingen")
+    opl_labels = {ObjectId(k): o["label"] for k, o in opl_map.items()}
+
+    cursor = (db.students.find({}, STUDENT_EXPORT_FIELDS)
+              .sort([("achternaam", 1), ("voornaam", 1)])
+              .batch_size(current_app.config["EXPORT_BATCH_SIZE"]))
+    if budget := _budget("export"):
+        cursor = cursor.max_time_ms(budget)
+
+    def docs():
+        with budgeted():
+            yield from cursor
+
+    students = _primed(docs())
+
+    def lines():
+        for s in students:
+            opl_id = s.get("opleiding_id")
+            yield [
+                s.get("studentnummer",""),
+                s.get("voornaam",""),
+                s.get("achternaam",""),
+                _inschrijfdatum(s.get("inschrijfdatum","")) if typed else s.get("inschrijfdatum",""),
+                opl_labels.get(opl_id, "") if opl_id else "",
+                str(opl_id) if opl_id else "",
+            ]
+
+    header = ["studentnummer", "voornaam", "achternaam", "inschrijfdatum", "opleiding_label", "opleiding_id"]
+    return header, lines()
+
+# ---------- Achtergrondjobs (imports/exports) ----------
+def _start_job(kind, fn, upload=None, params=None, back="web.students_page", back_args=None):
+    """
+    Spool the upload (if any), queue the job and send the user back to a page
+    that polls its progress; scripts (Accept: application/json) get 202 + URL.
+    """
+    runner = current_app.jobs
+    job_id, path = runner.spool(upload) if upload is not None else (None, None)
+    job_id = runner.submit(kind, fn, params=params, job_id=job_id, input_path=path,
+                           user_id=current_user.get_id())
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"job": str(job_id), "status_url": url_for("web.job_status", job_id=str(job_id))}), 202
+    flash("Gestart op de achtergrond; de voortgang verschijnt hieronder.", "info")
+    return redirect(url_for(back, job=str(job_id), **(back_args or {})))
+
+def _own_job(job_id):
+    if not ObjectId.is_valid(job_id) or current_app.jobs is None:
+        abort(404)
+    doc = current_app.jobs.get(ObjectId(job_id))
+    if not doc or (doc.get("user_id") != current_user.get_id() and current_user.role != "admin"):
+        abort(404)
+    return doc
+
+@web.get("/jobs/<job_id>")
+@login_required
+def job_status(job_id):
+    return jsonify(job_public(_own_job(job_id)))
+
+@web.get("/jobs/<job_id>/download")
+@login_required
+def job_download(job_id):
+    doc = _own_job(job_id)
+    f = doc.get("file")
+    if not f:
+        abort(404)
+    return send_file(f["path"], mimetype=f["mimetype"], as_attachment=True, download_name=f["name"])
+
+@web.post("/rapport/export")
+@login_required
+def rapport_export():
+    f = _rapport_filters()
+    params = {"sel_aj": f["sel_aj"], "sel_ajs": f["sel_ajs"], "sel_opl": f["sel_opl"], "sel_opo_ids": f["sel_opo_ids"],
+              "fmt": "xlsx" if request.args.get("fmt") == "xlsx" else "csv"}
+    args = {"aj": f["sel_aj"], "ajs": f["sel_ajs"], "opl": f["sel_opl"], "opos": f["sel_opo_ids"]}
+    if current_app.jobs is None:
+        return redirect(url_for("web.rapport_xlsx" if params["fmt"] == "xlsx" else "web.rapport_csv", **args))
+    return _start_job("rapport_export", rapport_export_job, params=params, back="web.rapport_page", back_args=args)
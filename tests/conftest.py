@@ -0,0 +1,151 @@
+# tests/conftest.py
+"""
+Shared fixtures.
+
+`mongo_db` / `mongo_db_module` are throw-away databases on MONGO_URI (e.g.
+mongodb://localhost:27017/), dropped afterwards; tests using them are skipped
+when MONGO_URI is not set or the server does not answer. `mongo_app` is the
+app on `mongo_db` (API token "geheim").
+
+`fake_db` / `fake_client` need no server: the app is built on a small fake
+client that records every find()/find_one()/aggregate().
+"""
+import os, uuid
+from contextlib import contextmanager
+
+import pytest
+from bson import ObjectId
+
+MONGO_URI = os.getenv("MONGO_URI")
+
+
+@contextmanager
+def _throwaway_db():
+    if not MONGO_URI:
+        pytest.skip("MONGO_URI not set (needs a running mongod)")
+    pymongo = pytest.importorskip("pymongo")
+    client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError as e:
+        client.close()
+        pytest.skip(f"no MongoDB at MONGO_URI: {e}")
+    name = f"studentopvolging_test_{uuid.uuid4().hex[:8]}"
+    try:
+        yield client[name]
+    finally:
+        client.drop_database(name)
+        client.close()
+
+
+@pytest.fixture
+def mongo_db():
+    with _throwaway_db() as db:
+        yield db
+
+
+@pytest.fixture(scope="module")
+def mongo_db_module():
+    with _throwaway_db() as db:
+        yield db
+
+
+@pytest.fixture
+def mongo_app(mongo_db, monkeypatch):
+    """The Flask app on `mongo_db`, jobs run in the request."""
+    monkeypatch.setenv("MONGO_DB", mongo_db.name)
+    monkeypatch.setenv("JOBS_WORKERS", "0")
+    monkeypatch.setenv("API_TOKEN", "geheim")
+    from app import create_app
+    flask_app = create_app()
+    flask_app.config.update(TESTING=True)
+    return flask_app
+
+
+# ---------- Fake client ----------
+class FakeCursor(list):
+    def sort(self, *a, **k):
+        return self
+
+    def limit(self, *a, **k):
+        return self
+
+    def batch_size(self, *a, **k):
+        return self
+
+    def max_time_ms(self, *a, **k):
+        return self
+
+
+class FakeCollection:
+    def __init__(self, name, db):
+        self.name, self.db = name, db
+        self.docs, self.calls = db.data.get(name, []), db.calls
+
+    def _record(self, op, arg):
+        self.calls.append((self.name, op, arg))
+        self.db.reads.append((self.name, self.db.read_preference))
+
+    def find(self, filter=None, projection=None, **kw):
+        self._record("find", projection)
+        return FakeCursor(dict(d) for d in self.docs)
+
+    def find_one(self, filter=None, projection=None, **kw):
+        self._record("find_one", projection)
+        return dict(self.docs[0]) if self.docs else None
+
+    def aggregate(self, pipeline, **kw):
+        self._record("aggregate", pipeline)
+        return iter([])
+
+    def index_information(self):
+        return {}
+
+    def __getattr__(self, name):
+        # create_index, update_one, replace_one, ... : no-ops
+        return lambda *a, **k: None
+
+
+class FakeDB:
+    """
+    Collections of fixed documents; `calls` holds (collection, op, projection or
+    pipeline), `reads` (collection, read_preference) for the same reads.
+    """
+    name = "test"
+    Collection = FakeCollection
+
+    def __init__(self, data, calls=None, reads=None, read_preference=None):
+        self.data, self.read_preference = data, read_preference
+        self.calls = [] if calls is None else calls
+        self.reads = [] if reads is None else reads
+
+    def with_options(self, read_preference=None, **kw):
+        return FakeDB(self.data, self.calls, self.reads, read_preference)
+
+    def __getitem__(self, name):
+        return FakeCollection(name, self)
+
+    __getattr__ = __getitem__
+
+
+@pytest.fixture
+def fake_db():
+    student_id = ObjectId()
+    db = FakeDB({
+        "students": [{"_id": student_id, "studentnummer": "r1", "voornaam": "A", "achternaam": "B"}],
+        "resultaten": [{"_id": ObjectId(), "opo_id": ObjectId(), "academiejaar": "2024-2025", "kans": 1, "cijfer": 12.0}],
+        "academiejaren": [{"_id": ObjectId(), "academiejaar": aj} for aj in ("2023-2024", "2024-2025")],
+    })
+    db.student_id = student_id
+    return db
+
+
+@pytest.fixture
+def fake_client(fake_db, monkeypatch):
+    """(Flask test client, recorded calls) for an app on `fake_db`, logged in."""
+    import app as app_module
+    monkeypatch.setattr(app_module, "MongoClient", lambda uri, **kw: {"studentopvolging": fake_db})
+    flask_app = app_module.create_app()
+    flask_app.config.update(TESTING=True, LOGIN_DISABLED=True)
+    fake_db.calls.clear()
+    return flask_app.test_client(), fake_db.calls
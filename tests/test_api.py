@@ -0,0 +1,67 @@
+# tests/test_api.py
+"""
+Documents the JSON API writes (shared by routes.py and asgi.py) survive a BSON
+round-trip with the types the rest of the app queries on (no database needed),
+and who may write (`mongo_app`).
+"""
+import json
+from datetime import date
+
+import bson
+from bson import ObjectId
+from werkzeug.datastructures import MultiDict
+
+from app.routes import STUDENT_API_SORT, list_query, log_doc, ser, student_doc
+from app.search import SEARCH_FIELD
+from app.schemas import StudentIn, StudentLogIn
+
+
+def roundtrip(doc):
+    return bson.decode(bson.encode(doc))
+
+
+def test_dated_student():
+    data = StudentIn(studentnummer=" r0123 ", voornaam="Ann", achternaam="Peeters",
+                     inschrijfdatum=date(2024, 9, 16)).model_dump()
+    doc = roundtrip(student_doc(data))
+    assert doc["studentnummer"] == "r0123" and doc["inschrijfdatum"] == "2024-09-16"
+    assert roundtrip(student_doc(StudentIn(studentnummer="r0124", voornaam="A", achternaam="B")
+                                 .model_dump()))["inschrijfdatum"] == ""
+
+
+def test_no_search_keys():
+    doc = student_doc(StudentIn(studentnummer="r0125", voornaam="Ann", achternaam="Peeters").model_dump())
+    assert doc[SEARCH_FIELD] and SEARCH_FIELD not in ser(doc)   # create-antwoorden
+
+    cfg = {"API_PAGE_SIZE": 100, "API_PAGE_MAX": 5000}
+    def projection(**args):
+        return list_query(MultiDict(args), cfg, {}, STUDENT_API_SORT)[1]
+    assert projection() == {SEARCH_FIELD: 0}
+    assert projection(fields=f"voornaam,{SEARCH_FIELD}") == {"voornaam": 1, "studentnummer": 1}
+
+
+def test_opo_linked_log():
+    sid, cat, opo = ObjectId(), ObjectId(), ObjectId()
+    data = StudentLogIn(student_id=str(sid), categorie_id=str(cat), opo_id=str(opo),
+                        beschrijving="gesprek").model_dump()
+    doc = roundtrip(log_doc(data))
+    assert (doc["student_id"], doc["categorie_id"], doc["opo_id"]) == (sid, cat, opo)
+    assert doc["registratiedatum"] is not None
+
+
+def test_session_writes_need_json(mongo_app):
+    c = mongo_app.test_client()
+    c.post("/register", data={"name": "a", "email": "a@a", "password": "x", "confirm": "x"})
+    body = json.dumps({"studentnummer": "r0001", "voornaam": "A", "achternaam": "B"})
+    # wat een cross-site formulier of no-cors fetch kan sturen
+    assert c.post("/api/students", data=body, content_type="text/plain").status_code == 415
+    assert c.post("/api/students", data={"studentnummer": "r0001"}).status_code == 415
+    assert c.post("/api/students/bulk", data="[" + body + "]", content_type="text/plain").status_code == 415
+    assert mongo_app.db.students.count_documents({}) == 0
+
+    assert c.post("/api/students", data=body, content_type="application/json").status_code == 201
+    # het API-token heeft geen cookie nodig en dus ook geen content type
+    anon = mongo_app.test_client()
+    assert anon.post("/api/students", data=body.replace("r0001", "r0002")).status_code == 401
+    assert anon.post("/api/students", data=body.replace("r0001", "r0002"),
+                     headers={"Authorization": "Bearer geheim"}).status_code == 201
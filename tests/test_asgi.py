@@ -0,0 +1,76 @@
+# tests/test_asgi.py
+"""
+The async API (asgi.py), driven as a plain ASGI callable. Routing, auth and
+validation run without a server; the list/overview test uses `mongo_db`.
+"""
+import asyncio, json
+
+import pytest
+
+pytest.importorskip("pymongo.asynchronous")
+
+from app.asgi import create_asgi_app
+
+
+async def call(app, method, path, query=b"", body=None, token=None):
+    sent = []
+    msgs = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b""}]
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+
+    async def receive():
+        return msgs.pop(0)
+
+    async def send(msg):
+        sent.append(msg)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query, "headers": headers}
+    await app(scope, receive, send)
+    data = b"".join(m.get("body", b"") for m in sent[1:])
+    return sent[0]["status"], json.loads(data) if data else None
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv("API_TOKEN", "geheim")
+    return create_asgi_app()
+
+
+def test_routing_auth_validation(api):
+    async def run():
+        assert (await call(api, "GET", "/api/onbekend"))[0] == 404
+        assert (await call(api, "DELETE", "/api/students"))[0] == 405
+        assert (await call(api, "POST", "/api/opos", body={"afkorting": "X"}))[0] == 401
+        status, body = await call(api, "POST", "/api/opos", body={"afkorting": "X"}, token="geheim")
+        assert status == 422 and body["error"] == "validation"
+        assert (await call(api, "GET", "/api/students", b"after=zzz"))[0] == 400   # vóór de query
+
+    asyncio.run(run())
+
+
+def test_lists_and_overview(mongo_db, monkeypatch):
+    monkeypatch.setenv("MONGO_DB", mongo_db.name)
+    monkeypatch.setenv("API_PAGE_SIZE", "2")
+    db = mongo_db
+    sids = db.students.insert_many([{"studentnummer": f"r{i:03}", "voornaam": "V", "achternaam": "A"}
+                                    for i in range(5)]).inserted_ids
+    db.resultaten.insert_one({"student_id": sids[0], "opo_id": sids[0], "academiejaar": "2024-2025",
+                              "kans": 1, "cijfer": 12.0})
+
+    async def run():
+        api = create_asgi_app()   # één event loop: de AsyncMongoClient hoort erbij
+        seen, query = [], b"limit=2"
+        while True:
+            status, page = await call(api, "GET", "/api/students", query)
+            assert status == 200
+            seen += [d["studentnummer"] for d in page["items"]]
+            if not page["next"]:
+                break
+            query = b"limit=2&after=" + page["next"].encode()
+        assert seen == [f"r{i:03}" for i in range(5)]
+
+        status, body = await call(api, "GET", f"/api/students/{sids[0]}")
+        assert status == 200 and body["student"]["studentnummer"] == "r000"
+        assert [r["cijfer"] for r in body["results"]] == [12.0] and body["logs"] == []
+        await api.client.close()
+
+    asyncio.run(run())
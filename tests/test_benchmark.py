@@ -0,0 +1,150 @@
+# tests/test_benchmark.py
+"""
+Route-level benchmark: seeds a throw-away database with `flask seed`-style data
+and runs the main pages, exports, imports and API lists through the Flask
+test client, reporting latency percentiles and MongoDB command counts.
+
+Opt-in, it is slow, and it needs a real MongoDB:
+
+    BENCH_SIZES=1000,10000,100000 MONGO_URI=mongodb://localhost:27017/ \
+        python -m pytest -q -s tests/test_benchmark.py
+
+BENCH_REPEAT sets the number of timed requests per route (default 20).
+"""
+import io, os, time, uuid
+from statistics import quantiles
+
+import pytest
+
+import app as app_module
+
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "").split(",") if n.strip()]
+REPEAT = int(os.getenv("BENCH_REPEAT", "20"))
+MONGO_URI = os.getenv("MONGO_URI")
+
+pytestmark = [
+    pytest.mark.skipif(not SIZES, reason="set BENCH_SIZES=1000,10000,... to run the benchmark"),
+    pytest.mark.skipif(not MONGO_URI, reason="MONGO_URI not set (needs a running mongod)"),
+]
+
+
+class CommandCounter:
+    """pymongo CommandListener that just counts started commands."""
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def _client_factory(counter):
+    # ook de rapport-client (app.report_db) gaat naar MONGO_URI en wordt meegeteld
+    import pymongo
+    return lambda uri, event_listeners=(), **kw: pymongo.MongoClient(
+        MONGO_URI, event_listeners=[counter, *event_listeners], **kw)
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda n: f"{n}_students")
+def bench_app(request, monkeypatch_module):
+    counter = CommandCounter()
+    db_name = f"studentopvolging_bench_{uuid.uuid4().hex[:8]}"
+    monkeypatch_module.setenv("MONGO_DB", db_name)
+    monkeypatch_module.setattr(app_module, "MongoClient", _client_factory(counter))
+    flask_app = app_module.create_app()
+    flask_app.config.update(TESTING=True, LOGIN_DISABLED=True, PROPAGATE_EXCEPTIONS=False)
+
+    from app.seed import seed
+    t0 = time.perf_counter()
+    info = seed(flask_app.db, students=request.param, rng_seed=42)
+    print(f"\n== {request.param} studenten: seed {time.perf_counter() - t0:.1f}s "
+          f"({info['resultaten']} resultaten, {info['student_logs']} logs)")
+
+    yield flask_app, counter, info
+    flask_app.db.client.drop_database(db_name)
+
+
+@pytest.fixture(scope="module")
+def monkeypatch_module():
+    mp = pytest.MonkeyPatch()
+    yield mp
+    mp.undo()
+
+
+def _measure(client, counter, method, url, repeat=REPEAT, **kw):
+    def call():
+        # uploads are callables: a file object can only be sent once
+        return client.open(url, method=method, **{k: v() if callable(v) else v for k, v in kw.items()})
+
+    call().get_data()  # warm-up (caches, connection pool)
+    times, queries, status = [], [], None
+    for _ in range(repeat):
+        before = counter.count
+        t0 = time.perf_counter()
+        resp = call()
+        resp.get_data()  # streamed bodies are produced here
+        times.append((time.perf_counter() - t0) * 1000)
+        queries.append(counter.count - before)
+        status = resp.status_code
+    return status, times, queries
+
+
+def _report(name, status, times, queries):
+    if len(times) > 1:
+        q = quantiles(times, n=100, method="inclusive")
+        p50, p95, p99 = q[49], q[94], q[98]
+    else:
+        p50 = p95 = p99 = times[0]
+    print(f"  {name:<28} {status:>3}  p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms  "
+          f"queries {max(queries):>4}")
+
+
+def _csv_upload(text, name):
+    return lambda: {"file": (io.BytesIO(text.encode("utf-8")), name)}
+
+
+def test_routes(bench_app):
+    flask_app, counter, info = bench_app
+    db = flask_app.db
+    client = flask_app.test_client()
+
+    aj = info["academiejaren"][-1]
+    sid = db.students.find_one({}, {"_id": 1}, sort=[("_id", 1)])["_id"]
+    opo_ids = [str(o["_id"]) for o in db.opos.find({}, {"_id": 1}).limit(6)]
+    rapport_q = f"aj={aj}&" + "&".join(f"opos={o}" for o in opo_ids)
+
+    students = list(db.students.find({}, {"studentnummer": 1, "voornaam": 1, "achternaam": 1}).limit(1000))
+    opos = list(db.opos.find({}, {"afkorting": 1}).limit(6))
+    stu_csv = "studentnummer,voornaam,achternaam,inschrijfdatum,opleiding_label\n" + "".join(
+        f"{s['studentnummer']},{s['voornaam']},{s['achternaam']},,\n" for s in students)
+    res_csv = "studentnummer,opo,academiejaar,kans,cijfer\n" + "".join(
+        f"{s['studentnummer']},{opos[n % len(opos)]['afkorting']},{aj},1,{n % 21}\n" for n, s in enumerate(students))
+
+    routes = [
+        ("students_page", "GET", "/students", {}),
+        ("students_page (zoeken)", "GET", "/students?q=van", {}),
+        ("student_detail", "GET", f"/students/{sid}", {}),
+        ("rapport_page", "GET", f"/rapport?{rapport_q}", {}),
+        ("rapport_csv", "GET", f"/rapport.csv?{rapport_q}", {}),
+        ("statistiek", "GET", "/rapport/statistiek.json", {}),
+        ("api students", "GET", "/api/students?limit=1000", {}),
+        ("api results", "GET", "/api/results?limit=1000", {}),
+        ("api student-logs", "GET", "/api/student-logs?limit=1000", {}),
+        ("import students (1k rijen)", "POST", "/students/import", {"data": _csv_upload(stu_csv, "s.csv")}),
+        ("import results (1k rijen)", "POST", "/results/import", {"data": _csv_upload(res_csv, "r.csv"),
+                                                                  "headers": {"Accept": "application/json"}}),
+    ]
+    failed = []
+    for name, method, url, kw in routes:
+        repeat = max(1, REPEAT // 5) if method == "POST" else REPEAT
+        status, times, queries = _measure(client, counter, method, url, repeat=repeat, **kw)
+        _report(name, status, times, queries)
+        if status >= 400:
+            failed.append((name, status))
+
+    assert not failed, failed
@@ -0,0 +1,99 @@
+# tests/test_bulk.py
+"""
+The JSON bulk endpoints (/api/<...>/bulk): per-item outcomes, 200 as soon as
+one item was written and 422 when none was. Runs on `mongo_app`.
+"""
+import json
+
+import pytest
+from bson import ObjectId
+
+TOKEN = {"Authorization": "Bearer geheim"}
+
+
+@pytest.fixture
+def api(mongo_app):
+    return mongo_app.test_client()
+
+
+def post(api, path, items):
+    return api.post(f"/api/{path}/bulk", json=items, headers=TOKEN)
+
+
+def test_bulk_students(api, mongo_app):
+    resp = post(api, "students", [
+        {"studentnummer": "r0100", "voornaam": " Ann ", "achternaam": "Peeters", "inschrijfdatum": "2024-09-16"},
+        {"studentnummer": "r0101", "achternaam": "Claes"},
+        {"studentnummer": "r0100", "voornaam": "Ann", "achternaam": "Janssens",   # zelfde sleutel: laatste wint
+         "inschrijfdatum": "2024-10-01"},
+        {"studentnummer": "r0102", "voornaam": "Bob", "achternaam": "C", "opleiding_id": "xx"},
+        5,
+    ])
+    body = resp.get_json()
+    assert resp.status_code == 200
+    assert (body["created"], body["updated"], body["skipped"]) == (1, 1, 3)
+    items = body["items"]
+    assert [d["status"] for d in items] == ["created", "error", "ok", "error", "error"]
+    assert items[1]["error"].startswith("voornaam:")
+    assert items[3]["error"] == "ongeldige opleiding_id." and items[4]["error"] == "ongeldig JSON-object."
+
+    doc = mongo_app.db.students.find_one({"studentnummer": "r0100"})
+    assert str(doc["_id"]) == items[0]["_id"]
+    assert (doc["voornaam"], doc["achternaam"], doc["inschrijfdatum"]) == ("Ann", "Janssens", "2024-10-01")
+
+    # niets geschreven -> 422
+    resp = post(api, "students", [{"studentnummer": "r1"}])
+    assert resp.status_code == 422 and resp.get_json()["skipped"] == 1
+
+
+def test_bulk_students_ndjson(api, mongo_app):
+    lines = [json.dumps({"studentnummer": "r0200", "voornaam": "A", "achternaam": "B"}), "{kapot", ""]
+    resp = api.post("/api/students/bulk", data="\n".join(lines), content_type="application/x-ndjson", headers=TOKEN)
+    body = resp.get_json()
+    assert resp.status_code == 200 and (body["created"], body["skipped"]) == (1, 1)
+    assert body["items"][1] == {"index": 1, "status": "error", "error": "ongeldig JSON-object."}
+
+
+def test_bulk_results(api, mongo_app):
+    db = mongo_app.db
+    sid = db.students.insert_one({"studentnummer": "r0300", "voornaam": "A", "achternaam": "B"}).inserted_id
+    opo = db.opos.insert_one({"afkorting": "WEB", "naam": "Web", "code": "C1"}).inserted_id
+    row = {"student_id": str(sid), "opo_id": str(opo), "academiejaar": "2024-2025", "kans": 1}
+    missing = str(ObjectId())
+
+    resp = post(api, "results", [
+        {**row, "cijfer": 8},
+        {**row, "cijfer": 11},                 # zelfde sleutel: laatste wint
+        {**row, "kans": 2, "cijfer": None},
+        {**row, "student_id": "xx"},
+        {**row, "student_id": missing},
+        {**row, "opo_id": missing},
+        {**row, "kans": 3},
+    ])
+    body = resp.get_json()
+    assert resp.status_code == 200
+    assert (body["created"], body["updated"], body["skipped"]) == (2, 1, 4)
+    assert [d["status"] for d in body["items"]] == ["created", "ok", "created", "error", "error", "error", "error"]
+    assert body["items"][3]["error"] == "ongeldige student_id of opo_id."
+    assert body["items"][4]["error"] == f"student niet gevonden: '{missing}'."
+    assert body["items"][5]["error"] == f"OPO niet gevonden: '{missing}'."
+    assert {r["kans"]: r["cijfer"] for r in db.resultaten.find()} == {1: 11.0, 2: None}
+
+    resp = post(api, "results", [{**row, "opo_id": missing}])
+    assert resp.status_code == 422 and resp.get_json()["created"] == 0
+
+
+def test_bulk_logs(api, mongo_app):
+    sid = str(mongo_app.db.students.insert_one({"studentnummer": "r0400", "voornaam": "A", "achternaam": "B"}).inserted_id)
+    resp = post(api, "student-logs", [
+        {"student_id": sid, "beschrijving": "gesprek"},
+        {"student_id": sid, "opo_id": "xx", "beschrijving": "x"},
+        {"student_id": sid},
+    ])
+    body = resp.get_json()
+    assert resp.status_code == 200 and (body["created"], body["skipped"]) == (1, 2)
+    assert [d["status"] for d in body["items"]] == ["created", "error", "error"]
+    doc = mongo_app.db.student_logs.find_one()
+    assert str(doc["_id"]) == body["items"][0]["_id"] and doc["student_id"] == ObjectId(sid)
+
+    assert post(api, "student-logs", [{"beschrijving": "x"}]).status_code == 422
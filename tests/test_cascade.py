@@ -0,0 +1,95 @@
+# tests/test_cascade.py
+"""
+Cascading deletes, archive/restore and the orphan cleanup keep the counters
+and opo_stats in line with a full rebuild. Runs on the `mongo_db` fixture.
+"""
+from datetime import datetime
+
+import pytest
+
+from app.cascade import archive_name, cleanup_orphans, delete_categorie, delete_opo, delete_student, restore_student
+from app.db import ensure_indexes
+from app.stats import COUNTERS_ID, rebuild_counters, rebuild_opo_stats
+
+
+@pytest.fixture
+def db(mongo_db):
+    db = mongo_db
+    ensure_indexes(db)
+    opl = db.opleidingen.insert_one({"naam": "TI", "dag_avond": "dag"}).inserted_id
+    opos = db.opos.insert_many([{"afkorting": f"O{i}", "naam": f"OPO {i}", "code": f"C{i}"} for i in range(2)]).inserted_ids
+    cats = db.categorien.insert_many([{"afkorting": "GESPREK"}, {"afkorting": "ATTEST"}]).inserted_ids
+    sids = db.students.insert_many([{"studentnummer": f"r{i:03}", "voornaam": "V", "achternaam": "A",
+                                     "opleiding_id": opl} for i in range(5)]).inserted_ids
+    db.resultaten.insert_many([
+        {"student_id": s, "opo_id": o, "academiejaar": "2024-2025", "kans": 1, "cijfer": float(n * 4 % 21)}
+        for n, s in enumerate(sids) for o in opos
+    ])
+    db.student_logs.insert_many([
+        {"student_id": s, "categorie_id": cats[n % 2], "opo_id": opos[0], "beschrijving": "x",
+         "registratiedatum": datetime(2024, 1, 1)}
+        for n, s in enumerate(sids)
+    ])
+    rebuild_counters(db)
+    rebuild_opo_stats(db)
+    db.ids = {"students": sids, "opos": opos, "cats": cats}
+    return db
+
+
+def assert_consistent(db):
+    """Incrementally maintained counters and opo_stats equal a full rebuild."""
+    counters = db.stats.find_one({"_id": COUNTERS_ID}, {"_id": 0})
+    stats = sorted((d["opo_id"], d["total"], d["passed"], d["failed"], d["na"])
+                   for d in db.opo_stats.find({"total": {"$gt": 0}}))
+    assert counters == rebuild_counters(db)
+    rebuild_opo_stats(db)
+    assert stats == sorted((d["opo_id"], d["total"], d["passed"], d["failed"], d["na"])
+                           for d in db.opo_stats.find())
+
+
+def test_delete_student(db):
+    sid = db.ids["students"][0]
+    assert delete_student(db, sid) == {"resultaten": 2, "student_logs": 1}
+    assert db.resultaten.count_documents({"student_id": sid}) == 0
+    assert db.student_logs.count_documents({"student_id": sid}) == 0
+    assert delete_student(db, sid) is None
+    assert_consistent(db)
+
+
+def test_archive_and_restore_student(db):
+    sid = db.ids["students"][1]
+    delete_student(db, sid, archive=True)
+    assert db[archive_name("resultaten")].count_documents({"student_id": sid}) == 2
+    assert_consistent(db)
+    assert restore_student(db, sid) == {"resultaten": 2, "student_logs": 1}
+    assert db[archive_name("students")].count_documents({}) == 0
+    assert_consistent(db)
+
+
+def test_delete_opo_and_categorie(db):
+    opo, cat = db.ids["opos"][0], db.ids["cats"][0]
+    assert delete_opo(db, opo) == {"resultaten": 5, "student_logs": 5}
+    assert db.student_logs.count_documents({"opo_id": None}) == 5
+    assert delete_categorie(db, cat) == {"student_logs": 3}
+    assert_consistent(db)
+
+
+def test_cleanup_orphans(db):
+    sid, opo = db.ids["students"][2], db.ids["opos"][1]
+    delete_student(db, sid)                       # via de app: geen wezen
+    db.opos.delete_one({"_id": opo})              # buiten de app om: wezen
+    db.stats.update_one({"_id": COUNTERS_ID}, {"$inc": {"opos": -1}})
+    db.categorien.delete_one({"_id": db.ids["cats"][1]})
+
+    report = {(r["collection"], r["field"]): r for r in cleanup_orphans(db, dry_run=True, batch_size=2)}
+    assert report["resultaten", "opo_id"]["rows"] == 4
+    assert report["student_logs", "categorie_id"]["rows"] == 2
+    assert report["resultaten", "student_id"]["rows"] == 0
+    assert db.resultaten.count_documents({"opo_id": opo}) == 4   # dry-run wijzigt niets
+
+    cleanup_orphans(db, dry_run=False, archive=True, batch_size=2)
+    assert db.resultaten.count_documents({"opo_id": opo}) == 0
+    assert db[archive_name("resultaten")].count_documents({"opo_id": opo}) == 4
+    assert all(r["rows"] == 0 for r in cleanup_orphans(db))
+    db.opo_stats.delete_many({"opo_id": opo})     # opo_stats-rijen van de verdwenen OPO
+    assert_consistent(db)
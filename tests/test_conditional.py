@@ -0,0 +1,34 @@
+# tests/test_conditional.py
+"""
+Conditional GET (conditional.py): a matching If-None-Match answers 304 before
+the view runs. Runs without a server, on the `fake_client` fixture.
+"""
+from bson import ObjectId
+from pymongo import ReadPreference
+
+
+def test_not_modified_skips_queries(fake_client):
+    c, calls = fake_client
+    first = c.get("/rapport?aj=2024-2025")
+    assert first.status_code == 200 and first.headers["ETag"].startswith('W/"')
+    calls.clear()
+    again = c.get("/rapport?aj=2024-2025", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert [c for c, _, _ in calls if c != "versions"] == []   # geen rapport-queries, geen template
+    # andere filters -> andere ETag
+    assert c.get("/rapport?aj=2023-2024", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+
+REPORT_VIEWS = ["/rapport?aj=2024-2025", f"/rapport?ajs=2023-2024&ajs=2024-2025&opos={ObjectId()}",
+                "/rapport/statistiek", "/rapport/statistiek.json", "/rapport.csv?aj=2024-2025", "/students.csv"]
+
+
+def test_report_views_read_primary(fake_client, fake_db):
+    # de ETag komt van de primary (versions); een body van een achterlopende secondary
+    # zou als 304 blijven hangen tot de volgende bump()
+    c, _ = fake_client
+    for url in REPORT_VIEWS:
+        fake_db.reads.clear()
+        assert c.get(url).status_code == 200, url
+        data = [pref for coll, pref in fake_db.reads if coll in ("students", "resultaten")]
+        assert data and all(pref == ReadPreference.PRIMARY for pref in data), url
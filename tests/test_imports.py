@@ -0,0 +1,104 @@
+# tests/test_imports.py
+"""
+Batched CSV imports (imports.py): created / updated / skipped counts, per-row
+errors and a key that repeats within a batch, against the documents and
+counters they leave behind. Runs on the `mongo_db` fixture.
+"""
+import io
+
+import pytest
+
+from app.db import ensure_indexes
+from app.imports import import_results, import_students
+from app.stats import COUNTERS_ID, rebuild_counters
+
+
+@pytest.fixture
+def db(mongo_db):
+    db = mongo_db
+    ensure_indexes(db)
+    db.opleidingen.insert_one({"naam": "TI", "dag_avond": "dag"})
+    db.opos.insert_one({"afkorting": "WEB", "naam": "Webontwikkeling", "code": "C1"})
+    rebuild_counters(db)
+    return db
+
+
+def csv_text(*lines):
+    return io.StringIO("\n".join(lines) + "\n")
+
+
+def assert_counters(db):
+    counters = db.stats.find_one({"_id": COUNTERS_ID}, {"_id": 0})
+    assert counters == rebuild_counters(db)
+
+
+STUDENT_HEADER = "studentnummer,voornaam,achternaam,inschrijfdatum,opleiding_label"
+
+
+def test_import_students(db):
+    first = import_students(db, csv_text(STUDENT_HEADER,
+                                         "r001,Ann,Peeters,2024-09-16,TI — dag",
+                                         "r002,Bob,Claes,2024-09-16,"))
+    assert (first.created, first.updated, first.skipped) == (2, 0, 0)
+
+    report = import_students(db, csv_text(
+        STUDENT_HEADER,
+        "r003,Cas,Dewit,2024-09-16,",             # nieuw
+        "r001,Ann,Peeters,2024-09-16,TI — dag",   # ongewijzigd
+        "r002,Bob,Claessens,2024-09-16,",         # gewijzigd
+        ",X,Y,,",                                 # ongeldig
+        "r004,Dirk,Eeckhout,,Onbekend — dag",     # nieuw, zonder opleiding
+        "r003,Cas,De Wit,2024-09-16,",            # zelfde sleutel in dezelfde batch: laatste wint
+    ), batch_size=10)
+    assert report.to_dict() == {
+        "created": 2,
+        "updated": 2,
+        "skipped": 2,
+        "errors": [
+            "Rij 5: ontbrekende verplichte velden (studentnummer/voornaam/achternaam).",
+            "Rij 6: opleiding niet gevonden: 'Onbekend — dag'. Student aangemaakt zonder opleiding.",
+        ],
+    }
+
+    docs = {s["studentnummer"]: s for s in db.students.find()}
+    assert sorted(docs) == ["r001", "r002", "r003", "r004"]
+    assert docs["r002"]["achternaam"] == "Claessens" and docs["r003"]["achternaam"] == "De Wit"
+    assert docs["r001"]["opleiding_id"] == db.opleidingen.find_one()["_id"]
+    assert "opleiding_id" not in docs["r004"]
+    assert "de wit" in docs["r003"]["zoek"]
+    assert_counters(db)
+
+
+RESULT_HEADER = "studentnummer,opo,academiejaar,kans,cijfer"
+
+
+def test_import_results(db):
+    import_students(db, csv_text(STUDENT_HEADER, "r001,Ann,Peeters,,", "r002,Bob,Claes,,"))
+    first = import_results(db, csv_text(RESULT_HEADER, "r001,WEB,2024-2025,1,8", "r002,WEB,2024-2025,1,12"))
+    assert (first.created, first.updated, first.skipped) == (2, 0, 0)
+
+    report = import_results(db, csv_text(
+        RESULT_HEADER,
+        'r001,WEB,2024-2025,2,"11,5"',   # nieuw (tweede kans)
+        "r002,WEB,2024-2025,1,12",       # ongewijzigd
+        "r001,web,2024-2025,1,9",        # gewijzigd
+        "r999,WEB,2024-2025,1,10",       # onbekende student
+        "r001,WEB,2024/2025,1,10",       # ongeldig academiejaar
+        "r002,C1,2024-2025,1,NA",        # zelfde sleutel (OPO via code) in dezelfde batch
+        "r001,WEB,2024-2025,1,25",       # cijfer buiten bereik
+    ), batch_size=10)
+    assert report.to_dict() == {
+        "created": 1,
+        "updated": 2,
+        "skipped": 4,
+        "errors": [
+            "Rij 5: student niet gevonden: 'r999'.",
+            "Rij 6: ongeldig academiejaar '2024/2025' (verwacht jjjj-jjjj).",
+            "Rij 8: cijfer buiten bereik 0–20: 25",
+        ],
+    }
+
+    sids = {s["studentnummer"]: s["_id"] for s in db.students.find()}
+    cijfers = {(r["student_id"], r["kans"]): r["cijfer"] for r in db.resultaten.find()}
+    assert cijfers == {(sids["r001"], 1): 9.0, (sids["r001"], 2): 11.5, (sids["r002"], 1): None}
+    assert_counters(db)
@@ -0,0 +1,154 @@
+# tests/test_indexes.py
+"""
+Explain-plan regression tests: every query shape the routes send must be served
+by an index, without COLLSCAN and without an in-memory SORT.
+
+Runs on the `mongo_db_module` fixture (conftest.py).
+"""
+from datetime import datetime
+
+import pytest
+
+from bson import ObjectId
+from werkzeug.datastructures import MultiDict
+from app.cascade import ORPHAN_RELATIONS, distinct_pipeline
+from app.db import ensure_indexes
+from app.routes import RESULT_API_SORT, results_filter
+from app.search import search_query, with_search_keys
+from app.web import STUDENT_SORT
+
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+
+@pytest.fixture(scope="module")
+def seeded(mongo_db_module):
+    db = mongo_db_module
+    ensure_indexes(db)
+    return db, _seed(db)
+
+
+def _seed(db):
+    opl = db.opleidingen.insert_one({"naam": "TI", "dag_avond": "dag"}).inserted_id
+    opos = db.opos.insert_many([{"afkorting": f"O{i}", "naam": f"OPO {i}", "code": f"C{i}"} for i in range(5)]).inserted_ids
+    cat = db.categorien.insert_one({"afkorting": "GESPREK"}).inserted_id
+    sids = db.students.insert_many([
+        with_search_keys({"studentnummer": f"r{i:05}", "voornaam": f"V{i}", "achternaam": f"A{i % 50}",
+                          "opleiding_id": opl if i % 2 else None})
+        for i in range(300)
+    ]).inserted_ids
+    db.resultaten.insert_many([
+        {"student_id": s, "opo_id": o, "academiejaar": aj, "kans": 1, "cijfer": float(n % 21)}
+        for n, s in enumerate(sids) for o in opos[:2] for aj in ("2023-2024", "2024-2025")
+    ])
+    db.student_logs.insert_many([
+        {"student_id": s, "categorie_id": cat, "opo_id": opos[n % 5], "beschrijving": "x",
+         "registratiedatum": datetime(2024, 1, 1 + n % 28)}
+        for n, s in enumerate(sids) for _ in range(3)
+    ])
+    return {"opl": opl, "opos": opos, "cat": cat, "student": sids[7]}
+
+
+@pytest.fixture
+def db(seeded):
+    return seeded[0]
+
+
+@pytest.fixture
+def ids(seeded):
+    return seeded[1]
+
+
+def _stages(plan):
+    """All stage names in a (classic or SBE) winning plan."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for v in plan.values():
+            yield from _stages(v)
+    elif isinstance(plan, list):
+        for v in plan:
+            yield from _stages(v)
+
+
+def assert_indexed(cursor):
+    winning = cursor.explain()["queryPlanner"]["winningPlan"]
+    stages = set(_stages(winning))
+    assert not stages & BAD_STAGES, f"plan uses {stages & BAD_STAGES}: {winning}"
+
+
+def test_students_list(db):
+    assert_indexed(db.students.find({}).sort(STUDENT_SORT).limit(51))
+
+
+def test_students_search(db):
+    assert_indexed(db.students.find(search_query("a1")).limit(10))
+
+
+def test_rapport_students_per_opleiding(db, ids):
+    q = {"opleiding_id": ids["opl"]}
+    assert_indexed(db.students.find(q).sort([("achternaam", 1), ("voornaam", 1)]))
+
+
+def test_rapport_results_per_student(db, ids):
+    # de $lookup-subpipeline van rapport_rows, als find()
+    q = {"student_id": ids["student"], "academiejaar": "2024-2025", "opo_id": {"$in": ids["opos"][:2]}}
+    assert_indexed(db.resultaten.find(q))
+
+
+def test_statistiek_results_per_year_and_opo(db, ids):
+    q = {"academiejaar": {"$in": ["2023-2024", "2024-2025"]}, "opo_id": {"$in": ids["opos"][:2]}}
+    assert_indexed(db.resultaten.find(q))
+
+
+def test_student_detail_results(db, ids):
+    q = {"student_id": ids["student"]}
+    assert_indexed(db.resultaten.find(q).sort([("academiejaar", 1), ("opo_id", 1), ("kans", 1)]))
+
+
+@pytest.mark.parametrize("extra", [{}, {"categorie_id": "cat"}, {"opo_id": "opo"}])
+def test_student_detail_logs(db, ids, extra):
+    q = {"student_id": ids["student"]}
+    if "categorie_id" in extra:
+        q["categorie_id"] = ids["cat"]
+    if "opo_id" in extra:
+        q["opo_id"] = ids["opos"][0]
+    assert_indexed(db.student_logs.find(q).sort([("registratiedatum", -1), ("_id", -1)]).limit(26))
+
+
+def test_opo_stats_read(db, ids):
+    q = {"academiejaar": "2024-2025", "opo_id": {"$in": ids["opos"]}}
+    assert_indexed(db.opo_stats.find(q))
+
+
+def test_snapshot_or(db, ids):
+    s, o = ids["student"], ids["opos"][0]
+    q = {"$or": [{"student_id": s, "opo_id": o, "academiejaar": aj} for aj in ("2023-2024", "2024-2025")]}
+    assert_indexed(db.resultaten.find(q))
+
+
+def test_api_lists(db, ids):
+    assert_indexed(db.students.find({}).sort([("studentnummer", 1)]).limit(101))
+    assert_indexed(db.resultaten.find({}).sort(RESULT_API_SORT).limit(101))
+    assert_indexed(db.student_logs.find({}).sort([("registratiedatum", -1), ("_id", -1)]).limit(101))
+    q = {"student_id": ids["student"]}
+    assert_indexed(db.student_logs.find(q).sort([("registratiedatum", -1), ("_id", -1)]).limit(101))
+
+
+@pytest.mark.parametrize("args", [
+    {"student_id": "student"}, {"opo_id": "opo"}, {"academiejaar": "2024-2025"},
+    {"academiejaar": "2024-2025", "opo_id": "opo"}, {"academiejaar": "2024-2025", "kans": "1"},
+])
+def test_api_results_filtered(db, ids, args):
+    # volledige sync per student, OPO of jaar: elke pagina zonder SORT over alle treffers
+    real = {"student_id": str(ids["student"]), "opo_id": str(ids["opos"][0])}
+    q = results_filter(MultiDict({k: real.get(k, v) for k, v in args.items()}))
+    assert_indexed(db.resultaten.find(q).sort(RESULT_API_SORT).limit(101))
+
+
+@pytest.mark.parametrize("coll, field", [(c, f) for c, f, _, _ in ORPHAN_RELATIONS])
+def test_cascade_and_orphans(db, coll, field):
+    # cascade / opruimen: rijen van een (verdwenen) ouder
+    assert_indexed(db[coll].find({field: {"$in": [ObjectId()]}}).limit(1000))
+    # anti-join: distinct ouder-ids uit de index, zonder documenten te lezen
+    plan = db.command("explain", {"aggregate": coll, "pipeline": distinct_pipeline(field), "cursor": {}})
+    assert "COLLSCAN" not in set(_stages(plan)), plan
@@ -0,0 +1,55 @@
+# tests/test_projections.py
+"""
+Which fields each web view asks MongoDB for. Runs without a server, on the
+`fake_client` fixture (conftest.py).
+"""
+from app import web
+
+
+def projections(calls, coll, op="find"):
+    return [p for c, o, p in calls if c == coll and o == op]
+
+
+def test_students_list(fake_client):
+    c, calls = fake_client
+    assert c.get("/students").status_code == 200
+    assert projections(calls, "students") == [web.STUDENT_LIST_FIELDS]
+
+
+def test_students_autocomplete(fake_client):
+    c, calls = fake_client
+    assert c.get("/students/autocomplete?q=b").status_code == 200
+    assert projections(calls, "students") == [{"studentnummer": 1, "voornaam": 1, "achternaam": 1}]
+
+
+def test_student_detail(fake_client, fake_db):
+    c, calls = fake_client
+    assert c.get(f"/students/{fake_db.student_id}").status_code == 200
+    assert projections(calls, "students", "find_one") == [web.STUDENT_DETAIL_FIELDS]
+    # resultaten en logboek komen pas bij het openen van hun tab
+    assert not projections(calls, "resultaten")
+    assert not projections(calls, "student_logs")
+
+
+def test_student_tabs(fake_client, fake_db):
+    c, calls = fake_client
+    assert c.get(f"/students/{fake_db.student_id}/results").status_code == 200
+    assert projections(calls, "resultaten") == [web.RESULT_VIEW_FIELDS]
+    assert c.get(f"/students/{fake_db.student_id}/logs").status_code == 200
+    assert projections(calls, "student_logs") == [web.LOG_VIEW_FIELDS]
+
+
+def test_students_csv(fake_client):
+    c, calls = fake_client
+    assert c.get("/students.csv").status_code == 200
+    assert projections(calls, "students") == [web.STUDENT_EXPORT_FIELDS]
+
+
+def test_rapport_projects_students(fake_client):
+    c, calls = fake_client
+    assert c.get("/rapport?aj=2024-2025").status_code == 200
+    (pipeline,) = projections(calls, "students", "aggregate")
+    project = next(stage["$project"] for stage in pipeline if "$project" in stage)
+    assert project == {"studentnummer": 1, "achternaam": 1, "voornaam": 1}
+    assert not projections(calls, "students")  # geen losse find() op students meer
+
@@ -0,0 +1,16 @@
+# tests/test_rapport_multi.py
+"""
+The multi-year rapport is one aggregate on resultaten: students come in through
+$lookup and rows + summary through a $facet. Runs without a server, on the
+`fake_client` fixture; the pivoted rows themselves are checked in test_reporting.
+"""
+from bson import ObjectId
+
+
+def test_rapport_multi_year_single_aggregate(fake_client):
+    c, calls = fake_client
+    opo = ObjectId()
+    assert c.get(f"/rapport?ajs=2023-2024&ajs=2024-2025&opos={opo}").status_code == 200
+    (pipeline,) = [p for coll, op, p in calls if coll == "resultaten" and op == "aggregate"]
+    assert {"rows", "stats"} <= set(next(st["$facet"] for st in pipeline if "$facet" in st))
+    assert not [c for c, _, _ in calls if c == "students"]   # studenten via $lookup in dezelfde aggregate
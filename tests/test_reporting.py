@@ -0,0 +1,126 @@
+# tests/test_reporting.py
+"""
+The reporting connection: its own pool with secondaryPreferred reads for the
+background jobs and primary reads for the (ETag'd) report views, and
+maxTimeMS budgets that end in a clean "rapport te groot" instead of a hang.
+
+Runs on the `mongo_db` fixture; meant for a local single-node replica set:
+
+    mongod --replSet rs0 --setParameter enableTestCommands=1
+    mongosh --eval 'rs.initiate()'
+    MONGO_URI="mongodb://localhost:27017/?replicaSet=rs0" pytest tests/test_reporting.py
+
+(secondaryPreferred then reads from the primary, the only member). The
+time-out test uses the maxTimeAlwaysTimeOut fail point and is skipped when
+test commands are not enabled; the budget test runs on `fake_client` instead.
+"""
+import pytest
+
+from pymongo.errors import ExecutionTimeout, OperationFailure
+from bson import ObjectId
+from pymongo import ReadPreference
+from pymongo.read_preferences import SecondaryPreferred
+
+from app.cache import bump
+from app.reports import rapport_multi
+
+
+@pytest.fixture
+def app(mongo_db, monkeypatch):
+    monkeypatch.setenv("MONGO_DB", mongo_db.name)
+    monkeypatch.setenv("JOBS_WORKERS", "0")
+    monkeypatch.setenv("REPORT_MAX_POOL_SIZE", "3")
+    monkeypatch.setenv("REFCACHE_CHECK_SECONDS", "0")   # bump() meteen zien
+
+    from app import create_app
+    flask_app = create_app()
+    flask_app.config.update(TESTING=True)
+    db = flask_app.db
+    db.academiejaren.insert_many([{"academiejaar": "2023-2024"}, {"academiejaar": "2024-2025"}])
+    opo = db.opos.insert_one({"afkorting": "WEB", "naam": "Webontwikkeling"}).inserted_id
+    a, b = db.students.insert_many([{"studentnummer": "r001", "voornaam": "A", "achternaam": "B"},
+                                    {"studentnummer": "r002", "voornaam": "C", "achternaam": "D"}]).inserted_ids
+    db.resultaten.insert_many([
+        {"student_id": a, "opo_id": opo, "academiejaar": "2023-2024", "kans": 1, "cijfer": 8.0},
+        {"student_id": a, "opo_id": opo, "academiejaar": "2023-2024", "kans": 2, "cijfer": 9.0},
+        {"student_id": a, "opo_id": opo, "academiejaar": "2024-2025", "kans": 1, "cijfer": 14.0},
+        {"student_id": b, "opo_id": opo, "academiejaar": "2023-2024", "kans": 1, "cijfer": None},
+    ])
+    flask_app.opo_id = str(opo)
+    return flask_app
+
+
+def test_report_client(app):
+    report = app.report_db.client
+    assert report is not app.db.client                       # eigen pool
+    assert isinstance(report.read_preference, SecondaryPreferred)
+    assert report.options.pool_options.max_pool_size == 3
+
+    resp = app.test_client().get(f"/rapport?aj=2024-2025&opos={app.opo_id}")
+    assert resp.status_code == 200 and "14.0" in resp.get_data(as_text=True)
+
+
+def test_report_views_etag(app):
+    view = app.report_view_db
+    assert view.client is app.report_db.client and view.read_preference == ReadPreference.PRIMARY
+
+    c = app.test_client()
+    url = f"/rapport?aj=2024-2025&opos={app.opo_id}"
+    first = c.get(url)
+    assert first.status_code == 200 and "16.5" not in first.get_data(as_text=True)
+    sid = app.db.students.find_one({"studentnummer": "r002"})["_id"]
+    app.db.resultaten.insert_one({"student_id": sid, "opo_id": ObjectId(app.opo_id), "academiejaar": "2024-2025",
+                                  "kans": 1, "cijfer": 16.5})
+    bump(app.db, "resultaten")
+    again = c.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 200 and "16.5" in again.get_data(as_text=True)
+    assert again.headers["ETag"] != first.headers["ETag"]
+
+
+def test_multi_year_pivot(app):
+    rows, stats = rapport_multi(app.report_db, ["2023-2024", "2024-2025"], "", [app.opo_id])
+    cells = {r["student"]["studentnummer"]: r["cells"][app.opo_id] for r in rows}
+    assert cells == {
+        "r001": {"2023-2024": {"best": 9.0, "kans": 2}, "2024-2025": {"best": 14.0, "kans": 1}},
+        "r002": {"2023-2024": {"best": None, "kans": 1}},
+    }
+    per_aj = stats[app.opo_id]
+    assert (per_aj["2023-2024"]["total"], per_aj["2023-2024"]["failed"], per_aj["2023-2024"]["na"]) == (2, 1, 1)
+    assert (per_aj["2024-2025"]["total"], per_aj["2024-2025"]["passed"]) == (1, 1)
+
+    page = app.test_client().get(f"/rapport?ajs=2023-2024&ajs=2024-2025&opos={app.opo_id}")
+    html = page.get_data(as_text=True)
+    assert page.status_code == 200 and "9.0" in html and "14.0" in html
+
+
+def test_timeout_is_too_large(app):
+    admin = app.db.client.admin
+    try:
+        admin.command("configureFailPoint", "maxTimeAlwaysTimeOut", mode="alwaysOn")
+    except OperationFailure as e:
+        pytest.skip(f"fail points not available (enableTestCommands): {e}")
+    try:
+        c = app.test_client()
+        page = c.get(f"/rapport?aj=2024-2025&opos={app.opo_id}")
+        assert page.status_code == 503 and "verfijn de filters" in page.get_data(as_text=True)
+        multi = c.get(f"/rapport?ajs=2023-2024&ajs=2024-2025&opos={app.opo_id}")   # rapport_multi
+        assert multi.status_code == 503
+        stats = c.get("/rapport/statistiek.json")
+        assert stats.status_code == 503 and stats.get_json()["error"] == "too_large"
+    finally:
+        admin.command("configureFailPoint", "maxTimeAlwaysTimeOut", mode="off")
+
+
+def test_rapport_over_budget_is_clean(fake_client, fake_db, monkeypatch):
+    c, _ = fake_client
+
+    def aggregate(self, pipeline, **kw):
+        assert kw.get("maxTimeMS")   # elk rapport-endpoint heeft een budget
+        raise ExecutionTimeout("operation exceeded time limit", 50)
+
+    monkeypatch.setattr(fake_db.Collection, "aggregate", aggregate)
+    page = c.get("/rapport?aj=2024-2025")
+    assert page.status_code == 503 and "verfijn de filters" in page.get_data(as_text=True)
+    assert c.get("/rapport.csv?aj=2024-2025").status_code == 503   # geen afgebroken download
+    stats = c.get("/rapport/statistiek.json")
+    assert stats.status_code == 503 and stats.get_json()["error"] == "too_large"
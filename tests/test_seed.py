@@ -0,0 +1,18 @@
+# tests/test_seed.py
+"""
+`flask seed` adds exactly the requested students, also after deletes.
+Runs on the `mongo_db` fixture.
+"""
+from app.db import ensure_indexes
+from app.seed import seed
+
+
+def test_seed_after_delete(mongo_db):
+    db = mongo_db
+    ensure_indexes(db)
+    assert seed(db, students=20, years=1, opos=3, logs_per_student=0, rng_seed=1)["students"] == 20
+    db.students.delete_many({"studentnummer": {"$in": ["r0000003", "r0000007"]}})
+
+    out = seed(db, students=10, years=1, opos=3, logs_per_student=0, rng_seed=2)
+    assert out["students"] == 10 and db.students.count_documents({}) == 28
+    assert db.students.find_one(sort=[("studentnummer", -1)])["studentnummer"] == "r0000029"
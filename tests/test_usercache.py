@@ -0,0 +1,17 @@
+# tests/test_usercache.py
+"""UserCache drops its entries when the 'users' version marker moves. No database needed."""
+from app.models import User, UserCache
+
+
+def test_sync_drops_entries_on_new_users_version():
+    cache = UserCache()
+    cache.sync(3)
+    cache.put(User("u1", role="admin"))
+    cache.sync(3)
+    assert cache.get("u1").role == "admin"
+    cache.sync(4)   # rol of wachtwoord gewijzigd in een ander proces
+    assert cache.get("u1") is None
+
+
+def test_claim_records_users_version():
+    assert User("u1").claim(7)["uv"] == 7
@@ -0,0 +1,36 @@
+# tests/test_xlsx.py
+"""
+The streamed workbook is a valid zip whose sheet parses as XML, with typed
+cells and without characters Excel refuses. No database needed.
+"""
+import io, zipfile
+from datetime import date
+from xml.etree import ElementTree as ET
+
+from app.xlsx import xlsx_stream
+
+NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def test_xlsx_stream_roundtrip():
+    rows = ([f"r{i:04}", "A & B <\x01>", 12.5 if i % 2 else "NA", date(2024, 9, 16), None] for i in range(500))
+    chunks = list(xlsx_stream(["nr", "naam", "cijfer", "datum", "leeg"], rows, "Rapport [2024/2025]", flush_rows=50))
+    assert len(chunks) > 3   # komt in stukken, niet in één keer
+
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert zf.testzip() is None
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    assert wb.find("m:sheets/m:sheet", NS).get("name") == "Rapport  2024 2025"
+
+    sheet = ET.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+    data = sheet.findall("m:sheetData/m:row", NS)
+    assert len(data) == 501
+    header = data[0].findall("m:c", NS)
+    assert [c.get("s") for c in header] == ["1"] * 5
+
+    first, second = data[1].findall("m:c", NS), data[2].findall("m:c", NS)
+    assert first[1].find("m:is/m:t", NS).text == "A & B <>"
+    assert first[2].get("t") == "inlineStr"               # "NA" blijft tekst
+    assert second[2].get("t") is None and second[2].find("m:v", NS).text == "12.5"
+    assert first[3].get("s") == "2" and float(first[3].find("m:v", NS).text) == 45551.0
+    assert first[4].find("m:v", NS) is None